@@ -3,7 +3,7 @@ import numpy as np
 import torch
 from torch.utils.tensorboard import SummaryWriter
 
-from agent.core_alg.core_pg import cumulative_rewards, gae_advantage, value_train, get_kl
+from agent.core_alg.core_pg import returns_and_advantages, value_train, get_kl
 from agent.core_alg.core_utils import get_flat_params_from
 from neural_net.nn import FullyConnectNN, FCNPolicy
 
@@ -75,12 +75,9 @@ def train_ppo(value_net: FullyConnectNN, policy_net: FCNPolicy, net_opt_p: torch
     next_values_torch = value_net.forward(torch.as_tensor(next_obs_np, dtype=torch.float, device=device)).squeeze()
     next_values_np = next_values_torch.cpu().detach().numpy()
 
-    # cumulative reward
-    returns_np = cumulative_rewards(rewards_np, terms_np, truncs_np, next_values_np, gamma)
+    # cumulative reward and advantage
+    returns_np, adv_np = returns_and_advantages(rewards_np, terms_np, truncs_np, values_np, next_values_np, gamma, lam)
     returns_torch = torch.as_tensor(returns_np, dtype=torch.float, device=device)
-
-    # compute advantage
-    adv_np = gae_advantage(rewards_np, terms_np, truncs_np, values_np, next_values_np, gamma, lam)
     adv_torch = torch.as_tensor(adv_np, dtype=torch.float, device=device)
 
     # policy gradient training
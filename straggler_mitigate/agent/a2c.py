@@ -1,19 +1,91 @@
 import time
-from typing import Tuple
+from typing import List, Tuple
 import torch
+import torch.multiprocessing
 import numpy as np
 from torch.utils.tensorboard import SummaryWriter
 
 from agent.monitoring.core_log import log_a2c
-from agent.core_alg.core_pg import sample_action, train_actor_critic, train_entropy
+from agent.core_alg.core_pg import sample_action, sample_action_prob, train_actor_critic, train_entropy
 from agent.train_wheels import safe_condition
 from cenv.clb.pyenv import PyLoadBalanceEnv
+from cenv.load_balance import load_balance_env_actor
 from param import config
 from neural_net.nn_perm import PermInvNet
 from buffer.buffer import TransitionBuffer
+from buffer.buffer_ring import TrajectoryRing
 from utils.proj_time import ProjectFinishTime
 
 
+def run_actor(actor_index: int, output_folder: str, aux_state: int, ring: TrajectoryRing,
+              shared_policy: List[torch.Tensor], policy_version, stop_event):
+    # Actor process, simulates with the latest published policy and pushes every full batch into the ring
+    torch.set_num_threads(1)
+    torch.random.manual_seed(config.seed + actor_index)
+    np.random.seed(config.seed + actor_index)
+
+    env = load_balance_env_actor(output_folder, actor_index, config.num_actors)
+    obs_len = env.get_observation_len()
+    act_len = len(config.lb_timeout_levels)
+    max_act = act_len - 1
+    device = torch.device('cpu')
+
+    policy_net = torch.jit.script(PermInvNet(obs_len, act_len, config.num_servers, aux_state))
+    local_version = -1
+
+    buff = TransitionBuffer(obs_len)
+    behavior_pi = np.ones(len(buff.states_buffer), dtype=np.float32)
+
+    env.seed(config.seed)
+    obs = np.copy(env.reset())
+    info_orig = {'unsafe': False}
+
+    while not stop_event.is_set():
+        if policy_version.value != local_version:
+            with policy_version.get_lock():
+                for param, shared_param in zip(policy_net.state_dict().values(), shared_policy):
+                    param.copy_(shared_param)
+                local_version = policy_version.value
+
+        batch_ready = False
+        buff.reset_head()
+        train_wheels_engaged_sum = 0
+        train_wheels_engaged_len = 0
+
+        while not batch_ready:
+            unclipped_obs = env.queue_sizes()
+
+            if info_orig['unsafe']:
+                tw_exp = True
+                act = max_act
+                exaggeration = config.extra_multiply_penalty if safe_condition(obs) else 1
+                train_wheels_engaged_sum += 1
+                behavior_pi[buff.b] = 1
+            else:
+                tw_exp = False
+                act, behavior_pi[buff.b] = sample_action_prob(policy_net, obs, device)
+                exaggeration = 1
+
+            next_obs_orig, rew, done, info_orig = env.step(act, 0)
+            rew = -rew * exaggeration
+
+            buff.add_exp(obs, unclipped_obs, act, rew, next_obs_orig, done, env.get_work_measure(),
+                         info_orig['time_elapsed'], tw_exp=tw_exp)
+            buff.update_info(info_orig['rew_vec_orig'], info_orig['time_elapsed'], info_orig['server_time'])
+
+            train_wheels_engaged_len += 1
+            obs = np.copy(next_obs_orig)
+            batch_ready = buff.buffer_full()
+
+        info = {'actor': actor_index, 'version': local_version, 'curr_time': info_orig['curr_time'],
+                'timeline_len': env.timeline_len(), 'tw_sum': train_wheels_engaged_sum,
+                'tw_len': train_wheels_engaged_len}
+        if not ring.push(buff, behavior_pi, info, stop_event):
+            break
+
+    env.close()
+
+
 class TrainerNet(object):
     def __init__(self, environment: PyLoadBalanceEnv, monitor: SummaryWriter, output_folder: str):
         self.device = torch.device(config.device)
@@ -34,10 +106,11 @@ class TrainerNet(object):
 
         self.aux_state = 12
 
-        self.policy_net = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
-                                           config.num_servers, self.aux_state).to(self.device))
-        self.value_net = torch.jit.script(PermInvNet(self.obs_len, 1,
-                                          config.num_servers, self.aux_state).to(self.device))
+        policy_net = PermInvNet(self.obs_len, self.act_len, config.num_servers, self.aux_state).to(self.device)
+        mapper = policy_net.mapper if config.shared_mapper else None
+        self.policy_net = torch.jit.script(policy_net)
+        self.value_net = torch.jit.script(PermInvNet(self.obs_len, 1, config.num_servers, self.aux_state,
+                                                     mapper=mapper).to(self.device))
 
         self.buff = TransitionBuffer(self.obs_len)
 
@@ -79,13 +152,13 @@ class TrainerNet(object):
         return sample_action(self.policy_net, obs, self.device)
 
     def train(self, actions_np: np.ndarray, next_obs_np: np.ndarray, rewards_np: np.ndarray, obs_np: np.ndarray,
-              times_np: np.ndarray, dones_np: np.ndarray) -> Tuple[float, float, float, np.ndarray, np.ndarray,
-                                                                   np.ndarray, float]:
+              times_np: np.ndarray, dones_np: np.ndarray, is_weights_np: np.ndarray = None) -> \
+            Tuple[float, float, float, np.ndarray, np.ndarray, np.ndarray, float]:
         pg_loss, v_loss, real_entropy, ret_np, v_np, log_pi_min, adv_np = \
             train_actor_critic(self.value_net, self.policy_net, self.net_opt_p, self.net_opt_v, self.net_loss,
                                self.device, actions_np, next_obs_np, rewards_np, obs_np, dones_np, obs_np[:, [-1]],
                                self.gamma_rate, self.entropy_factor, times_np=times_np, monitor=self.monitor,
-                               it=self.it)
+                               it=self.it, is_weights_np=is_weights_np)
         self.it += 1
         return pg_loss, v_loss, real_entropy, ret_np, v_np, adv_np, log_pi_min
 
@@ -100,7 +173,29 @@ class TrainerNet(object):
     def save_model(self, epoch):
         self.save_file(self.output_folder + '/models/model_{}'.format(epoch))
 
+    def off_policy_correction(self, obs_np: np.ndarray, actions_np: np.ndarray, behavior_pi_np: np.ndarray,
+                              lag: int) -> np.ndarray or None:
+        # Hook for batches an actor collected with a policy lag learner updates old. Batches from the current policy
+        # are used as is, older ones get truncated importance weights pi / mu, as in V-trace.
+        if lag == 0:
+            return None
+        pi_cpu = self.policy_net.sample_policy(torch.as_tensor(obs_np, dtype=torch.float, device=self.device))
+        pi_acts = pi_cpu.gather(1, torch.as_tensor(actions_np, dtype=torch.int64)).numpy()
+        return np.minimum(pi_acts / behavior_pi_np[:, None], config.is_clip)
+
+    def publish_policy(self, shared_policy: List[torch.Tensor], policy_version):
+        # The version is the learner update the weights are from, so staleness counts updates made since, published
+        # or not
+        with policy_version.get_lock():
+            for shared_param, param in zip(shared_policy, self.policy_net.state_dict().values()):
+                shared_param.copy_(param)
+            policy_version.value = self.it
+
     def run_training(self):
+        if config.num_actors > 0:
+            self.run_training_actors()
+            return
+
         # initialize master from file
         if config.saved_model is not None:
             self.load_file(config.saved_model)
@@ -190,3 +285,78 @@ class TrainerNet(object):
             epoch += 1
 
         self.save_model(epoch)
+
+    def run_training_actors(self):
+        # Actor/learner split, actor processes simulate while this process trains on the batches they push
+        if config.saved_model is not None:
+            self.load_file(config.saved_model)
+
+        epoch = 0
+        train_wheels_engaged_sum = 0
+        train_wheels_engaged_len = 0
+
+        last_time = time.time()
+        proj_eta = ProjectFinishTime(config.num_epochs)
+
+        start_wall_time = 0
+
+        # Spawned, the simulator's logging threads do not survive a fork
+        ctx = torch.multiprocessing.get_context('spawn')
+        ring = TrajectoryRing(self.buff, config.ring_slots, ctx)
+        shared_policy = [param.detach().cpu().clone().share_memory_()
+                         for param in self.policy_net.state_dict().values()]
+        policy_version = ctx.Value('l', 0)
+        stop_event = ctx.Event()
+        self.publish_policy(shared_policy, policy_version)
+
+        actors = [ctx.Process(target=run_actor, args=(i, self.output_folder, self.aux_state, ring, shared_policy,
+                                                      policy_version, stop_event))
+                  for i in range(config.num_actors)]
+        for actor in actors:
+            actor.start()
+
+        while epoch < config.num_epochs:
+            self.buff.reset_head()
+            behavior_pi_np, info = ring.pop(self.buff)
+
+            all_states, all_next_states, all_actions_np, all_rewards, all_dones, time_buffer = self.buff.get()
+
+            is_weights_np = self.off_policy_correction(all_states, all_actions_np, behavior_pi_np[:len(all_states)],
+                                                       self.it - info['version'])
+
+            pg_loss, v_loss, real_entropy, ret_np, v_np, adv_np, log_pi_min = \
+                self.train(all_actions_np, all_next_states, all_rewards, all_states, time_buffer, all_dones,
+                           is_weights_np=is_weights_np)
+
+            norm_entropy = real_entropy / - np.log(self.act_len)
+            self.tune_entropy(all_states)
+
+            if self.it % config.publish_interval == 0:
+                self.publish_policy(shared_policy, policy_version)
+
+            train_wheels_engaged_sum += info['tw_sum']
+            train_wheels_engaged_len += info['tw_len']
+
+            curr_time = time.time()
+            elapsed = curr_time - last_time
+            last_time = curr_time
+
+            if not config.skip_tb:
+                log_a2c(self.buff, ret_np, v_np, adv_np, pg_loss, v_loss, self.entropy_factor, norm_entropy, log_pi_min,
+                        train_wheels_engaged_sum/train_wheels_engaged_len, elapsed, start_wall_time, self.monitor,
+                        proj_eta, epoch, info['curr_time'], info['timeline_len'], info['actor'])
+            else:
+                proj_eta.update_progress(epoch)
+
+            if epoch % config.save_interval == 0:
+                self.save_model(epoch)
+
+            epoch += 1
+
+        self.save_model(epoch)
+
+        stop_event.set()
+        while any(actor.is_alive() for actor in actors):
+            ring.drain()
+        for actor in actors:
+            actor.join()
@@ -11,6 +11,11 @@ def sample_action(q_net: Union[PermInvNet, torch.nn.Module], obs: np.ndarray, de
     return max_choice.item()
 
 
+def sample_actions(q_net: Union[PermInvNet, torch.nn.Module], obs_np: np.ndarray, device: torch.device) -> np.ndarray:
+    max_choice = q_net.max(torch.as_tensor(obs_np, dtype=torch.float, device=device))[1]
+    return max_choice.cpu().numpy()
+
+
 def soft_copy(critic_target: PermInvNet, critic_local: PermInvNet, tau: float):
     assert 0 <= tau <= 1
     for target_param, source_param in zip(critic_target.parameters(), critic_local.parameters()):
@@ -5,7 +5,7 @@ from typing import Tuple, Callable
 import torch.nn.functional as tfunctional
 from torch.utils.tensorboard import SummaryWriter
 
-from agent.core_alg.core_pg import value_train, cumulative_rewards, gae_advantage, policy_gradient
+from agent.core_alg.core_pg import value_train, returns_and_advantages, policy_gradient
 from agent.core_alg.core_utils import get_flat_params_from, set_flat_params_to
 from agent.core_alg.core_trpo import conjugate_gradients
 from neural_net.nn_perm import PermInvNet
@@ -165,12 +165,9 @@ def train_trpo(value_net: PermInvNet or torch.nn.Module, policy_net: PermInvNet
     next_values_torch = value_net.forward(torch.as_tensor(next_obs_np, dtype=torch.float, device=device))
     next_values_np = next_values_torch.cpu().detach().numpy()
 
-    # cumulative reward
-    returns_np = cumulative_rewards(rewards_np, dones_np, next_values_np[-1], gamma_rate, times_np)
+    # cumulative reward and advantage
+    returns_np, adv_np = returns_and_advantages(rewards_np, dones_np, values_np, next_values_np, gamma_rate, times_np)
     returns_torch = torch.as_tensor(returns_np, dtype=torch.float, device=device)
-
-    # compute advantage
-    adv_np = gae_advantage(rewards_np, dones_np, values_np, next_values_np, gamma_rate, times_np)
     adv_torch = torch.as_tensor(adv_np, dtype=torch.float, device=device)
 
     if len(ood_obs_np) > 0:
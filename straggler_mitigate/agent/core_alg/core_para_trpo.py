@@ -3,8 +3,7 @@ import numpy as np
 import torch
 from torch.utils.tensorboard import SummaryWriter
 
-from agent.core_alg.core_pg import value_train
-from agent.core_alg.core_para_pg import cumulative_rewards, gae_advantage
+from agent.core_alg.core_pg import value_train, returns_and_advantages
 from agent.core_alg.core_trpo import original_trpo
 from neural_net.nn_perm import PermInvNet
 
@@ -25,12 +24,10 @@ def train_trpo(value_net: PermInvNet or torch.nn.Module, policy_net: PermInvNet
     next_values_torch = value_net.forward(torch.as_tensor(next_obs_np, dtype=torch.float, device=device))
     next_values_np = next_values_torch.cpu().detach().numpy()
 
-    # cumulative reward
-    returns_np = cumulative_rewards(rewards_np, dones_np, next_values_np, gamma_rate, cuts_np, times_np)
+    # cumulative reward and advantage, every env's trajectory ends at a cut
+    returns_np, adv_np = returns_and_advantages(rewards_np, dones_np, values_np, next_values_np, gamma_rate, times_np,
+                                                cuts_np)
     returns_torch = torch.as_tensor(returns_np, dtype=torch.float, device=device)
-
-    # compute advantage
-    adv_np = gae_advantage(rewards_np, dones_np, values_np, next_values_np, gamma_rate, cuts_np, times_np)
     adv_torch = torch.as_tensor(adv_np, dtype=torch.float, device=device)
 
     pg_loss, entropy, log_pi_min = original_trpo(policy_net, obs_torch, actions_torch, adv_torch, masks_torch,
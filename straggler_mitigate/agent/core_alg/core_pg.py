@@ -4,7 +4,7 @@ import torch
 import torch.nn.functional as tfunctional
 from torch.utils.tensorboard import SummaryWriter
 
-from agent.core_alg.core_utils import get_flat_params_from
+from agent.core_alg.core_utils import get_flat_params_from, discounted_scan
 from param import config
 from neural_net.nn_perm import PermInvNet
 
@@ -15,39 +15,43 @@ def sample_action(policy_net: PermInvNet or torch.nn.Module, obs: np.ndarray, de
     return act
 
 
-def cumulative_rewards(rewards_np: np.ndarray, dones_np: np.ndarray, last_next_value_np: float, gamma_rate: float,
-                       times_np: np.ndarray = None) -> np.ndarray:
-    returns = np.zeros(len(rewards_np), dtype=np.float32)
-    last_val = last_next_value_np
-    # if done is true (and 1), next val should be zero in return
-    if times_np is None:
-        gamma_arr = gamma_rate * (1-dones_np.astype(float))
-    else:
-        gamma_arr = np.exp(times_np * gamma_rate) * (1-dones_np.astype(float))
+def sample_action_prob(policy_net: PermInvNet or torch.nn.Module, obs: np.ndarray,
+                       device: torch.device) -> Tuple[int, float]:
+    # Also returns the probability of the sampled action, for off-policy corrections of batches from stale policies
+    pi_cpu = policy_net.sample_policy(torch.as_tensor(obs, dtype=torch.float, device=device))
+    act = (pi_cpu[:-1].cumsum(-1) <= torch.rand(1)).sum().item()
+    return act, pi_cpu[act].item()
 
-    for i in reversed(range(len(rewards_np))):
-        last_val = rewards_np[i] + gamma_arr[i] * last_val
-        returns[i] = last_val
 
-    return returns
+def sample_actions(policy_net: PermInvNet or torch.nn.Module, obs_np: np.ndarray, device: torch.device) -> np.ndarray:
+    # One forward pass over the observations of all envs, then inverse-CDF sampling of one action per row
+    pi_cpu = policy_net.sample_policy(torch.as_tensor(obs_np, dtype=torch.float, device=device))
+    acts = (pi_cpu[:, :-1].cumsum(-1) <= torch.rand(len(obs_np), 1)).sum(-1)
+    return acts.numpy()
 
 
-def gae_advantage(rewards_np: np.ndarray, dones_np: np.ndarray, values_np: np.ndarray, next_values_np: np.ndarray,
-                  gamma_rate: float, times_np: np.ndarray = None) -> np.ndarray:
-    # TD lambda style advantage computation
-    # more details in GAE: https://arxiv.org/pdf/1506.02438.pdf
-    adv = np.zeros([len(rewards_np), 1], dtype=np.float32)
-    last_gae = 0
+def returns_and_advantages(rewards_np: np.ndarray, dones_np: np.ndarray, values_np: np.ndarray,
+                           next_values_np: np.ndarray, gamma_rate: float, times_np: np.ndarray = None,
+                           cuts_np: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    # Discounted returns and TD lambda style advantages (GAE: https://arxiv.org/pdf/1506.02438.pdf) in one reverse scan.
+    # Returns bootstrap from the next value at cuts and advantages restart there, without cuts_np only the last sample
+    # is a cut. If done is true (and 1), next val should be zero in both.
     if times_np is None:
-        gamma_arr = gamma_rate * (1-dones_np.astype(float))
+        gamma_arr = gamma_rate * (1-np.ravel(dones_np).astype(float))
+    else:
+        gamma_arr = np.exp(np.ravel(times_np) * gamma_rate) * (1-np.ravel(dones_np).astype(float))
+    if cuts_np is None:
+        cuts = np.zeros(len(gamma_arr), dtype=bool)
+        cuts[-1] = True
     else:
-        gamma_arr = np.exp(times_np * gamma_rate) * (1-dones_np.astype(float))
+        cuts = np.ravel(cuts_np).astype(bool)
 
-    for i in reversed(range(len(rewards_np))):
-        delta = rewards_np[i] + gamma_arr[i] * next_values_np[i] - values_np[i]
-        last_gae = adv[i] = delta + gamma_arr[i] * config.lam * last_gae
+    rewards = np.ravel(rewards_np)
+    next_vals = gamma_arr * np.ravel(next_values_np)
+    returns, adv = discounted_scan(np.stack([rewards + next_vals * cuts, rewards + next_vals - np.ravel(values_np)]),
+                                   np.stack([gamma_arr, gamma_arr * config.lam]) * ~cuts)
 
-    return adv
+    return returns.astype(np.float32), adv.astype(np.float32)[:, None]
 
 
 def policy_gradient(policy_net: PermInvNet or torch.nn.Module, net_opt_p: torch.optim.Optimizer,
@@ -101,7 +105,8 @@ def train_actor_critic(value_net: PermInvNet or torch.nn.Module, policy_net: Per
                        device: torch.device, actions_np: np.ndarray, next_obs_np: np.ndarray, rewards_np: np.ndarray,
                        obs_np: np.ndarray, dones_np: np.ndarray, masks_np: np.ndarray, gamma_rate: float,
                        entropy_factor: float, times_np: np.ndarray = None, monitor: SummaryWriter = None,
-                       it: int = None) -> Tuple[float, float, float, np.ndarray, np.ndarray, float, np.ndarray]:
+                       it: int = None, is_weights_np: np.ndarray = None) -> \
+        Tuple[float, float, float, np.ndarray, np.ndarray, float, np.ndarray]:
 
     actions_torch = torch.as_tensor(actions_np, dtype=torch.int64, device=device)
     obs_torch = torch.as_tensor(obs_np, dtype=torch.float, device=device)
@@ -113,22 +118,22 @@ def train_actor_critic(value_net: PermInvNet or torch.nn.Module, policy_net: Per
     next_values_torch = value_net.forward(torch.as_tensor(next_obs_np, dtype=torch.float, device=device))
     next_values_np = next_values_torch.cpu().detach().numpy()
 
-    # cumulative reward
-    returns_np = cumulative_rewards(rewards_np, dones_np, next_values_np[-1], gamma_rate, times_np)
+    # cumulative reward and advantage
+    returns_np, adv_np = returns_and_advantages(rewards_np, dones_np, values_np, next_values_np, gamma_rate, times_np)
     returns_torch = torch.as_tensor(returns_np, dtype=torch.float, device=device)
-
-    # compute advantage
-    adv_np = gae_advantage(rewards_np, dones_np, values_np, next_values_np, gamma_rate, times_np)
     adv_torch = torch.as_tensor(adv_np, dtype=torch.float, device=device)
+    if is_weights_np is not None:
+        # importance weights of off-policy samples scale their advantages
+        adv_torch = adv_torch * torch.as_tensor(is_weights_np, dtype=torch.float, device=device)
+
+    # value training, first so values_torch is still current if the nets share a mapper
+    v_loss = value_train(value_net, net_opt_v, net_loss, values_torch, returns_torch)
 
     # policy gradient training
     pg_loss, entropy, log_pi_min = \
         policy_gradient(policy_net, net_opt_p, obs_torch, actions_torch, adv_torch, masks_torch, entropy_factor,
                         monitor, it)
 
-    # value training
-    v_loss = value_train(value_net, net_opt_v, net_loss, values_torch, returns_torch)
-
     return pg_loss, v_loss, entropy, returns_np, values_np, log_pi_min, adv_np
 
 
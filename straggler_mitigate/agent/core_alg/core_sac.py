@@ -4,7 +4,7 @@ import torch
 import torch.nn.functional as tfunctional
 
 from param import config
-from neural_net.nn_perm import PermInvNet
+from neural_net.nn_perm import PermInvNet, MultiHeadPermInvNet
 
 
 def soft_copy(critic_1_target: PermInvNet, critic_2_target: PermInvNet, critic_1_local: PermInvNet,
@@ -16,6 +16,21 @@ def soft_copy(critic_1_target: PermInvNet, critic_2_target: PermInvNet, critic_1
             target_param.data.copy_(tau * source_param.data + (1.0 - tau) * target_param.data)
 
 
+def soft_copy_flat(critics_target: MultiHeadPermInvNet, critics_local: MultiHeadPermInvNet, tau: float):
+    # All heads at once, the parameters of every head are in one flat buffer
+    assert 0 <= tau <= 1
+    critics_target.flat_params.data.copy_(tau * critics_local.flat_params.data +
+                                          (1.0 - tau) * critics_target.flat_params.data)
+
+
+def clip_grad_norm_heads(critics: MultiHeadPermInvNet, max_norm: float):
+    # Same as torch.nn.utils.clip_grad_norm_ on every head as if it was its own net
+    grad = critics.flat_params.grad
+    if grad is not None:
+        norms = grad.norm(dim=1, keepdim=True)
+        grad.mul_(torch.clamp(max_norm / (norms + 1e-6), max=1.0))
+
+
 def policy_gradient(policy_net: PermInvNet, net_opt_p: torch.optim.Optimizer, critic_1_local: PermInvNet,
                     critic_2_local: PermInvNet, states_torch: torch.Tensor, entropy_factor: float,
                     mask_torch: torch.Tensor) -> Tuple[float, float]:
@@ -39,6 +54,25 @@ def policy_gradient(policy_net: PermInvNet, net_opt_p: torch.optim.Optimizer, cr
     return loss.item(), entropy.item()
 
 
+def soft_q_target(policy_net: PermInvNet, min_qs_local: torch.Tensor, next_states_torch: torch.Tensor,
+                  rewards_torch: torch.Tensor, dones_torch: torch.Tensor, gamma_rate: float, entropy_factor: float,
+                  mask_next_torch: torch.Tensor, mask_choice: int, times_torch: torch.Tensor = None) -> torch.Tensor:
+    # Soft Bellman target from the minimum of the target critics on the next states, called under no_grad
+    q = policy_net.forward(next_states_torch)
+    log_pi = tfunctional.log_softmax(q, dim=-1)
+    pi = torch.exp(log_pi)
+    min_next_q_target = pi * (min_qs_local - entropy_factor * log_pi)
+    min_next_q_target[mask_next_torch] = 0
+    min_next_q_target[mask_next_torch, mask_choice] = min_qs_local[mask_next_torch, mask_choice]
+    assert torch.equal(mask_next_torch, next_states_torch[:, -1].bool())
+    min_next_q_target = min_next_q_target.sum(dim=1)
+    if times_torch is None:
+        q_target = rewards_torch + (~dones_torch).float() * gamma_rate * min_next_q_target
+    else:
+        q_target = rewards_torch + (~dones_torch).float() * torch.exp(times_torch * gamma_rate) * min_next_q_target
+    return q_target.unsqueeze(-1)
+
+
 def value_train(policy_net: PermInvNet, critic_1_target: PermInvNet, critic_2_target: PermInvNet,
                 critic_1_local: PermInvNet, critic_2_local: PermInvNet, net_opt_v_1: torch.optim.Optimizer,
                 net_opt_v_2: torch.optim.Optimizer, net_loss: torch.nn.MSELoss, states_torch: torch.Tensor,
@@ -46,24 +80,11 @@ def value_train(policy_net: PermInvNet, critic_1_target: PermInvNet, critic_2_ta
                 actions_torch: torch.Tensor, gamma_rate: float, entropy_factor: float, mask_next_torch: torch.Tensor,
                 mask_choice: int,  times_torch: torch.Tensor = None) -> Tuple[float, float, float, float, float]:
     with torch.no_grad():
-        q = policy_net.forward(next_states_torch)
-        log_pi = tfunctional.log_softmax(q, dim=-1)
-        pi = torch.exp(log_pi)
-        pi_mask = torch.zeros_like(pi)
-        pi_mask[:, mask_choice] = 1
         next_q_target1 = critic_1_target.forward(next_states_torch)
         next_q_target2 = critic_2_target.forward(next_states_torch)
         min_qs_local = torch.min(next_q_target1, next_q_target2)
-        min_next_q_target = pi * (min_qs_local - entropy_factor * log_pi)
-        min_next_q_target[mask_next_torch] = 0
-        min_next_q_target[mask_next_torch, mask_choice] = min_qs_local[mask_next_torch, mask_choice]
-        assert torch.equal(mask_next_torch, next_states_torch[:, -1].bool())
-        min_next_q_target = min_next_q_target.sum(dim=1)
-        if times_torch is None:
-            q_target = rewards_torch + (~dones_torch).float() * gamma_rate * min_next_q_target
-        else:
-            q_target = rewards_torch + (~dones_torch).float() * torch.exp(times_torch * gamma_rate) * min_next_q_target
-        q_target = q_target.unsqueeze(-1)
+        q_target = soft_q_target(policy_net, min_qs_local, next_states_torch, rewards_torch, dones_torch, gamma_rate,
+                                 entropy_factor, mask_next_torch, mask_choice, times_torch)
 
     q_local_1 = critic_1_local(states_torch).gather(1, actions_torch)
     q_local_2 = critic_2_local(states_torch).gather(1, actions_torch)
@@ -112,6 +133,81 @@ def train_soft_actor_critic(actions_np: np.ndarray, next_obs_np: np.ndarray, rew
     return pg_loss, v_loss_1, v_loss_2, entropy, q_target, q_local_1, q_local_2
 
 
+def policy_gradient_multi_head(policy_net: PermInvNet, net_opt_p: torch.optim.Optimizer,
+                               critics_local: MultiHeadPermInvNet, states_torch: torch.Tensor, entropy_factor: float,
+                               mask_torch: torch.Tensor) -> Tuple[float, float]:
+    q = policy_net.forward(states_torch)
+    log_pi = tfunctional.log_softmax(q, dim=-1)
+    pi = torch.exp(log_pi)
+
+    with torch.no_grad():
+        min_q_local = critics_local(states_torch).min(dim=0)[0]
+    loss = ((log_pi * entropy_factor - min_q_local) * pi).sum(dim=-1)[mask_torch == 0].mean()
+    entropy = (log_pi * pi).sum(dim=-1)[mask_torch == 0].mean()
+    assert torch.equal(mask_torch, states_torch[:, -1])
+
+    net_opt_p.zero_grad()
+    loss.backward()
+    torch.nn.utils.clip_grad_norm_(policy_net.parameters(), 1)
+    net_opt_p.step()
+
+    return loss.item(), entropy.item()
+
+
+def value_train_multi_head(policy_net: PermInvNet, critics_target: MultiHeadPermInvNet,
+                           critics_local: MultiHeadPermInvNet, net_opt_v: torch.optim.Optimizer,
+                           net_loss: torch.nn.MSELoss, states_torch: torch.Tensor, next_states_torch: torch.Tensor,
+                           rewards_torch: torch.Tensor, dones_torch: torch.Tensor, actions_torch: torch.Tensor,
+                           gamma_rate: float, entropy_factor: float, mask_next_torch: torch.Tensor, mask_choice: int,
+                           times_torch: torch.Tensor = None) -> Tuple[float, float, float, float, float]:
+    with torch.no_grad():
+        min_qs_local = critics_target.forward(next_states_torch).min(dim=0)[0]
+        q_target = soft_q_target(policy_net, min_qs_local, next_states_torch, rewards_torch, dones_torch, gamma_rate,
+                                 entropy_factor, mask_next_torch, mask_choice, times_torch)
+
+    q_local = critics_local(states_torch).gather(2, actions_torch.unsqueeze(0).expand(critics_local.num_heads, -1, -1))
+    v_loss_1 = net_loss(q_local[0], q_target)
+    v_loss_2 = net_loss(q_local[1], q_target)
+    net_opt_v.zero_grad()
+    (v_loss_1 + v_loss_2).backward()
+    clip_grad_norm_heads(critics_local, 1)
+    net_opt_v.step()
+    return v_loss_1.item(), v_loss_2.item(), q_target.mean(), q_local[0].mean(), q_local[1].mean()
+
+
+def train_soft_actor_critic_multi_head(actions_np: np.ndarray, next_obs_np: np.ndarray, rewards_np: np.ndarray,
+                                       obs_np: np.ndarray, dones_np: np.ndarray, policy_net: PermInvNet,
+                                       critics_target: MultiHeadPermInvNet, critics_local: MultiHeadPermInvNet,
+                                       net_opt_v: torch.optim.Optimizer, net_opt_p: torch.optim.Optimizer,
+                                       net_loss: torch.nn.MSELoss, device: torch.device, gamma_rate: float,
+                                       entropy_factor: float, mask_curr_np, mask_next_np: np.ndarray, mask_choice: int,
+                                       times_np: np.ndarray = None) -> Tuple[float, float, float, float, float, float,
+                                                                             float]:
+    # train_soft_actor_critic with both critics (and both targets) as heads of one net
+    actions_torch = torch.as_tensor(actions_np, dtype=torch.int64, device=device)
+    obs_torch = torch.as_tensor(obs_np, dtype=torch.float, device=device)
+    mask_next_torch = torch.as_tensor(mask_next_np, dtype=torch.bool, device=device)
+    mask_curr_torch = torch.as_tensor(mask_curr_np, dtype=torch.float, device=device)
+    next_obs_torch = torch.as_tensor(next_obs_np, dtype=torch.float, device=device)
+    rewards_torch = torch.as_tensor(rewards_np, dtype=torch.float, device=device)
+    times_torch = torch.as_tensor(times_np, dtype=torch.float, device=device)
+    dones_torch = torch.as_tensor(dones_np, dtype=torch.bool, device=device)
+
+    # policy gradient training
+    pg_loss, entropy = policy_gradient_multi_head(policy_net, net_opt_p, critics_local, obs_torch, entropy_factor,
+                                                  mask_curr_torch)
+
+    # value training
+    v_loss_1, v_loss_2, q_target, q_local_1, q_local_2 = \
+        value_train_multi_head(policy_net, critics_target, critics_local, net_opt_v, net_loss, obs_torch,
+                               next_obs_torch, rewards_torch, dones_torch, actions_torch, gamma_rate, entropy_factor,
+                               mask_next_torch, mask_choice, times_torch)
+
+    soft_copy_flat(critics_target, critics_local, config.off_policy_tau)
+
+    return pg_loss, v_loss_1, v_loss_2, entropy, q_target, q_local_1, q_local_2
+
+
 def train_entropy(policy_net: PermInvNet, obs_np: np.ndarray, log_entropy: torch.Tensor, opt_ent: torch.optim.Optimizer,
                   device: torch.device, target_entropy: float) -> Tuple[float, float]:
     with torch.no_grad():
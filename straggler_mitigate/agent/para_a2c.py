@@ -5,7 +5,7 @@ import numpy as np
 from torch.utils.tensorboard import SummaryWriter
 
 from agent.monitoring.core_log import log_a2c
-from agent.core_alg.core_pg import sample_action, train_entropy
+from agent.core_alg.core_pg import sample_action, sample_actions, train_entropy
 from agent.core_alg.core_para_pg import train_actor_critic
 from agent.train_wheels import safe_condition
 from cenv.clb.pyenv import PyLoadBalanceEnv
@@ -81,6 +81,9 @@ class TrainerNet(object):
     def sample_action(self, obs: np.ndarray) -> int:
         return sample_action(self.policy_net, obs, self.device)
 
+    def sample_actions(self, obs_np: np.ndarray) -> np.ndarray:
+        return sample_actions(self.policy_net, obs_np, self.device)
+
     def train(self, actions_np: np.ndarray, next_obs_np: np.ndarray, rewards_np: np.ndarray, obs_np: np.ndarray,
               times_np: np.ndarray, dones_np: np.ndarray, cuts_np: np.ndarray) -> \
             Tuple[float, float, float, np.ndarray, np.ndarray, np.ndarray, float]:
@@ -135,12 +138,21 @@ class TrainerNet(object):
 
             n_es = 0
 
-            for i in range(len(self.env_s)):
-                cut = False
-                valid_acts_this_env = 0
-                while self.buff.samples_in_this_epoch != (i+1) * config.master_batch:
+            # step all envs in lockstep so the policy runs once per step on a batch of observations, transitions are
+            # kept per env and added to the buffer env after env, as the buffer expects
+            exp_s = [[] for _ in self.env_s]
+            valid_acts_s = [0] * len(self.env_s)
+            active = list(range(len(self.env_s)))
+            while len(active) > 0:
+                policy_envs = [i for i in active if not info_orig_s[i]['unsafe']]
+                if len(policy_envs) > 0:
+                    # get policy distribution
+                    policy_acts = self.sample_actions(np.stack([obs_s[i] for i in policy_envs]))
+                    act_s = dict(zip(policy_envs, policy_acts.tolist()))
+
+                for i in active:
                     # observe queue sizes
-                    unclipped_obs = self.env_s[i].queue_sizes()
+                    unclipped_obs = np.copy(self.env_s[i].queue_sizes())
 
                     if info_orig_s[i]['unsafe']:
                         # Max Action
@@ -149,31 +161,39 @@ class TrainerNet(object):
                         exaggeration = config.extra_multiply_penalty if safe_condition(obs_s[i]) else 1
                         train_wheels_engaged_sum += 1
                     else:
-                        # get policy distribution
                         tw_exp = False
-                        act = self.sample_action(obs_s[i])
+                        act = act_s[i]
                         exaggeration = 1
-                        valid_acts_this_env += 1
+                        valid_acts_s[i] += 1
 
                     next_obs_orig, rew, done, info_orig_s[i] = self.env_s[i].step(act, 0)
                     rew = -rew * exaggeration
 
-                    curr_wall_time = info_orig_s[i]['curr_time']
+                    cut = valid_acts_s[i] == config.master_batch
+
+                    # next state, env outputs are views into its buffers and are copied before the next step
+                    next_obs = np.copy(next_obs_orig)
+                    exp_s[i].append((obs_s[i], unclipped_obs, act, rew, next_obs, done,
+                                     self.env_s[i].get_work_measure(), info_orig_s[i]['time_elapsed'], cut, tw_exp,
+                                     np.copy(info_orig_s[i]['rew_vec_orig']), np.copy(info_orig_s[i]['server_time'])))
+
+                    train_wheels_engaged_len += 1
+                    obs_s[i] = next_obs
 
-                    cut = valid_acts_this_env == config.master_batch
+                active = [i for i in active if valid_acts_s[i] != config.master_batch]
 
+            curr_wall_time = info_orig_s[-1]['curr_time']
+
+            for i in range(len(self.env_s)):
+                for obs, unclipped_obs, act, rew, next_obs, done, work, time_elapsed, cut, tw_exp, rew_vec, server_time \
+                        in exp_s[i]:
                     n_es += 1
-                    self.buff.add_exp(obs_s[i], unclipped_obs, act, rew, next_obs_orig, done,
-                                      self.env_s[i].get_work_measure(), info_orig_s[i]['time_elapsed'], cut=cut,
+                    self.buff.add_exp(obs, unclipped_obs, act, rew, next_obs, done, work, time_elapsed, cut=cut,
                                       tw_exp=tw_exp)
-                    self.buff.update_info(info_orig_s[i]['rew_vec_orig'], info_orig_s[i]['time_elapsed'],
-                                          info_orig_s[i]['server_time'])
-
-                    train_wheels_engaged_len += 1
-                    # next state
-                    obs_s[i] = np.copy(next_obs_orig)
+                    self.buff.update_info(rew_vec, time_elapsed, server_time)
 
                 assert cut is True
+                assert self.buff.samples_in_this_epoch == (i+1) * config.master_batch
 
             assert self.buff.buffer_full()
 
@@ -5,7 +5,7 @@ import numpy as np
 from torch.utils.tensorboard import SummaryWriter
 
 from agent.monitoring.core_log import log_stats_sac
-from agent.core_alg.core_pg import sample_action, train_entropy
+from agent.core_alg.core_pg import sample_action, sample_actions, train_entropy
 from agent.core_alg.core_sac import train_soft_actor_critic, soft_copy, train_entropy
 from agent.train_wheels import safe_condition
 from buffer.buffer_sac import TransitionBuffer
@@ -105,6 +105,20 @@ class TrainerNet(object):
         else:
             return sample_action(self.policy_net, obs, self.device)
 
+    def sample_actions(self, obs_np: np.ndarray) -> np.ndarray:
+        # Exploration is decided per env, the rest share one forward pass
+        acts = np.zeros(len(obs_np), dtype=int)
+        greedy = []
+        for j in range(len(obs_np)):
+            if self.rand_countdown > 0:
+                self.rand_countdown -= 1
+                acts[j] = self.act_rng.choice(self.act_len)
+            else:
+                greedy.append(j)
+        if len(greedy) > 0:
+            acts[greedy] = sample_actions(self.policy_net, obs_np[greedy], self.device)
+        return acts
+
     def train(self, actions_np: np.ndarray, next_obs_np: np.ndarray, rewards_np: np.ndarray, obs_np: np.ndarray,
               times_np: np.ndarray, dones_np: np.ndarray) -> Tuple[float, float, float, float, float, float, float]:
         return train_soft_actor_critic(actions_np, next_obs_np, rewards_np, obs_np, dones_np, self.policy_net,
@@ -156,12 +170,19 @@ class TrainerNet(object):
 
             n_es = 0
 
-            for i in range(len(self.env_s)):
-                cut = False
-                valid_acts_this_env = 0
-                while self.buff.samples_in_this_epoch != (i+1) * config.off_policy_learn_steps:
+            # step all envs in lockstep so the policy runs once per step on a batch of observations, transitions are
+            # kept per env and added to the buffer env after env
+            exp_s = [[] for _ in self.env_s]
+            for _ in range(config.off_policy_learn_steps):
+                policy_envs = [i for i in range(len(self.env_s)) if not info_orig_s[i]['unsafe']]
+                if len(policy_envs) > 0:
+                    # get policy distribution
+                    policy_acts = self.sample_actions(np.stack([obs_s[i] for i in policy_envs]))
+                    act_s = dict(zip(policy_envs, policy_acts.tolist()))
+
+                for i in range(len(self.env_s)):
                     # observe queue sizes
-                    unclipped_obs = self.env_s[i].queue_sizes()
+                    unclipped_obs = np.copy(self.env_s[i].queue_sizes())
 
                     if info_orig_s[i]['unsafe']:
                         # Max Action
@@ -169,30 +190,30 @@ class TrainerNet(object):
                         exaggeration = config.extra_multiply_penalty if safe_condition(obs_s[i]) else 1
                         train_wheels_engaged_sum += 1
                     else:
-                        # get policy distribution
-                        act = self.sample_action(obs_s[i])
+                        act = act_s[i]
                         exaggeration = 1
 
-                    valid_acts_this_env += 1
-
                     next_obs_orig, rew, done, info_orig_s[i] = self.env_s[i].step(act, 0)
                     rew = -rew * exaggeration
 
-                    curr_wall_time = info_orig_s[i]['curr_time']
+                    # next state, env outputs are views into its buffers and are copied before the next step
+                    next_obs = np.copy(next_obs_orig)
+                    exp_s[i].append((obs_s[i], unclipped_obs, act, rew, next_obs, done,
+                                     self.env_s[i].get_work_measure(), info_orig_s[i]['time_elapsed'],
+                                     np.copy(info_orig_s[i]['rew_vec_orig']), np.copy(info_orig_s[i]['server_time'])))
 
-                    cut = valid_acts_this_env == config.off_policy_learn_steps
+                    train_wheels_engaged_len += 1
+                    obs_s[i] = next_obs
 
-                    n_es += 1
-                    self.buff.add_exp(obs_s[i], unclipped_obs, act, rew, next_obs_orig, done,
-                                      self.env_s[i].get_work_measure(), info_orig_s[i]['time_elapsed'])
-                    self.buff.update_info(info_orig_s[i]['rew_vec_orig'], info_orig_s[i]['time_elapsed'],
-                                          info_orig_s[i]['server_time'])
+            curr_wall_time = info_orig_s[-1]['curr_time']
 
-                    train_wheels_engaged_len += 1
-                    # next state
-                    obs_s[i] = np.copy(next_obs_orig)
+            for i in range(len(self.env_s)):
+                for obs, unclipped_obs, act, rew, next_obs, done, work, time_elapsed, rew_vec, server_time in exp_s[i]:
+                    n_es += 1
+                    self.buff.add_exp(obs, unclipped_obs, act, rew, next_obs, done, work, time_elapsed)
+                    self.buff.update_info(rew_vec, time_elapsed, server_time)
 
-                assert cut is True
+                assert self.buff.samples_in_this_epoch == (i+1) * config.off_policy_learn_steps
 
             assert self.buff.buffer_full()
 
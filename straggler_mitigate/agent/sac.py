@@ -6,12 +6,12 @@ from torch.utils.tensorboard import SummaryWriter
 
 from agent.monitoring.core_log import log_stats_sac
 from agent.core_alg.core_pg import sample_action
-from agent.core_alg.core_sac import train_soft_actor_critic, soft_copy, train_entropy
+from agent.core_alg.core_sac import train_soft_actor_critic_multi_head, soft_copy_flat, train_entropy
 from agent.train_wheels import safe_condition
 from buffer.buffer_sac import TransitionBuffer
 from cenv.clb.pyenv import PyLoadBalanceEnv
 from param import config
-from neural_net.nn_perm import PermInvNet
+from neural_net.nn_perm import PermInvNet, MultiHeadPermInvNet, heads_state_dict
 from utils.proj_time import ProjectFinishTime
 
 
@@ -37,16 +37,7 @@ class TrainerNet(object):
 
         self.policy_net = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
                                            config.num_servers, self.aux_state).to(self.device))
-        self.critic_1_local = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
-                                               config.num_servers, self.aux_state).to(self.device))
-        self.critic_2_local = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
-                                               config.num_servers, self.aux_state).to(self.device))
-        self.critic_1_target = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
-                                                config.num_servers, self.aux_state).to(self.device))
-        self.critic_2_target = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
-                                                config.num_servers, self.aux_state).to(self.device))
-        # Copy local parameters to target parameters
-        soft_copy(self.critic_1_target, self.critic_2_target, self.critic_1_local, self.critic_2_local, 1)
+        self.build_critics()
 
         self.buff = TransitionBuffer(self.obs_len, config.num_epochs * config.off_policy_learn_steps,
                                      config.off_policy_learn_steps)
@@ -57,10 +48,6 @@ class TrainerNet(object):
         self.rand_countdown = config.off_policy_random_epochs * config.off_policy_learn_steps
 
         self.net_opt_p = torch.optim.Adam(self.policy_net.parameters(), lr=config.lr_rate, weight_decay=1e-4)
-        self.net_opt_v_1 = torch.optim.Adam(self.critic_1_local.parameters(), lr=config.val_lr_rate,
-                                            weight_decay=1e-4)
-        self.net_opt_v_2 = torch.optim.Adam(self.critic_2_local.parameters(), lr=config.val_lr_rate,
-                                            weight_decay=1e-4)
 
         if config.auto_target_entropy is not None:
             self.log_entropy = torch.zeros(1, requires_grad=True, device=self.device)
@@ -74,24 +61,44 @@ class TrainerNet(object):
         arrival_scale, size_scale = self.env.get_scales()
         np.save(self.output_folder + 'scales.npy', {'size': size_scale, 'arrival': arrival_scale})
 
+    def build_critics(self):
+        # Both critics are heads of one net, and so are their targets
+        self.critics_local = torch.jit.script(MultiHeadPermInvNet(self.obs_len, self.act_len, config.num_servers,
+                                                                  self.aux_state, 2).to(self.device))
+        self.critics_target = torch.jit.script(MultiHeadPermInvNet(self.obs_len, self.act_len, config.num_servers,
+                                                                   self.aux_state, 2).to(self.device))
+        # Copy local parameters to target parameters
+        soft_copy_flat(self.critics_target, self.critics_local, 1)
+        self.net_opt_v = torch.optim.Adam(self.critics_local.parameters(), lr=config.val_lr_rate, weight_decay=1e-4)
+
     def load_file(self, path_or_dict: str or dict):
         if isinstance(path_or_dict, str):
             state_dict = torch.load(path_or_dict, map_location=self.device)
         else:
             state_dict = path_or_dict
+        if len(state_dict) == 8:
+            # Saved before the twin critics became heads of one net, as [policy, critic_1, critic_2, target_1,
+            # target_2, opt_p, opt_v_1, opt_v_2]. The critics are packed into heads, but the per-critic Adam moments do
+            # not map onto the packed parameter, so the critic optimizer starts fresh.
+            self.policy_net.load_state_dict(state_dict[0])
+            self.critics_local.load_state_dict(heads_state_dict(self.critics_local, state_dict[1:3]))
+            self.critics_target.load_state_dict(heads_state_dict(self.critics_target, state_dict[3:5]))
+            self.net_opt_p.load_state_dict(state_dict[5])
+            self.net_opt_v = torch.optim.Adam(self.critics_local.parameters(), lr=config.val_lr_rate,
+                                              weight_decay=1e-4)
+            return
+        if len(state_dict) != 5:
+            raise ValueError('Unknown SAC checkpoint layout with {} entries, expected [policy, critics, targets, '
+                             'opt_p, opt_v]'.format(len(state_dict)))
         self.policy_net.load_state_dict(state_dict[0])
-        self.critic_1_local.load_state_dict(state_dict[1])
-        self.critic_2_local.load_state_dict(state_dict[2])
-        self.critic_1_target.load_state_dict(state_dict[3])
-        self.critic_2_target.load_state_dict(state_dict[4])
-        self.net_opt_p.load_state_dict(state_dict[5])
-        self.net_opt_v_1.load_state_dict(state_dict[6])
-        self.net_opt_v_2.load_state_dict(state_dict[7])
+        self.critics_local.load_state_dict(state_dict[1])
+        self.critics_target.load_state_dict(state_dict[2])
+        self.net_opt_p.load_state_dict(state_dict[3])
+        self.net_opt_v.load_state_dict(state_dict[4])
 
     def save_file(self, path: str):
-        state_dict = [self.policy_net.state_dict(), self.critic_1_local.state_dict(), self.critic_2_local.state_dict(),
-                      self.critic_1_target.state_dict(), self.critic_2_target.state_dict(), self.net_opt_p.state_dict(),
-                      self.net_opt_v_1.state_dict(), self.net_opt_v_2.state_dict()]
+        state_dict = [self.policy_net.state_dict(), self.critics_local.state_dict(), self.critics_target.state_dict(),
+                      self.net_opt_p.state_dict(), self.net_opt_v.state_dict()]
         torch.save(state_dict, path)
 
     def sample_action(self, obs: np.ndarray) -> int:
@@ -103,11 +110,11 @@ class TrainerNet(object):
 
     def train(self, actions_np: np.ndarray, next_obs_np: np.ndarray, rewards_np: np.ndarray, obs_np: np.ndarray,
               times_np: np.ndarray, dones_np: np.ndarray) -> Tuple[float, float, float, float, float, float, float]:
-        return train_soft_actor_critic(actions_np, next_obs_np, rewards_np, obs_np, dones_np, self.policy_net,
-                                       self.critic_1_target, self.critic_2_target, self.critic_1_local,
-                                       self.critic_2_local, self.net_opt_v_1, self.net_opt_v_2, self.net_opt_p,
-                                       self.net_loss, self.device, self.gamma_rate, self.entropy_factor, obs_np[:, -1],
-                                       next_obs_np[:, -1], self.max_act, times_np)
+        return train_soft_actor_critic_multi_head(actions_np, next_obs_np, rewards_np, obs_np, dones_np,
+                                                  self.policy_net, self.critics_target, self.critics_local,
+                                                  self.net_opt_v, self.net_opt_p, self.net_loss, self.device,
+                                                  self.gamma_rate, self.entropy_factor, obs_np[:, -1],
+                                                  next_obs_np[:, -1], self.max_act, times_np)
 
     def tune_entropy(self, obs_np: np.ndarray):
         if config.auto_target_entropy is None:
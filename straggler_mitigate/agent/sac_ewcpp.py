@@ -4,9 +4,11 @@ import torch
 import numpy as np
 
 from agent.core_alg.core_ewc import train_sac_ewc
+from agent.core_alg.core_sac import soft_copy
 from agent.sac import TrainerNet as TrainerNetSAC
 from cenv.clb.pyenv import PyLoadBalanceEnv
 from param import config
+from neural_net.nn_perm import PermInvNet
 from torch.utils.tensorboard import SummaryWriter
 
 
@@ -18,6 +20,43 @@ class TrainerNet(TrainerNetSAC):
         self.ewc_alpha = config.ewc_alpha
         self.ewc_gamma = config.ewc_gamma
 
+    def build_critics(self):
+        # EWC keeps importances per critic parameter, so the critics stay separate nets
+        self.critic_1_local = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
+                                               config.num_servers, self.aux_state).to(self.device))
+        self.critic_2_local = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
+                                               config.num_servers, self.aux_state).to(self.device))
+        self.critic_1_target = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
+                                                config.num_servers, self.aux_state).to(self.device))
+        self.critic_2_target = torch.jit.script(PermInvNet(self.obs_len, self.act_len,
+                                                config.num_servers, self.aux_state).to(self.device))
+        # Copy local parameters to target parameters
+        soft_copy(self.critic_1_target, self.critic_2_target, self.critic_1_local, self.critic_2_local, 1)
+        self.net_opt_v_1 = torch.optim.Adam(self.critic_1_local.parameters(), lr=config.val_lr_rate,
+                                            weight_decay=1e-4)
+        self.net_opt_v_2 = torch.optim.Adam(self.critic_2_local.parameters(), lr=config.val_lr_rate,
+                                            weight_decay=1e-4)
+
+    def load_file(self, path_or_dict: str or dict):
+        if isinstance(path_or_dict, str):
+            state_dict = torch.load(path_or_dict, map_location=self.device)
+        else:
+            state_dict = path_or_dict
+        self.policy_net.load_state_dict(state_dict[0])
+        self.critic_1_local.load_state_dict(state_dict[1])
+        self.critic_2_local.load_state_dict(state_dict[2])
+        self.critic_1_target.load_state_dict(state_dict[3])
+        self.critic_2_target.load_state_dict(state_dict[4])
+        self.net_opt_p.load_state_dict(state_dict[5])
+        self.net_opt_v_1.load_state_dict(state_dict[6])
+        self.net_opt_v_2.load_state_dict(state_dict[7])
+
+    def save_file(self, path: str):
+        state_dict = [self.policy_net.state_dict(), self.critic_1_local.state_dict(), self.critic_2_local.state_dict(),
+                      self.critic_1_target.state_dict(), self.critic_2_target.state_dict(), self.net_opt_p.state_dict(),
+                      self.net_opt_v_1.state_dict(), self.net_opt_v_2.state_dict()]
+        torch.save(state_dict, path)
+
     def train(self, actions_np: np.ndarray, next_obs_np: np.ndarray, rewards_np: np.ndarray, obs_np: np.ndarray,
               times_np: np.ndarray, dones_np: np.ndarray) -> Tuple[float, float, float, float, float, float, float]:
         pg_loss, v_loss_1, v_loss_2, real_entropy, q_target, q_local_1, q_local_2, self.ewc_importances, self.ewc_past_weights = \
@@ -0,0 +1,59 @@
+import argparse
+import time
+
+import numpy as np
+
+from cenv.clb import pyenv
+from cenv.clb.pyjobgenfile import PyJobGenFile
+
+parser = argparse.ArgumentParser(description='Simulator throughput for different cluster sizes')
+parser.add_argument('--num_servers', type=int, default=[10, 30, 100, 300, 1000], nargs='+',
+                    help='cluster sizes to sweep (default: [10, 30, 100, 300, 1000])')
+parser.add_argument('--dataset_folder', type=str, default='./traces/', help='The trace dataset folder')
+parser.add_argument('--trace_ind', type=int, default=0, help='Trace index to choose')
+parser.add_argument('--time_window', type=float, default=0.5, help='Time window of actions (default: 0.5)')
+parser.add_argument('--lb_timeout_levels', type=float, default=[3, 10, 30, 60, 100, 300, 600, 1000, -1], nargs='+',
+                    help='timeout levels for resending requests (default: [3, 10, 30, 60, 100, 300, 600, 1000, -1])')
+parser.add_argument('--max_num_retries', type=int, default=1, help='maximum number of retries (default: 1)')
+parser.add_argument('--event_queue', type=str, default='binary_heap', choices=['binary_heap', 'dary_heap'],
+                    help='event queue backend of the simulator (default: binary_heap)')
+parser.add_argument('--num_steps', type=int, default=2000, help='environment steps per cluster size (default: 2000)')
+parser.add_argument('--seed', type=int, default=42, help='random seed (default: 42)')
+config = parser.parse_args()
+
+
+def benchmark(num_servers: int, sizes: np.ndarray, arrs: np.ndarray) -> dict:
+    # The traces are recorded for the default 10 server cluster, arrivals are sped up to keep the load per server fixed
+    arrs = arrs * 10 / num_servers
+    job_gen = PyJobGenFile([sizes], [arrs], 0, 1.0e8 * 3600 * 1000, num_servers, config.seed, 1)
+    env = pyenv.PyLoadBalanceEnv(num_servers, config.time_window * 1000, True, False, False, True, '/dev/null',
+                                 config.lb_timeout_levels, [0.75, 0.85], config.max_num_retries, True, 50, 3,
+                                 job_gen, job_gen.get_ptr(), config.seed, True, config.event_queue)
+    rng = np.random.default_rng(config.seed)
+    actions = rng.integers(0, len(config.lb_timeout_levels), config.num_steps)
+    env.reset()
+    num_jobs = 0
+    time_start = time.perf_counter()
+    for act in actions:
+        _, _, _, info = env.step(int(act), 0)
+        num_jobs += len(info['arrived_job_proc_time'])
+    time_elapsed = time.perf_counter() - time_start
+    env.close()
+    return {'steps_per_s': config.num_steps / time_elapsed, 'jobs_per_s': num_jobs / time_elapsed,
+            'us_per_job': time_elapsed / max(num_jobs, 1) * 1e6}
+
+
+def main():
+    workload = np.load(f'{config.dataset_folder}/real_tr{config.trace_ind}.npy')
+    sizes = workload[:, 0]
+    arrs = workload[:, 1]
+
+    print(f'{"servers":>8} {"steps/s":>10} {"jobs/s":>12} {"us/job":>8}')
+    for num_servers in config.num_servers:
+        result = benchmark(num_servers, sizes, arrs)
+        print(f'{num_servers:>8} {result["steps_per_s"]:>10.1f} {result["jobs_per_s"]:>12.1f} '
+              f'{result["us_per_job"]:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import queue
+from typing import Tuple
+import numpy as np
+import torch
+
+from buffer.buffer import TransitionBuffer
+
+
+class TrajectoryRing(object):
+    # Arrays of a TransitionBuffer that travel from actors to the learner, rows of the first six are filled up to b
+    FIELDS = ['states_buffer', 'next_states_buffer', 'actions_buffer', 'times_buffer', 'rewards_buffer',
+              'dones_buffer', 'states_fifo', 'action_timeout_fifo', 'reward_fifo', 'dones_fifo', 'workload_fifo',
+              'state_queue_size_fifo']
+    ROW_FIELDS = 6
+
+    def __init__(self, template: TransitionBuffer, num_slots: int, ctx):
+        # Every slot holds one full batch in shared memory, only slot indices and per-batch statistics go through the
+        # queues. Slots cycle free -> filled by an actor -> consumed by the learner -> free, so actors block once the
+        # learner falls num_slots batches behind.
+        self.slots = {name: torch.from_numpy(np.zeros((num_slots,) + getattr(template, name).shape,
+                                                      dtype=getattr(template, name).dtype)).share_memory_()
+                      for name in self.FIELDS}
+        self.behavior_pi = torch.ones([num_slots, len(template.states_buffer)], dtype=torch.float32).share_memory_()
+        self.free_slots = ctx.Queue()
+        self.filled_slots = ctx.Queue()
+        for slot in range(num_slots):
+            self.free_slots.put(slot)
+
+    def push(self, buff: TransitionBuffer, behavior_pi: np.ndarray, info: dict, stop_event) -> bool:
+        slot = None
+        while slot is None:
+            if stop_event.is_set():
+                return False
+            try:
+                slot = self.free_slots.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for i, name in enumerate(self.FIELDS):
+            if i < self.ROW_FIELDS:
+                self.slots[name][slot, :buff.b].numpy()[:] = getattr(buff, name)[:buff.b]
+            else:
+                self.slots[name][slot].numpy()[:] = getattr(buff, name)
+        self.behavior_pi[slot, :buff.b].numpy()[:] = behavior_pi[:buff.b]
+        info['b'] = buff.b
+        info['valid_samples'] = buff.valid_samples
+        info['jct'] = np.array(buff.jct, dtype=np.float32)
+        info['server_load'] = buff.server_load
+        info['time_elapsed'] = buff.time_elapsed
+        self.filled_slots.put((slot, info))
+        return True
+
+    def pop(self, buff: TransitionBuffer) -> Tuple[np.ndarray, dict]:
+        # Loads the next batch into buff as if it had been collected there, buff's head should be reset beforehand
+        slot, info = self.filled_slots.get()
+        b = info['b']
+        for i, name in enumerate(self.FIELDS):
+            if i < self.ROW_FIELDS:
+                getattr(buff, name)[:b] = self.slots[name][slot, :b].numpy()
+            else:
+                getattr(buff, name)[:] = self.slots[name][slot].numpy()
+        behavior_pi = self.behavior_pi[slot, :b].numpy().copy()
+        self.free_slots.put(slot)
+
+        buff.b = b
+        buff.valid_samples = info['valid_samples']
+        buff.num_samples_so_far += b
+        buff.samples_left_to_epoch = 0
+        buff.jct.extend(info['jct'])
+        buff.server_load = info['server_load']
+        buff.time_elapsed = info['time_elapsed']
+        return behavior_pi, info
+
+    def drain(self):
+        # Batches still queued when training ends are dropped, so actors blocked on a put can exit
+        try:
+            while True:
+                self.filled_slots.get(timeout=0.1)
+        except queue.Empty:
+            pass
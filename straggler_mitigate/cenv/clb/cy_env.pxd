@@ -5,6 +5,9 @@ cdef extern from "src/LoadBalanceEnv.h":
     cdef cppclass JobGen:
         pass
 
+    cdef enum EventQueueType:
+        binary_heap, dary_heap
+
     cdef struct step_return:
         unsigned short num_finished_jobs
         bool done
@@ -23,21 +26,74 @@ cdef extern from "src/LoadBalanceEnv.h":
 
     cdef cppclass LoadBalanceEnv:
         LoadBalanceEnv(unsigned int, unsigned short, double, bool, bool, const string&, bool, bool, short*,
-                       unsigned short, double*, unsigned short, int, JobGen*, bool, unsigned short, unsigned short, bool) except +
+                       unsigned short, double*, unsigned short, int, JobGen*, bool, unsigned short, unsigned short, bool,
+                       EventQueueType, unsigned short, unsigned short) except +
+        LoadBalanceEnv(LoadBalanceEnv*) except +
+        void restore(LoadBalanceEnv*) except +
         const int MAX_WINDOW_SIZE;
-        const int MAX_WINDOWS;
-        const int MAX_WORK_MEASURE_WINDOWS;
+        unsigned short num_windows
+        unsigned short num_work_measure_windows
+        unsigned short num_servers
+        double* observation_buffer
+        double* server_time_buffer
+        double* finished_job_duration_buffer
+        double* arrived_job_inter_time_buffer
+        double* arrived_job_proc_time_buffer
+        unsigned short* queue_buffer
         void seed(unsigned int)
         void reset(double*)
+        double* reset()
         double get_arrival_scale()
         double get_size_scale()
         void set_arrival_scale(double)
         void set_size_scale(double)
+        double get_reward_percentile()
+        void set_reward_percentile(double)
         double get_avg_rate()
         void observe(double*)
+        double* observe()
         void close()
         double get_work_measure()
         void queue_sizes(unsigned short*)
+        unsigned short* queue_sizes()
         unsigned int observation_len()
         unsigned int timeline_len()
-        step_return step(unsigned short, unsigned short, double*, double*, double*, double*, double*)
\ No newline at end of file
+        step_return step(unsigned short, unsigned short)
+        step_return step(unsigned short, unsigned short, double*, double*, double*, double*, double*)
+        unsigned int fast_forward(double, unsigned short)
+        void rollout_actions(unsigned short, double*, unsigned int) nogil
+        unsigned short action_len()
+
+cdef extern from "src/LoadBalanceEnvBatch.h":
+    cdef cppclass LoadBalanceEnvBatch:
+        LoadBalanceEnvBatch(unsigned short, unsigned int, unsigned short, double, bool, bool, const string&, bool,
+                            bool, short*, unsigned short, double*, unsigned short, int, JobGen**, bool,
+                            unsigned short, unsigned short, bool, unsigned int, EventQueueType, unsigned short,
+                            unsigned short) except +
+        unsigned short num_envs
+        unsigned int obs_len
+        int max_window_size
+        LoadBalanceEnv** envs
+        double* observations
+        double* rewards
+        bool* dones
+        double* server_times
+        double* finished_job_durations
+        double* arrived_job_inter_times
+        double* arrived_job_proc_times
+        unsigned short* num_finished_jobs
+        unsigned short* num_arrived_jobs
+        double* avg_arrived_job_inter_times
+        double* avg_arrived_job_proc_times
+        double* times_elapsed
+        double* curr_times
+        bool* unsafe
+        unsigned short* queues
+        double* work_measures
+        void seed(unsigned int)
+        void reset()
+        void observe()
+        void step(const unsigned short*, unsigned short) nogil
+        void queue_sizes()
+        void get_work_measures()
+        void close()
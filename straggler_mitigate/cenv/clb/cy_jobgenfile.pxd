@@ -5,14 +5,18 @@ cdef extern from "src/JobGenFile.h":
 
     cdef cppclass JobGenFile:
         JobGenFile(double**, double**, const int*, short, int, double, int, unsigned int, double) except +
+        JobGenFile(const double**, const double**, const double**, int, const int*, const int*, short, int, double,
+                   int, unsigned int, double) except +
         void seed(unsigned int)
         int get_curr_trace()
         void set_curr_trace(int)
         void load_index_arr(short**)
         int get_curr_index()
         void seek(double)
+        int seek(int, double)
         void relocate()
         void reset()
         JobProcessSample gen_job()
+        void gen_jobs(JobProcessSample*, int)
         void save_state()
         void load_state()
\ No newline at end of file
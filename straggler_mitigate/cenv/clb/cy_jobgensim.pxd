@@ -20,5 +20,6 @@ cdef extern from "src/JobGenSim.h":
         void relocate()
         void reset()
         JobProcessSample gen_job()
+        void gen_jobs(JobProcessSample*, int)
         void save_state()
         void load_state()
\ No newline at end of file
@@ -3,6 +3,6 @@ from libcpp cimport bool
 
 cdef extern from "src/LogSort.h":
     cdef cppclass LogSorter:
-        LogSorter(const string&, bool, unsigned int) except +
-        void add_file(const string&)
-        void flush()
+        LogSorter(const string&, bool, size_t, unsigned int) except +
+        void add_file(const string&) except +
+        void flush() except +
@@ -1,6 +1,6 @@
 # distutils: language = c++
 
-from cy_env cimport LoadBalanceEnv, JobGen, step_return
+from cy_env cimport LoadBalanceEnv, LoadBalanceEnvBatch, JobGen, step_return, EventQueueType, binary_heap, dary_heap
 from libc.stdint cimport uintptr_t
 from libc.stdlib cimport malloc, free
 from libcpp cimport bool
@@ -8,29 +8,31 @@ import numpy as np
 cimport numpy as np
 np.import_array()
 
+EVENT_QUEUES = {'binary_heap': binary_heap, 'dary_heap': dary_heap}
+
 cdef class PyLoadBalanceEnv:
     cdef LoadBalanceEnv* c_load_balance_env
     cdef int obs_size
     cdef int num_servers
     cdef int MAX_WINDOW_SIZE
-    cdef double* obs
-    cdef double* server_time
-    cdef unsigned short* queue_lens
-    cdef double* finished_job_completion_times
-    cdef double* arrived_proc_time
-    cdef double* arrive_iat_time
     cdef object job_gen
+    cdef object obs_arr
+    cdef object server_time_arr
+    cdef object queue_lens_arr
+    cdef object finished_job_completion_times_arr
+    cdef object arrived_proc_time_arr
+    cdef object arrive_iat_time_arr
+
+    def __cinit__(self, *args, **kwargs):
+        # The env is built in __init__, so that fork() can create an instance around a copied C++ env
+        self.c_load_balance_env = NULL
 
     def __init__(self, unsigned short num_servers, double time_window, bool load_in_obs, bool act_in_obs,
                  bool trace_in_obs, bool ext_in_obs, str filename_log, list timeouts, list service_rates,
                  int max_retries, bool use_tw, unsigned short upper_unsafe_bound, unsigned short lower_safe_bound,
-                 object job_gen, uintptr_t job_gen_pointer, unsigned int seed_rng, bool skip_log):
-        pass
-
-    def __cinit__(self, unsigned short num_servers, double time_window, bool load_in_obs, bool act_in_obs,
-                  bool trace_in_obs, bool ext_in_obs, str filename_log, list timeouts, list service_rates,
-                  int max_retries, bool use_tw, unsigned short upper_unsafe_bound, unsigned short lower_safe_bound,
-                  object job_gen, uintptr_t job_gen_pointer, unsigned int seed_rng, bool skip_log):
+                 object job_gen, uintptr_t job_gen_pointer, unsigned int seed_rng, bool skip_log,
+                 str event_queue='binary_heap', unsigned short num_windows=4,
+                 unsigned short num_work_measure_windows=20):
         """
 
         :param num_servers:
@@ -50,6 +52,9 @@ cdef class PyLoadBalanceEnv:
         :param job_gen_pointer:
         :param seed_rng:
         :param skip_log:
+        :param event_queue: Backend of the simulator's event queue, one of EVENT_QUEUES
+        :param num_windows: Number of past time windows the workload statistics in the observation are taken over
+        :param num_work_measure_windows: Number of past time windows the work measure is taken over
         :type num_servers: int
         :type time_window: float
         :type load_in_obs: bool
@@ -67,7 +72,12 @@ cdef class PyLoadBalanceEnv:
         :type job_gen_pointer: uintptr_t
         :type seed_rng: int
         :type skip_log: bool
+        :type event_queue: str
+        :type num_windows: int
+        :type num_work_measure_windows: int
         """
+        assert event_queue in EVENT_QUEUES
+        assert num_windows > 0 and num_work_measure_windows > 0
         cdef short* c_timeouts = <short*> malloc(sizeof(short)*len(timeouts))
         cdef short[::1] c_timeouts_view = <short[:len(timeouts)]> c_timeouts
         for i in range(len(timeouts)):
@@ -83,28 +93,35 @@ cdef class PyLoadBalanceEnv:
                                                      filename_log.encode('utf-8'), act_in_obs, trace_in_obs, c_timeouts,
                                                      len(timeouts), c_service_rates, len(service_rates), max_retries,
                                                      <JobGen*>job_gen_pointer, use_tw, upper_unsafe_bound,
-                                                     lower_safe_bound, skip_log)
+                                                     lower_safe_bound, skip_log, EVENT_QUEUES[event_queue],
+                                                     num_windows, num_work_measure_windows)
         free(<void*> c_timeouts)
         free(<void*> c_service_rates)
 
+        self.bind_buffers()
+
+    cdef bind_buffers(self):
         self.obs_size = self.c_load_balance_env.observation_len()
-        self.num_servers = num_servers
+        self.num_servers = self.c_load_balance_env.num_servers
         self.MAX_WINDOW_SIZE = self.c_load_balance_env.MAX_WINDOW_SIZE
 
-        self.obs = <double*> malloc(sizeof(double)*self.obs_size)
-        self.server_time = <double*> malloc(sizeof(double)*num_servers)
-        self.queue_lens = <unsigned short*> malloc(sizeof(unsigned short)*num_servers)
-        self.finished_job_completion_times = <double*> malloc(sizeof(double)*self.MAX_WINDOW_SIZE)
-        self.arrived_proc_time = <double*> malloc(sizeof(double)*self.MAX_WINDOW_SIZE)
-        self.arrive_iat_time = <double*> malloc(sizeof(double)*self.MAX_WINDOW_SIZE)
+        # Views over the buffers owned by the C++ env, they are overwritten by every step
+        cdef LoadBalanceEnv* e = self.c_load_balance_env
+        self.obs_arr = np.asarray(<double[:self.obs_size]> e.observation_buffer)
+        self.server_time_arr = np.asarray(<double[:self.num_servers]> e.server_time_buffer)
+        self.queue_lens_arr = np.asarray(<unsigned short[:self.num_servers]> e.queue_buffer)
+        self.finished_job_completion_times_arr = \
+            np.asarray(<double[:self.MAX_WINDOW_SIZE]> e.finished_job_duration_buffer)
+        self.arrived_proc_time_arr = np.asarray(<double[:self.MAX_WINDOW_SIZE]> e.arrived_job_proc_time_buffer)
+        self.arrive_iat_time_arr = np.asarray(<double[:self.MAX_WINDOW_SIZE]> e.arrived_job_inter_time_buffer)
 
     def observe(self):
         """
         :return:
         :rtype: np.ndarray
         """
-        self.c_load_balance_env.observe(self.obs)
-        return np.asarray(<double[:self.obs_size]> self.obs)
+        self.c_load_balance_env.observe()
+        return self.obs_arr
 
     def get_observation_len(self):
         """
@@ -125,8 +142,8 @@ cdef class PyLoadBalanceEnv:
         :return:
         :rtype: np.ndarray
         """
-        self.c_load_balance_env.reset(self.obs)
-        return np.asarray(<double[:self.obs_size]> self.obs)
+        self.c_load_balance_env.reset()
+        return self.obs_arr
 
     def step(self, unsigned short act, unsigned short model_index):
         """
@@ -137,34 +154,103 @@ cdef class PyLoadBalanceEnv:
         :return:
         :rtype: (np.ndarray, float, bool, dict[str])
         """
-        cdef step_return ret = self.c_load_balance_env.step(act, model_index, self.server_time,
-                                                            self.finished_job_completion_times, self.arrive_iat_time,
-                                                            self.arrived_proc_time, self.obs)
+        cdef step_return ret = self.c_load_balance_env.step(act, model_index)
         assert ret.num_arrived_jobs <= self.MAX_WINDOW_SIZE
         assert ret.num_finished_jobs <= self.MAX_WINDOW_SIZE
-        cdef np.ndarray[double, ndim=1, mode="c"] arr_job_proc_time
-        cdef np.ndarray[double, ndim=1, mode="c"] arr_job_inter_time
-        if ret.num_arrived_jobs > 0:
-            arr_job_proc_time = np.asarray(<double[:ret.num_arrived_jobs]> self.arrived_proc_time)
-            arr_job_inter_time = np.asarray(<double[:ret.num_arrived_jobs]> self.arrive_iat_time)
-        else:
-            arr_job_proc_time = np.empty(shape=0, dtype=np.double)
-            arr_job_inter_time = arr_job_proc_time
-        return np.asarray(<double[:self.obs_size]> self.obs), \
+        return self.obs_arr, \
                ret.reward, \
                ret.done, \
                {
-                   "arrived_job_proc_time": arr_job_proc_time,
-                   "arrived_job_inter_time": arr_job_inter_time,
-                   "rew_vec_orig": np.asarray(<double[:ret.num_finished_jobs]> self.finished_job_completion_times),
+                   "arrived_job_proc_time": self.arrived_proc_time_arr[:ret.num_arrived_jobs],
+                   "arrived_job_inter_time": self.arrive_iat_time_arr[:ret.num_arrived_jobs],
+                   "rew_vec_orig": self.finished_job_completion_times_arr[:ret.num_finished_jobs],
                    "avg_arrived_job_proc_time": ret.avg_arrived_job_proc_time,
                    "avg_arrived_job_inter_time": ret.avg_arrived_job_inter_time,
-                   "server_time": np.asarray(<double[:self.num_servers]> self.server_time),
+                   "server_time": self.server_time_arr,
                    "time_elapsed": ret.time_elapsed,
                    "curr_time": ret.curr_time,
                    "unsafe": ret.unsafe
                }
 
+    def fast_forward(self, double until_time_ms, unsigned short act):
+        """
+        Advances the simulation in whole time windows with a fixed action, until the next window would end after
+        until_time_ms. Rewards and job logs are skipped for these windows and only the last one is observed, so this is a
+        cheap way to warm up the environment before handing control to an agent. Training wheels and workload averages
+        advance in every window, the env ends in the same state as after step() calls with the same action.
+
+        :param until_time_ms: Simulation time to advance to, in milliseconds
+        :param act: Action taken in every skipped window
+        :type until_time_ms: float
+        :type act: int
+        :return: The observation at the hand-over point and the number of windows that were skipped
+        :rtype: (np.ndarray, int)
+        """
+        cdef unsigned int num_windows = self.c_load_balance_env.fast_forward(until_time_ms, act)
+        return self.obs_arr, num_windows
+
+    def rollout_actions(self, unsigned short horizon, unsigned int num_threads=1):
+        """
+        Plays every action from the current state for a number of windows, each on its own copy of the env, and
+        returns the rewards. The env itself is not advanced.
+
+        :param horizon: Number of windows every action is held for
+        :param num_threads: Native threads the copies are stepped on
+        :type horizon: int
+        :type num_threads: int
+        :return: Reward of every window, shaped [number of actions, horizon]
+        :rtype: np.ndarray
+        """
+        assert num_threads >= 1
+        cdef np.ndarray[double, ndim=2, mode="c"] rewards = \
+            np.zeros((self.c_load_balance_env.action_len(), horizon), dtype=np.float64)
+        cdef double* c_rewards = <double*> rewards.data
+        with nogil:
+            self.c_load_balance_env.rollout_actions(horizon, c_rewards, num_threads)
+        return rewards
+
+    def snapshot(self):
+        """
+        Copies the simulation state, so it can be brought back later with restore(). Trace arrays are shared with
+        the job generator of this env and are never written to.
+
+        :return:
+        :rtype: PyLoadBalanceEnvSnapshot
+        """
+        cdef PyLoadBalanceEnvSnapshot snap = PyLoadBalanceEnvSnapshot.__new__(PyLoadBalanceEnvSnapshot)
+        snap.c_snapshot = new LoadBalanceEnv(self.c_load_balance_env)
+        snap.job_gen = self.job_gen
+        return snap
+
+    def restore(self, PyLoadBalanceEnvSnapshot snap):
+        """
+        Brings the simulation back to a snapshot. The snapshot is left untouched and can be restored again. The log
+        files and the arrays returned by step() and observe() stay attached to this env. The job generator is rewound
+        in place, so the one returned by get_env_job_gen() keeps driving this env and its seek, set_curr_trace and
+        relocate still take effect.
+
+        :param snap:
+        :type snap: PyLoadBalanceEnvSnapshot
+        """
+        assert snap.c_snapshot.num_servers == self.num_servers
+        assert snap.c_snapshot.observation_len() == self.obs_size
+        self.c_load_balance_env.restore(snap.c_snapshot)
+
+    def fork(self):
+        """
+        An independent copy of this env that continues from the current state. The fork drives its own copy of the
+        job generator over shared trace arrays and does not write any logs. get_env_job_gen() of the fork returns
+        the generator the trace arrays belong to.
+
+        :return:
+        :rtype: PyLoadBalanceEnv
+        """
+        cdef PyLoadBalanceEnv forked = PyLoadBalanceEnv.__new__(PyLoadBalanceEnv)
+        forked.c_load_balance_env = new LoadBalanceEnv(self.c_load_balance_env)
+        forked.job_gen = self.job_gen
+        forked.bind_buffers()
+        return forked
+
     def timeline_len(self):
         """
         :return:
@@ -184,8 +270,8 @@ cdef class PyLoadBalanceEnv:
         :return:
         :rtype: np.ndarray
         """
-        self.c_load_balance_env.queue_sizes(self.queue_lens)
-        return np.asarray(<unsigned short[:self.num_servers]> self.queue_lens)
+        self.c_load_balance_env.queue_sizes()
+        return self.queue_lens_arr
 
     def seed(self, unsigned int seed):
         """
@@ -219,6 +305,23 @@ cdef class PyLoadBalanceEnv:
         if arrival_scale > 0:
             self.c_load_balance_env.set_arrival_scale(arrival_scale)
 
+    def get_reward_percentile(self):
+        """
+        :return:
+        :rtype: float
+        """
+        return self.c_load_balance_env.get_reward_percentile()
+
+    def set_reward_percentile(self, double reward_percentile):
+        """
+        The reward of a step is this percentile of the durations of the jobs finished in it
+
+        :param reward_percentile: between 0 and 1, e.g. 0.5, 0.95 or 0.99
+        :type reward_percentile: float
+        """
+        assert 0 <= reward_percentile <= 1
+        self.c_load_balance_env.set_reward_percentile(reward_percentile)
+
     def get_work_measure(self):
         """
         :return:
@@ -232,11 +335,326 @@ cdef class PyLoadBalanceEnv:
         return self.c_load_balance_env.MAX_WINDOW_SIZE
 
     def __dealloc__(self):
-        free(<void*> self.obs)
-        free(<void*> self.server_time)
-        free(<void*> self.queue_lens)
-        free(<void*> self.finished_job_completion_times)
-        free(<void*> self.arrived_proc_time)
-        free(<void*> self.arrive_iat_time)
-        del self.c_load_balance_env
+        if self.c_load_balance_env != NULL:
+            del self.c_load_balance_env
         self.job_gen = None
+
+
+cdef class PyLoadBalanceEnvSnapshot:
+    cdef LoadBalanceEnv* c_snapshot
+    cdef object job_gen
+
+    def __cinit__(self):
+        self.c_snapshot = NULL
+
+    def __dealloc__(self):
+        if self.c_snapshot != NULL:
+            del self.c_snapshot
+        self.job_gen = None
+
+
+cdef class PyLoadBalanceEnvBatch:
+    cdef LoadBalanceEnvBatch* c_load_balance_env_batch
+    cdef int num_envs
+    cdef int obs_size
+    cdef int num_servers
+    cdef int MAX_WINDOW_SIZE
+    cdef object job_gens
+    cdef object obs_arr
+    cdef object rew_arr
+    cdef object done_arr
+    cdef object server_time_arr
+    cdef object finished_job_completion_times_arr
+    cdef object arrived_proc_time_arr
+    cdef object arrive_iat_time_arr
+    cdef object num_finished_jobs_arr
+    cdef object num_arrived_jobs_arr
+    cdef object avg_arrived_proc_time_arr
+    cdef object avg_arrived_iat_time_arr
+    cdef object time_elapsed_arr
+    cdef object curr_time_arr
+    cdef object unsafe_arr
+    cdef object queue_lens_arr
+    cdef object work_measure_arr
+
+    def __init__(self, unsigned short num_servers, double time_window, bool load_in_obs, bool act_in_obs,
+                 bool trace_in_obs, bool ext_in_obs, str filename_log, list timeouts, list service_rates,
+                 int max_retries, bool use_tw, unsigned short upper_unsafe_bound, unsigned short lower_safe_bound,
+                 list job_gens, unsigned int seed_rng, bool skip_log, unsigned int num_threads=1,
+                 str event_queue='binary_heap', unsigned short num_windows=4,
+                 unsigned short num_work_measure_windows=20):
+        pass
+
+    def __cinit__(self, unsigned short num_servers, double time_window, bool load_in_obs, bool act_in_obs,
+                  bool trace_in_obs, bool ext_in_obs, str filename_log, list timeouts, list service_rates,
+                  int max_retries, bool use_tw, unsigned short upper_unsafe_bound, unsigned short lower_safe_bound,
+                  list job_gens, unsigned int seed_rng, bool skip_log, unsigned int num_threads=1,
+                  str event_queue='binary_heap', unsigned short num_windows=4,
+                  unsigned short num_work_measure_windows=20):
+        """
+        A batch of environments, one per job generator, that are stepped together. All returned arrays are views
+        over buffers owned by the batch, they are overwritten by the next call and should be copied if kept.
+
+        :param num_servers:
+        :param time_window:
+        :param load_in_obs:
+        :param act_in_obs:
+        :param trace_in_obs:
+        :param ext_in_obs:
+        :param filename_log:
+        :param timeouts:
+        :param service_rates:
+        :param max_retries:
+        :param use_tw:
+        :param upper_unsafe_bound:
+        :param lower_safe_bound:
+        :param job_gens:
+        :param seed_rng:
+        :param skip_log:
+        :param num_threads:
+        :param event_queue: Backend of the simulator's event queue, one of EVENT_QUEUES
+        :param num_windows: Number of past time windows the workload statistics in the observation are taken over
+        :param num_work_measure_windows: Number of past time windows the work measure is taken over
+        :type num_servers: int
+        :type time_window: float
+        :type load_in_obs: bool
+        :type act_in_obs: bool
+        :type trace_in_obs: bool
+        :type ext_in_obs: bool
+        :type filename_log: str
+        :type timeouts: list[int]
+        :type service_rates: list[float]
+        :type max_retries: int
+        :type use_tw: bool
+        :type upper_unsafe_bound: int
+        :type lower_safe_bound: int
+        :type job_gens: list[pyjobgenfile.PyJobGenFile or pyjobgensim.PyJobGenSim]
+        :type seed_rng: int
+        :type skip_log: bool
+        :type num_threads: int
+        :type event_queue: str
+        :type num_windows: int
+        :type num_work_measure_windows: int
+        """
+        assert len(job_gens) > 0
+        assert num_threads >= 1
+        assert event_queue in EVENT_QUEUES
+        assert num_windows > 0 and num_work_measure_windows > 0
+        cdef short* c_timeouts = <short*> malloc(sizeof(short)*len(timeouts))
+        cdef short[::1] c_timeouts_view = <short[:len(timeouts)]> c_timeouts
+        for i in range(len(timeouts)):
+            c_timeouts_view[i] = timeouts[i]
+        cdef double* c_service_rates = <double*> malloc(sizeof(double)*len(service_rates))
+        cdef double[::1] c_service_rates_view = <double[:len(service_rates)]> c_service_rates
+        for i in range(len(service_rates)):
+            c_service_rates_view[i] = service_rates[i]
+        cdef JobGen** c_job_gens = <JobGen**> malloc(sizeof(JobGen*)*len(job_gens))
+        for i in range(len(job_gens)):
+            c_job_gens[i] = <JobGen*> <uintptr_t> job_gens[i].get_ptr()
+        # Environments are stepped concurrently, so they can not share a job generator
+        assert len(set(job_gen.get_ptr() for job_gen in job_gens)) == len(job_gens)
+
+        self.job_gens = list(job_gens)
+        self.num_envs = len(job_gens)
+
+        self.c_load_balance_env_batch = new LoadBalanceEnvBatch(self.num_envs, seed_rng, num_servers, time_window,
+                                                                load_in_obs, ext_in_obs, filename_log.encode('utf-8'),
+                                                                act_in_obs, trace_in_obs, c_timeouts, len(timeouts),
+                                                                c_service_rates, len(service_rates), max_retries,
+                                                                c_job_gens, use_tw, upper_unsafe_bound,
+                                                                lower_safe_bound, skip_log, num_threads,
+                                                                EVENT_QUEUES[event_queue], num_windows,
+                                                                num_work_measure_windows)
+        free(<void*> c_timeouts)
+        free(<void*> c_service_rates)
+        free(<void*> c_job_gens)
+
+        self.obs_size = self.c_load_balance_env_batch.obs_len
+        self.num_servers = num_servers
+        self.MAX_WINDOW_SIZE = self.c_load_balance_env_batch.max_window_size
+
+        cdef LoadBalanceEnvBatch* b = self.c_load_balance_env_batch
+        self.obs_arr = np.asarray(<double[:self.num_envs, :self.obs_size]> b.observations)
+        self.rew_arr = np.asarray(<double[:self.num_envs]> b.rewards)
+        self.done_arr = np.asarray(<unsigned char[:self.num_envs]> <unsigned char*> b.dones).view(np.bool_)
+        self.server_time_arr = np.asarray(<double[:self.num_envs, :self.num_servers]> b.server_times)
+        self.finished_job_completion_times_arr = \
+            np.asarray(<double[:self.num_envs, :self.MAX_WINDOW_SIZE]> b.finished_job_durations)
+        self.arrived_proc_time_arr = np.asarray(<double[:self.num_envs, :self.MAX_WINDOW_SIZE]> b.arrived_job_proc_times)
+        self.arrive_iat_time_arr = np.asarray(<double[:self.num_envs, :self.MAX_WINDOW_SIZE]> b.arrived_job_inter_times)
+        self.num_finished_jobs_arr = np.asarray(<unsigned short[:self.num_envs]> b.num_finished_jobs)
+        self.num_arrived_jobs_arr = np.asarray(<unsigned short[:self.num_envs]> b.num_arrived_jobs)
+        self.avg_arrived_proc_time_arr = np.asarray(<double[:self.num_envs]> b.avg_arrived_job_proc_times)
+        self.avg_arrived_iat_time_arr = np.asarray(<double[:self.num_envs]> b.avg_arrived_job_inter_times)
+        self.time_elapsed_arr = np.asarray(<double[:self.num_envs]> b.times_elapsed)
+        self.curr_time_arr = np.asarray(<double[:self.num_envs]> b.curr_times)
+        self.unsafe_arr = np.asarray(<unsigned char[:self.num_envs]> <unsigned char*> b.unsafe).view(np.bool_)
+        self.queue_lens_arr = np.asarray(<unsigned short[:self.num_envs, :self.num_servers]> b.queues)
+        self.work_measure_arr = np.asarray(<double[:self.num_envs]> b.work_measures)
+
+    def get_num_envs(self):
+        """
+        :return:
+        :rtype: int
+        """
+        return self.num_envs
+
+    def get_observation_len(self):
+        """
+        :return:
+        :rtype: int
+        """
+        return self.obs_size
+
+    def get_avg_rate(self):
+        """
+        :return:
+        :rtype: float
+        """
+        return self.c_load_balance_env_batch.envs[0].get_avg_rate()
+
+    def observe(self):
+        """
+        :return: observations of shape [num_envs, obs_len]
+        :rtype: np.ndarray
+        """
+        self.c_load_balance_env_batch.observe()
+        return self.obs_arr
+
+    def reset(self):
+        """
+        :return: observations of shape [num_envs, obs_len]
+        :rtype: np.ndarray
+        """
+        self.c_load_balance_env_batch.reset()
+        return self.obs_arr
+
+    def step(self, np.ndarray actions, unsigned short model_index):
+        """
+        :param actions: one action per environment
+        :param model_index: int
+        :type actions: np.ndarray
+        :type model_index: int
+        :return:
+        :rtype: (np.ndarray, np.ndarray, np.ndarray, dict[str])
+        """
+        assert actions.shape[0] == self.num_envs
+        cdef np.ndarray[np.uint16_t, ndim=1, mode="c"] c_actions = np.ascontiguousarray(actions, dtype=np.uint16)
+        cdef unsigned short* c_actions_p = <unsigned short*> &c_actions[0]
+        with nogil:
+            self.c_load_balance_env_batch.step(c_actions_p, model_index)
+        assert np.all(self.num_arrived_jobs_arr <= self.MAX_WINDOW_SIZE)
+        assert np.all(self.num_finished_jobs_arr <= self.MAX_WINDOW_SIZE)
+        return self.obs_arr, \
+               self.rew_arr, \
+               self.done_arr, \
+               {
+                   "arrived_job_proc_time": [self.arrived_proc_time_arr[i, :n]
+                                             for i, n in enumerate(self.num_arrived_jobs_arr)],
+                   "arrived_job_inter_time": [self.arrive_iat_time_arr[i, :n]
+                                              for i, n in enumerate(self.num_arrived_jobs_arr)],
+                   "rew_vec_orig": [self.finished_job_completion_times_arr[i, :n]
+                                    for i, n in enumerate(self.num_finished_jobs_arr)],
+                   "avg_arrived_job_proc_time": self.avg_arrived_proc_time_arr,
+                   "avg_arrived_job_inter_time": self.avg_arrived_iat_time_arr,
+                   "server_time": self.server_time_arr,
+                   "time_elapsed": self.time_elapsed_arr,
+                   "curr_time": self.curr_time_arr,
+                   "unsafe": self.unsafe_arr
+               }
+
+    def timeline_len(self, int index):
+        """
+        :param index:
+        :type index: int
+        :return:
+        :rtype: int
+        """
+        assert 0 <= index < self.num_envs
+        return self.c_load_balance_env_batch.envs[index].timeline_len()
+
+    def get_env_job_gen(self, int index):
+        """
+        :param index:
+        :type index: int
+        :return:
+        :rtype: pyjobgenfile.PyJobGenFile or pyjobgensim.PyJobGenSim
+        """
+        return self.job_gens[index]
+
+    def queue_sizes(self):
+        """
+        :return: queue sizes of shape [num_envs, num_servers]
+        :rtype: np.ndarray
+        """
+        self.c_load_balance_env_batch.queue_sizes()
+        return self.queue_lens_arr
+
+    def seed(self, unsigned int seed):
+        """
+        :param seed:
+        :type seed: int
+        """
+        assert seed >= 0, "seed must be unsigned int"
+        cdef unsigned int s = seed
+        self.c_load_balance_env_batch.seed(s)
+
+    def close(self):
+        self.c_load_balance_env_batch.close()
+
+    def get_scales(self):
+        """
+        :return:
+        :rtype: list[(float, float)]
+        """
+        return [(self.c_load_balance_env_batch.envs[i].get_arrival_scale(),
+                 self.c_load_balance_env_batch.envs[i].get_size_scale()) for i in range(self.num_envs)]
+
+    def set_scales(self, double arrival_scale=0, double size_scale=0):
+        """
+        :param arrival_scale:
+        :param size_scale:
+        :type arrival_scale: float
+        :type size_scale: float
+        """
+        assert size_scale > 0 or arrival_scale > 0
+        for i in range(self.num_envs):
+            if size_scale > 0:
+                self.c_load_balance_env_batch.envs[i].set_size_scale(size_scale)
+            if arrival_scale > 0:
+                self.c_load_balance_env_batch.envs[i].set_arrival_scale(arrival_scale)
+
+    def get_reward_percentile(self):
+        """
+        :return:
+        :rtype: list[float]
+        """
+        return [self.c_load_balance_env_batch.envs[i].get_reward_percentile() for i in range(self.num_envs)]
+
+    def set_reward_percentile(self, double reward_percentile):
+        """
+        The reward of every environment is this percentile of the durations of the jobs it finished in a step
+
+        :param reward_percentile: between 0 and 1, e.g. 0.5, 0.95 or 0.99
+        :type reward_percentile: float
+        """
+        assert 0 <= reward_percentile <= 1
+        for i in range(self.num_envs):
+            self.c_load_balance_env_batch.envs[i].set_reward_percentile(reward_percentile)
+
+    def get_work_measure(self):
+        """
+        :return:
+        :rtype: np.ndarray
+        """
+        self.c_load_balance_env_batch.get_work_measures()
+        return self.work_measure_arr
+
+    # Attribute access
+    @property
+    def MAX_WINDOW_SIZE(self):
+        return self.c_load_balance_env_batch.max_window_size
+
+    def __dealloc__(self):
+        del self.c_load_balance_env_batch
+        self.job_gens = None
@@ -1,20 +1,52 @@
 # distutils: language = c++
 
-from cy_jobgenfile cimport JobGenFile
+from cy_jobgenfile cimport JobGenFile, JobProcessSample
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
 from libc.stdint cimport uintptr_t
 import numpy as np
 cimport numpy as np
 np.import_array()
 
+def _check_traces(list size_arrs, list arrival_arrs):
+    if len(size_arrs) == 0:
+        raise ValueError("No traces given")
+    if len(arrival_arrs) != len(size_arrs):
+        raise ValueError(f"Got {len(size_arrs)} size arrays but {len(arrival_arrs)} arrival arrays")
+    for i, (size_arr, arrival_arr) in enumerate(zip(size_arrs, arrival_arrs)):
+        if np.ndim(size_arr) != 1 or np.ndim(arrival_arr) != 1:
+            raise ValueError(f"Trace {i} size and arrival arrays must be one dimensional")
+        if len(size_arr) != len(arrival_arr) or len(size_arr) == 0:
+            raise ValueError(f"Trace {i} has {len(size_arr)} sizes and {len(arrival_arr)} arrival times, they must be "
+                             f"equally long and not empty")
+
+def _borrowable(list arrs):
+    """
+    The arrays as they are if the generator can read all of them in place, float64 with one common positive stride,
+    and contiguous float64 copies of all of them otherwise
+
+    :param arrs:
+    :type arrs: list[np.ndarray]
+    :return:
+    :rtype: list[np.ndarray]
+    """
+    arrs = [np.asarray(arr) for arr in arrs]
+    strides = {arr.strides[0] for arr in arrs}
+    stride = next(iter(strides))
+    if all(arr.dtype == np.float64 for arr in arrs) and len(strides) == 1 and stride > 0 and \
+            stride % sizeof(double) == 0:
+        return arrs
+    return [np.ascontiguousarray(arr, dtype=np.double) for arr in arrs]
+
 cdef class PyJobGenFile:
     cdef JobGenFile* c_job_gen
     cdef int num_states
     cdef int* c_len_arrs
     cdef double rate_chosen
+    cdef object borrowed_arrs
 
     def __init__(self, list size_arrs, list arrival_arrs, int start_state, double hold_time, int num_servers,
-                  unsigned int seed_rng, double rate_chosen):
+                  unsigned int seed_rng, double rate_chosen, bint borrow=False, list time_arrs=None,
+                  list start_indices=None):
         """
         :param size_arrs:
         :param arrival_arrs:
@@ -23,6 +55,9 @@ cdef class PyJobGenFile:
         :param num_servers:
         :param seed_rng:
         :param rate_chosen:
+        :param borrow:
+        :param time_arrs:
+        :param start_indices:
         :type size_arrs: list[np.ndarray]
         :type arrival_arrs: list[np.ndarray]
         :type start_state: int
@@ -30,12 +65,23 @@ cdef class PyJobGenFile:
         :type num_servers: int
         :type seed_rng: int
         :type rate_chosen: float
+        :type borrow: bool
+        :type time_arrs: list[np.ndarray] or None
+        :type start_indices: list[int] or None
         """
         pass
 
     def __cinit__(self, list size_arrs, list arrival_arrs, int start_state, double hold_time, int num_servers,
-                  unsigned int seed_rng, double rate_chosen):
+                  unsigned int seed_rng, double rate_chosen, bint borrow=False, list time_arrs=None,
+                  list start_indices=None):
         """
+        With borrow, the generator reads the given arrays in place instead of copying them, e.g. columns of a trace
+        loaded with np.load(..., mmap_mode='r'), so every env and process shares one copy of the trace. The arrays
+        may be read-only and strided, but all must have the same stride. time_arrs, the contiguous cumulative
+        arrival times of every trace, can be shared the same way and are computed per generator otherwise.
+        start_indices is the job every trace starts from, also after reset. Both are only used with borrow. Arrays that
+        cannot be read in place (not float64, or with differing strides) are converted once and owned by the generator.
+
         :param size_arrs:
         :param arrival_arrs:
         :param start_state:
@@ -43,6 +89,9 @@ cdef class PyJobGenFile:
         :param num_servers:
         :param seed_rng:
         :param rate_chosen:
+        :param borrow:
+        :param time_arrs:
+        :param start_indices:
         :type size_arrs: list[np.ndarray]
         :type arrival_arrs: list[np.ndarray]
         :type start_state: int
@@ -50,9 +99,23 @@ cdef class PyJobGenFile:
         :type num_servers: int
         :type seed_rng: int
         :type rate_chosen: float
+        :type borrow: bool
+        :type time_arrs: list[np.ndarray] or None
+        :type start_indices: list[int] or None
         """
         self.num_states = len(size_arrs)
-        assert len(arrival_arrs) == self.num_states
+        self.rate_chosen = rate_chosen
+        # Everything is checked before anything is allocated, so a bad trace raises without leaking
+        _check_traces(size_arrs, arrival_arrs)
+        if borrow:
+            self.borrow_arrays(size_arrs, arrival_arrs, time_arrs, start_indices, start_state, hold_time,
+                               num_servers, seed_rng, rate_chosen)
+            return
+        if time_arrs is not None or start_indices is not None:
+            raise ValueError("time_arrs and start_indices are only supported with borrow")
+        # Kept alive until the generator has copied them
+        size_conts = [np.ascontiguousarray(arr, dtype=np.double) for arr in size_arrs]
+        arrival_conts = [np.ascontiguousarray(arr, dtype=np.double) for arr in arrival_arrs]
         cdef double** c_size_arrs = <double**> PyMem_Malloc(self.num_states * sizeof(double*))
         cdef double** c_arrival_arrs = <double**> PyMem_Malloc(self.num_states * sizeof(double*))
         self.c_len_arrs = <int*> PyMem_Malloc(self.num_states * sizeof(int))
@@ -60,22 +123,79 @@ cdef class PyJobGenFile:
         cdef np.ndarray[double, ndim=1, mode="c"] arrival_cont
 
         for i in range(self.num_states):
-            size_cont = np.ascontiguousarray(size_arrs[i], dtype=np.double)
-            arrival_cont = np.ascontiguousarray(arrival_arrs[i], dtype=np.double)
-            assert size_cont.ndim == 1
-            assert arrival_cont.ndim == 1
-            assert size_cont.shape[0] == arrival_cont.shape[0]
+            size_cont = size_conts[i]
+            arrival_cont = arrival_conts[i]
             self.c_len_arrs[i] = size_cont.shape[0]
             c_size_arrs[i] = &size_cont[0]
             c_arrival_arrs[i] = &arrival_cont[0]
 
         self.c_job_gen = new JobGenFile(c_size_arrs, c_arrival_arrs, self.c_len_arrs, self.num_states, start_state,
                                         hold_time, num_servers, seed_rng, rate_chosen)
-        self.rate_chosen = rate_chosen
 
         PyMem_Free(c_size_arrs)
         PyMem_Free(c_arrival_arrs)
 
+    cdef borrow_arrays(self, list size_arrs, list arrival_arrs, list time_arrs, list start_indices, int start_state,
+                       double hold_time, int num_servers, unsigned int seed_rng, double rate_chosen):
+        # Sizes and arrival times are read with one stride, so they are converted together if any has to be
+        arrs = _borrowable(size_arrs + arrival_arrs)
+        size_arrs = arrs[:self.num_states]
+        arrival_arrs = arrs[self.num_states:]
+        if time_arrs is not None:
+            if len(time_arrs) != self.num_states:
+                raise ValueError(f"Got {len(time_arrs)} time arrays for {self.num_states} traces")
+            time_arrs = [np.ascontiguousarray(arr, dtype=np.double) for arr in time_arrs]
+            for i in range(self.num_states):
+                if time_arrs[i].shape != (len(size_arrs[i]),):
+                    raise ValueError(f"Trace {i} has {len(size_arrs[i])} jobs but time array of shape "
+                                     f"{time_arrs[i].shape}")
+        if start_indices is not None:
+            if len(start_indices) != self.num_states:
+                raise ValueError(f"Got {len(start_indices)} start indices for {self.num_states} traces")
+            for i in range(self.num_states):
+                if not 0 <= start_indices[i] < len(size_arrs[i]):
+                    raise ValueError(f"Start index {start_indices[i]} out of range for trace {i} with "
+                                     f"{len(size_arrs[i])} jobs")
+
+        cdef const double** c_size_arrs = <const double**> PyMem_Malloc(self.num_states * sizeof(double*))
+        cdef const double** c_arrival_arrs = <const double**> PyMem_Malloc(self.num_states * sizeof(double*))
+        cdef const double** c_time_arrs = NULL
+        cdef int* c_start_steps = NULL
+        self.c_len_arrs = <int*> PyMem_Malloc(self.num_states * sizeof(int))
+        cdef const double[:] size_view
+        cdef const double[:] arrival_view
+        cdef const double[::1] time_view
+        cdef Py_ssize_t stride = 0
+
+        for i in range(self.num_states):
+            size_view = size_arrs[i]
+            arrival_view = arrival_arrs[i]
+            stride = size_view.strides[0]
+            self.c_len_arrs[i] = size_view.shape[0]
+            c_size_arrs[i] = &size_view[0]
+            c_arrival_arrs[i] = &arrival_view[0]
+
+        if time_arrs is not None:
+            c_time_arrs = <const double**> PyMem_Malloc(self.num_states * sizeof(double*))
+            for i in range(self.num_states):
+                time_view = time_arrs[i]
+                c_time_arrs[i] = &time_view[0]
+        if start_indices is not None:
+            c_start_steps = <int*> PyMem_Malloc(self.num_states * sizeof(int))
+            for i in range(self.num_states):
+                c_start_steps[i] = start_indices[i]
+
+        # The C++ generator only keeps pointers, the arrays have to outlive it
+        self.borrowed_arrs = (size_arrs, arrival_arrs, time_arrs)
+        self.c_job_gen = new JobGenFile(c_size_arrs, c_arrival_arrs, c_time_arrs, stride // sizeof(double),
+                                        self.c_len_arrs, c_start_steps, self.num_states, start_state, hold_time,
+                                        num_servers, seed_rng, rate_chosen)
+
+        PyMem_Free(c_size_arrs)
+        PyMem_Free(c_arrival_arrs)
+        PyMem_Free(c_time_arrs)
+        PyMem_Free(c_start_steps)
+
     def gen_job(self):
         """
         :return:
@@ -83,6 +203,25 @@ cdef class PyJobGenFile:
         """
         return self.c_job_gen.gen_job()
 
+    def gen_jobs(self, int num_jobs):
+        """
+        Generates the next num_jobs jobs in the trace format, column 0 is the size and column 1 the inter arrival time.
+
+        :param num_jobs:
+        :type num_jobs: int
+        :return:
+        :rtype: np.ndarray
+        """
+        jobs = np.empty((num_jobs, 2), dtype=np.float64)
+        cdef double[:, ::1] jobs_view = jobs
+        cdef JobProcessSample* samples = <JobProcessSample*> PyMem_Malloc(num_jobs * sizeof(JobProcessSample))
+        self.c_job_gen.gen_jobs(samples, num_jobs)
+        for i in range(num_jobs):
+            jobs_view[i, 0] = samples[i].size
+            jobs_view[i, 1] = samples[i].inter_arrival_time
+        PyMem_Free(samples)
+        return jobs
+
     cpdef get_ptr(self):
         """
         :return:
@@ -148,8 +287,22 @@ cdef class PyJobGenFile:
         """
         return self.c_job_gen.get_curr_index()
 
-    def seek(self, double time_point):
-        self.c_job_gen.seek(time_point)
+    def seek(self, *args):
+        """
+        Called as seek(time_point), moves the current trace to time_point. Called as seek(trace, time_ms), moves
+        the given trace to the first job arriving after time_ms, wrapped around the trace length, and keeps it as the
+        starting point of that trace after reset.
+
+        :return: the new step of the trace, for seek(trace, time_ms)
+        :rtype: int or None
+        """
+        if len(args) == 1:
+            self.c_job_gen.seek(<double> args[0])
+            return None
+        cdef int trace = args[0]
+        cdef double time_ms = args[1]
+        assert 0 <= trace < self.num_states
+        return self.c_job_gen.seek(trace, time_ms)
 
     def get_num_traces(self):
         """
@@ -173,5 +326,6 @@ cdef class PyJobGenFile:
     def __dealloc__(self):
         PyMem_Free(self.c_len_arrs)
         del self.c_job_gen
+        self.borrowed_arrs = None
 
 
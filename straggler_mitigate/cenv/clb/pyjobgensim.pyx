@@ -1,8 +1,9 @@
 # distutils: language = c++
 
-from cy_jobgensim cimport JobGenSim, dist_type, dist_param
+from cy_jobgensim cimport JobGenSim, JobProcessSample, dist_type, dist_param
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
 from libc.stdint cimport uintptr_t
+import numpy as np
 
 def get_c_dist_param(str type_dist, **kwargs):
     """
@@ -78,6 +79,25 @@ cdef class PyJobGenSim:
         """
         return self.c_job_gen.gen_job()
 
+    def gen_jobs(self, int num_jobs):
+        """
+        Generates the next num_jobs jobs in the trace format, column 0 is the size and column 1 the inter arrival time.
+
+        :param num_jobs:
+        :type num_jobs: int
+        :return:
+        :rtype: np.ndarray
+        """
+        jobs = np.empty((num_jobs, 2), dtype=np.float64)
+        cdef double[:, ::1] jobs_view = jobs
+        cdef JobProcessSample* samples = <JobProcessSample*> PyMem_Malloc(num_jobs * sizeof(JobProcessSample))
+        self.c_job_gen.gen_jobs(samples, num_jobs)
+        for i in range(num_jobs):
+            jobs_view[i, 0] = samples[i].size
+            jobs_view[i, 1] = samples[i].inter_arrival_time
+        PyMem_Free(samples)
+        return jobs
+
     cpdef get_ptr(self):
         """
         :return:
@@ -1,467 +1,160 @@
 # distutils: language = c++
 
-from libc.stdlib cimport malloc, free
 from libcpp cimport bool
-from libc.stdio cimport fopen, fclose, FILE, fseek, SEEK_END, SEEK_SET
-from libc.stdio cimport ftell, fread
-from cython.operator cimport dereference as deref
 from cy_logsort cimport LogSorter
+import os
 import numpy as np
-cimport numpy as np
-np.import_array()
 
 LEN_LOG = 33
 
-def sort_logs(filenames, file_out, valid=True, size_max_heap=2000):
-    _sort_logs(filenames, file_out, valid, size_max_heap)
-
-
-def read_constrained_log(filename, offset, arr_limit=250000000, wlen=500):
-    ids, timeout_idx, first, arrival, delay, num_instance, instance_index, qu, first_qu, size, model_index, tw, \
-        trace_index, duration, first_duration, done = _read_constrained_log(filename, offset, arr_limit, wlen)
-    return {
-            "ID": ids,
-            "TIMEOUT_INDEX": timeout_idx,
-            "FIRST": first,
-            "ARRIVAL": arrival,
-            "DELAY": delay,
-            "NUM_INSTANCES": num_instance,
-            "INSTANCE_INDEX": instance_index,
-            "QUEUE": qu,
-            "QUEUE_FIRST": first_qu,
-            "SIZE": size,
-            "MODEL_INDEX": model_index,
-            "TRAINING WHEELS": tw,
-            "TRACE_INDEX": trace_index,
-            "PROC": duration,
-            "PROC_FIRST": first_duration,
-    }, done
-
-def read_all_logs(filenames, valid=True):
-    count = 0
-    for file in filenames:
-        count += _count_log(file, valid)
-    ids, timeout_idx, first, arrival, delay, num_instance, instance_index, qu, first_qu, size, model_index, tw, \
-        trace_index, duration, first_duration = _read_all_logs(filenames, count, valid)
-    return {
-            "ID": ids,
-            "TIMEOUT_INDEX": timeout_idx,
-            "FIRST": first,
-            "ARRIVAL": arrival,
-            "DELAY": delay,
-            "NUM_INSTANCES": num_instance,
-            "INSTANCE_INDEX": instance_index,
-            "QUEUE": qu,
-            "QUEUE_FIRST": first_qu,
-            "SIZE": size,
-            "MODEL_INDEX": model_index,
-            "TRAINING WHEELS": tw,
-            "TRACE_INDEX": trace_index,
-            "PROC": duration,
-            "PROC_FIRST": first_duration
-    }
-
-
-def read_log(filename):
-    ids, timeout_idx, first, arrival, delay, num_instance, instance_index, qu, first_qu, size, model_index, tw, \
-        trace_index, duration, first_duration = _read_log(filename)
-    return {
-            "ID": ids,
-            "TIMEOUT_INDEX": timeout_idx,
-            "FIRST": first,
-            "ARRIVAL": arrival,
-            "DELAY": delay,
-            "NUM_INSTANCES": num_instance,
-            "INSTANCE_INDEX": instance_index,
-            "QUEUE": qu,
-            "QUEUE_FIRST": first_qu,
-            "SIZE": size,
-            "MODEL_INDEX": model_index,
-            "TRAINING WHEELS": tw,
-            "TRACE_INDEX": trace_index,
-            "PROC": duration,
-            "PROC_FIRST": first_duration,
-    }
-
-cdef _sort_logs(list filenames, str file_out, bool valid, int size_max_heap):
-    cdef LogSorter* log_sorter = new LogSorter(file_out.encode('utf-8'), valid, size_max_heap)
-    for file_in in filenames:
-        log_sorter.add_file(file_in.encode('utf-8'))
-    log_sorter.flush()
-    del log_sorter
-
-    py_byte_string = file_out.encode('UTF-8')
-    cdef char* c_string = py_byte_string
-    cdef FILE *fp = fopen(py_byte_string, "r")
-    if fp == NULL:
-        raise FileNotFoundError(2, "No such file or directory: '%s'" % file_out)
-    # get the length of the file
-    fseek(fp, 0, SEEK_END)
-    file_size = ftell(fp)
-    cdef unsigned int array_size = file_size / LEN_LOG
-    assert file_size % LEN_LOG == 0
-    fseek(fp, 0, SEEK_SET)
-    # allocate memory for reading in the file
-    cdef char* buffer = <char*>malloc(LEN_LOG*sizeof(char))
-    cdef int* id_p = <int*> buffer
-    cdef int prev_id = -1
-
-    cdef size_t i
-    for i in range(array_size):
-        # read file piece into buffer
-        assert fread(buffer, 1, LEN_LOG, fp) == LEN_LOG
-        assert deref(id_p) > prev_id, f"ID diff at index {i}/{array_size}: prev was {prev_id}, new is: {str_entry(buffer)}"
-        prev_id = deref(id_p)
-
-    # close the file once it's read into the char array
-    fclose(fp)
-    free(buffer)
-
-
-cdef str_entry(char* buffer):
-    return f'ID:{deref(<int*> buffer)}\n' + f'Timeout Index:{deref(<unsigned char*> (buffer+4))}\n' + \
-           f'First:{deref(<bool*> (buffer+5))}\n' + f'Arrival:{deref(<float*> (buffer+6))}\n' + \
-           f'Delay:{deref(<float*> (buffer+10))}\n' + f'Number of Instances:{deref(<unsigned char*> (buffer+14))}\n' + \
-           f'Instance Index:{deref(<unsigned char*> (buffer+15))}\n' + \
-           f'Queue:{deref(<unsigned char*> (buffer+16))}\n' + f'First Queue:{deref(<unsigned char*> (buffer+17))}\n' + \
-           f'Size:{deref(<float*> (buffer+18))}\n' + \
-           f'Model Index:{deref(<unsigned char*> (buffer+22))}\n' + f'TW:{deref(<bool*> (buffer+23))}\n' + \
-           f'Trace Index:{deref(<unsigned char*> (buffer+24))}\n' + f'Duration:{deref(<float*> (buffer+25))}\n' + \
-           f'First Duration:{deref(<float*> (buffer+29))}\n'
-
-
-cdef _read_constrained_log(str filename, unsigned int offset, unsigned int arr_limit, double wlen):
-    py_byte_string = filename.encode('UTF-8')
-    cdef char* c_string = py_byte_string
-    cdef FILE *fp = fopen(py_byte_string, "r")
-    if fp == NULL:
+# Per-job log records as Logger writes them, packed without padding
+LOG_DTYPE = np.dtype([
+    ('ID', '<i4'),
+    ('TIMEOUT_INDEX', 'u1'),
+    ('FIRST', '?'),
+    ('ARRIVAL', '<f4'),
+    ('DELAY', '<f4'),
+    ('NUM_INSTANCES', 'u1'),
+    ('INSTANCE_INDEX', 'u1'),
+    ('QUEUE', 'u1'),
+    ('QUEUE_FIRST', 'u1'),
+    ('SIZE', '<f4'),
+    ('MODEL_INDEX', 'u1'),
+    ('TRAINING WHEELS', '?'),
+    ('TRACE_INDEX', 'u1'),
+    ('PROC', '<f4'),
+    ('PROC_FIRST', '<f4'),
+])
+assert LOG_DTYPE.itemsize == LEN_LOG
+
+def sort_logs(filenames, file_out, valid=True, run_records=4194304, num_threads=1):
+    """
+    External merge sort of per-job logs by job ID into file_out, IDs are checked to be strictly increasing on the way
+
+    :param filenames: per-job log files, in any order
+    :param file_out: sorted output, sorted runs are kept next to it as file_out.run<i> until the merge is done
+    :param valid: keep the first completed instance of every job if True, the other instances otherwise
+    :param run_records: entries per sorted run, memory use is about (num_threads + 1) * run_records * 33 bytes
+    :param num_threads: runs sorted concurrently
+    :type filenames: list[str]
+    :type file_out: str
+    :type valid: bool
+    :type run_records: int
+    :type num_threads: int
+    """
+    _sort_logs(filenames, file_out, valid, run_records, num_threads)
+
+
+def map_log(filename):
+    """
+    Memory maps a per-job log without copying it, fields are read as e.g. map_log(filename)['DELAY']
+
+    :param filename:
+    :type filename: str
+    :return: read-only structured array of LOG_DTYPE records
+    :rtype: np.ndarray
+    """
+    if not os.path.exists(filename):
         raise FileNotFoundError(2, "No such file or directory: '%s'" % filename)
-    # get the length of the file
-    fseek(fp, 0, SEEK_END)
-    file_size = ftell(fp)
-    cdef unsigned int array_size = file_size / LEN_LOG
+    file_size = os.path.getsize(filename)
     assert file_size % LEN_LOG == 0
-    cdef size_t jump = <size_t>offset * LEN_LOG
-    fseek(fp, jump, SEEK_SET)
-    # allocate memory for reading in the file
-    cdef char* buffer = <char*>malloc(LEN_LOG*sizeof(char))
-    cdef int* id_p = <int*> buffer
-    cdef unsigned char* timeout_idx_p = <unsigned char*> (buffer+4)
-    cdef bool* first_p = <bool*> (buffer+5)
-    cdef float* arrival_p = <float*> (buffer+6)
-    cdef float* delay_p = <float*> (buffer+10)
-    cdef unsigned char* num_instance_p = <unsigned char*> (buffer+14)
-    cdef unsigned char* instance_index_p = <unsigned char*> (buffer+15)
-    cdef unsigned char* qu_p = <unsigned char*> (buffer+16)
-    cdef unsigned char* first_qu_p = <unsigned char*> (buffer+17)
-    cdef float* size_p = <float*> (buffer+18)
-    cdef unsigned char* model_index_p = <unsigned char*> (buffer+22)
-    cdef bool* tw_p = <bool*> (buffer+23)
-    cdef unsigned char* trace_index_p = <unsigned char*> (buffer+24)
-    cdef float* duration_p = <float*> (buffer+25)
-    cdef float* first_duration_p = <float*> (buffer+29)
-
-    assert array_size > offset
-    cdef unsigned int max_read = min(array_size-offset, arr_limit)
-
-    cdef int[:] id_view = np.empty(shape=max_read, dtype=np.int32)
-    cdef unsigned char[:] timeout_idx_view = np.empty(shape=max_read, dtype=np.uint8)
-    cdef bool[:] first_view = np.empty(shape=max_read, dtype=np.bool)
-    cdef float[:] arrival_view = np.empty(shape=max_read, dtype=np.float32)
-    cdef float[:] delay_view = np.empty(shape=max_read, dtype=np.float32)
-    cdef unsigned char[:] num_instance_view = np.empty(shape=max_read, dtype=np.uint8)
-    cdef unsigned char[:] instance_index_view = np.empty(shape=max_read, dtype=np.uint8)
-    cdef unsigned char[:] qu_view = np.empty(shape=max_read, dtype=np.uint8)
-    cdef unsigned char[:] first_qu_view = np.empty(shape=max_read, dtype=np.uint8)
-    cdef float[:] size_view = np.empty(shape=max_read, dtype=np.float32)
-    cdef unsigned char[:] model_index_view = np.empty(shape=max_read, dtype=np.uint8)
-    cdef bool[:] tw_view = np.empty(shape=max_read, dtype=np.bool)
-    cdef unsigned char[:] trace_index_view = np.empty(shape=max_read, dtype=np.uint8)
-    cdef float[:] duration_view = np.empty(shape=max_read, dtype=np.float32)
-    cdef float[:] first_duration_view = np.empty(shape=max_read, dtype=np.float32)
-
-    cdef size_t i
-    cdef size_t last_pos = 0
-    cdef float last_time = 0
-    cdef int last_win = 0
-    cdef int last_trace = 0
-
-    for i in range(max_read):
-        # read file piece into buffer
-        assert fread(buffer, 1, LEN_LOG, fp) == LEN_LOG
-        if deref(trace_index_p) != last_trace:
-            last_trace = deref(trace_index_p)
-            last_time = deref(arrival_p)
-            last_pos = i
-        elif int((deref(arrival_p)-last_time) // wlen) > last_win:
-            last_win = int((deref(arrival_p)-last_time) // wlen)
-            last_pos = i
-        id_view[i] = deref(id_p)
-        timeout_idx_view[i] = deref(timeout_idx_p)
-        first_view[i] = deref(first_p)
-        arrival_view[i] = deref(arrival_p)
-        delay_view[i] = deref(delay_p)
-        num_instance_view[i] = deref(num_instance_p)
-        instance_index_view[i] = deref(instance_index_p)
-        qu_view[i] = deref(qu_p)
-        first_qu_view[i] = deref(first_qu_p)
-        size_view[i] = deref(size_p)
-        model_index_view[i] = deref(model_index_p)
-        tw_view[i] = deref(tw_p)
-        trace_index_view[i] = deref(trace_index_p)
-        duration_view[i] = deref(duration_p)
-        first_duration_view[i] = deref(first_duration_p)
+    if file_size == 0:
+        # Empty files can not be mapped
+        return np.empty(0, dtype=LOG_DTYPE)
+    return np.memmap(filename, dtype=LOG_DTYPE, mode='r')
+
+
+def iter_log(filename, chunk_rows=1048576):
+    """
+    Streams a per-job log in chunks of chunk_rows records, every chunk is a view of the memory mapped file so only the
+    pages being analyzed need to be resident
+
+    :param filename:
+    :param chunk_rows:
+    :type filename: str
+    :type chunk_rows: int
+    :return: read-only structured arrays of LOG_DTYPE records
+    :rtype: collections.Iterable[np.ndarray]
+    """
+    mapped = map_log(filename)
+    for start in range(0, len(mapped), chunk_rows):
+        yield mapped[start:start + chunk_rows]
+
+
+def log_fields(records):
+    """
+    :param records: structured array of LOG_DTYPE records
+    :type records: np.ndarray
+    :return: a view of every field, by field name
+    :rtype: dict[str, np.ndarray]
+    """
+    return {name: records[name] for name in LOG_DTYPE.names}
 
-    # close the file once it's read into the char array
-    fclose(fp)
-    free(buffer)
 
-    if max_read == arr_limit:
-        return np.asarray(id_view[0:last_pos:1]), \
-               np.asarray(timeout_idx_view[0:last_pos:1]), \
-               np.asarray(first_view[0:last_pos:1]), \
-               np.asarray(arrival_view[0:last_pos:1]), \
-               np.asarray(delay_view[0:last_pos:1]), \
-               np.asarray(num_instance_view[0:last_pos:1]), \
-               np.asarray(instance_index_view[0:last_pos:1]), \
-               np.asarray(qu_view[0:last_pos:1]), \
-               np.asarray(first_qu_view[0:last_pos:1]), \
-               np.asarray(size_view[0:last_pos:1]), \
-               np.asarray(model_index_view[0:last_pos:1]), \
-               np.asarray(tw_view[0:last_pos:1]), \
-               np.asarray(trace_index_view[0:last_pos:1]), \
-               np.asarray(duration_view[0:last_pos:1]), \
-               np.asarray(first_duration_view[0:last_pos:1]), \
-               False
-    else:
-        return np.asarray(id_view), \
-               np.asarray(timeout_idx_view), \
-               np.asarray(first_view), \
-               np.asarray(arrival_view), \
-               np.asarray(delay_view), \
-               np.asarray(num_instance_view), \
-               np.asarray(instance_index_view), \
-               np.asarray(qu_view), \
-               np.asarray(first_qu_view), \
-               np.asarray(size_view), \
-               np.asarray(model_index_view), \
-               np.asarray(tw_view), \
-               np.asarray(trace_index_view), \
-               np.asarray(duration_view), \
-               np.asarray(first_duration_view), \
-               True
-
-
-cdef _read_all_logs(list filenames, int array_size, bool valid):
-    # allocate memory for reading in the file
-    cdef int[:] id_view = np.empty(shape=array_size, dtype=np.int32)
-    cdef unsigned char[:] timeout_idx_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef bool[:] first_view = np.empty(shape=array_size, dtype=np.bool)
-    cdef float[:] arrival_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef float[:] delay_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef unsigned char[:] num_instance_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef unsigned char[:] instance_index_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef unsigned char[:] qu_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef unsigned char[:] first_qu_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef float[:] size_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef unsigned char[:] model_index_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef bool[:] tw_view = np.empty(shape=array_size, dtype=np.bool)
-    cdef unsigned char[:] trace_index_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef float[:] duration_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef float[:] first_duration_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef size_t i = 0
-    cdef char* buffer = <char*>malloc(LEN_LOG*sizeof(char))
-    cdef int* id_p = <int*> buffer
-    cdef unsigned char* timeout_idx_p = <unsigned char*> (buffer+4)
-    cdef bool* first_p = <bool*> (buffer+5)
-    cdef float* arrival_p = <float*> (buffer+6)
-    cdef float* delay_p = <float*> (buffer+10)
-    cdef unsigned char* num_instance_p = <unsigned char*> (buffer+14)
-    cdef unsigned char* instance_index_p = <unsigned char*> (buffer+15)
-    cdef unsigned char* qu_p = <unsigned char*> (buffer+16)
-    cdef unsigned char* first_qu_p = <unsigned char*> (buffer+17)
-    cdef float* size_p = <float*> (buffer+18)
-    cdef unsigned char* model_index_p = <unsigned char*> (buffer+22)
-    cdef bool* tw_p = <bool*> (buffer+23)
-    cdef unsigned char* trace_index_p = <unsigned char*> (buffer+24)
-    cdef float* duration_p = <float*> (buffer+25)
-    cdef float* first_duration_p = <float*> (buffer+29)
-    cdef char* c_string
-    cdef FILE *fp
-    cdef unsigned int row_size
-
-    for filename in filenames:
-        py_byte_string = filename.encode('UTF-8')
-        c_string = py_byte_string
-        fp = fopen(py_byte_string, "r")
-
-        if fp == NULL:
-            raise FileNotFoundError(2, "No such file or directory: '%s'" % filename)
-        # get the length of the file
-        fseek(fp, 0, SEEK_END)
-        file_size = ftell(fp)
-        row_size = file_size / LEN_LOG
-        assert file_size % LEN_LOG == 0
-        fseek(fp, 0, SEEK_SET)
-
-        for i_file in range(row_size):
-            # read file piece into buffer
-            assert fread(buffer, 1, LEN_LOG, fp) == LEN_LOG
-            if deref(first_p) == valid:
-                id_view[i] = deref(id_p)
-                timeout_idx_view[i] = deref(timeout_idx_p)
-                first_view[i] = deref(first_p)
-                arrival_view[i] = deref(arrival_p)
-                delay_view[i] = deref(delay_p)
-                num_instance_view[i] = deref(num_instance_p)
-                instance_index_view[i] = deref(instance_index_p)
-                qu_view[i] = deref(qu_p)
-                first_qu_view[i] = deref(first_qu_p)
-                size_view[i] = deref(size_p)
-                model_index_view[i] = deref(model_index_p)
-                tw_view[i] = deref(tw_p)
-                trace_index_view[i] = deref(trace_index_p)
-                duration_view[i] = deref(duration_p)
-                first_duration_view[i] = deref(first_duration_p)
-                i += 1
-
-        # close the file once it's read into the char array
-        fclose(fp)
-
-    free(buffer)
-    return np.asarray(id_view), \
-           np.asarray(timeout_idx_view), \
-           np.asarray(first_view), \
-           np.asarray(arrival_view), \
-           np.asarray(delay_view), \
-           np.asarray(num_instance_view), \
-           np.asarray(instance_index_view), \
-           np.asarray(qu_view), \
-           np.asarray(first_qu_view), \
-           np.asarray(size_view), \
-           np.asarray(model_index_view), \
-           np.asarray(tw_view), \
-           np.asarray(trace_index_view), \
-           np.asarray(duration_view), \
-           np.asarray(first_duration_view)
-
-
-cdef _read_log(str filename):
-    py_byte_string = filename.encode('UTF-8')
-    cdef char* c_string = py_byte_string
-    cdef FILE *fp = fopen(py_byte_string, "r")
-    if fp == NULL:
-        raise FileNotFoundError(2, "No such file or directory: '%s'" % filename)
-    # get the length of the file
-    fseek(fp, 0, SEEK_END)
-    file_size = ftell(fp)
-    cdef unsigned int array_size = file_size / LEN_LOG
-    assert file_size % LEN_LOG == 0
-    fseek(fp, 0, SEEK_SET)
-    # allocate memory for reading in the file
-    cdef char* buffer = <char*>malloc(LEN_LOG*sizeof(char))
-    cdef int* id_p = <int*> buffer
-    cdef unsigned char* timeout_idx_p = <unsigned char*> (buffer+4)
-    cdef bool* first_p = <bool*> (buffer+5)
-    cdef float* arrival_p = <float*> (buffer+6)
-    cdef float* delay_p = <float*> (buffer+10)
-    cdef unsigned char* num_instance_p = <unsigned char*> (buffer+14)
-    cdef unsigned char* instance_index_p = <unsigned char*> (buffer+15)
-    cdef unsigned char* qu_p = <unsigned char*> (buffer+16)
-    cdef unsigned char* first_qu_p = <unsigned char*> (buffer+17)
-    cdef float* size_p = <float*> (buffer+18)
-    cdef unsigned char* model_index_p = <unsigned char*> (buffer+22)
-    cdef bool* tw_p = <bool*> (buffer+23)
-    cdef unsigned char* trace_index_p = <unsigned char*> (buffer+24)
-    cdef float* duration_p = <float*> (buffer+25)
-    cdef float* first_duration_p = <float*> (buffer+29)
+def read_constrained_log(filename, offset, arr_limit=250000000, wlen=500):
+    """
+    Reads at most arr_limit records starting at offset. If the limit is hit the read is cut back to the last trace
+    change or arrival window (wlen ms) boundary, so the next read can start from a clean window.
+
+    :return: fields of the records read, and whether the end of the file was reached
+    :rtype: (dict[str, np.ndarray], bool)
+    """
+    mapped = map_log(filename)
+    assert len(mapped) > offset
+    records = mapped[offset:offset + arr_limit]
+    if len(records) < arr_limit:
+        return log_fields(records), True
+    return log_fields(records[:_last_window_start(records, wlen)]), False
+
+
+def _last_window_start(records, double wlen):
+    # Index of the last record that starts a new trace, or a new arrival window counted from the start of its trace.
+    # Windows only count once they pass the furthest window seen so far, across all traces.
+    trace = records['TRACE_INDEX']
+    arrival = records['ARRIVAL']
+    trace_change = np.empty(len(records), dtype=np.bool_)
+    trace_change[0] = trace[0] != 0
+    trace_change[1:] = trace[1:] != trace[:-1]
+    # Arrival of the first record of the current trace, 0 until the first change
+    seg_start = np.maximum.accumulate(np.where(trace_change, np.arange(len(records)), -1))
+    seg_time = np.where(seg_start >= 0, arrival[np.maximum(seg_start, 0)], np.float32(0))
+    window = np.floor_divide((arrival - seg_time).astype(np.float32).astype(np.float64), wlen).astype(np.int64)
+    window[trace_change] = 0
+    window_max = np.maximum.accumulate(np.maximum(window, 0))
+    new_window = np.zeros(len(records), dtype=np.bool_)
+    new_window[0] = window[0] > 0
+    new_window[1:] = window[1:] > window_max[:-1]
+    starts = np.flatnonzero(trace_change | new_window)
+    return starts[-1] if len(starts) > 0 else 0
 
-    cdef int[:] id_view = np.empty(shape=array_size, dtype=np.int32)
-    cdef unsigned char[:] timeout_idx_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef bool[:] first_view = np.empty(shape=array_size, dtype=np.bool)
-    cdef float[:] arrival_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef float[:] delay_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef unsigned char[:] num_instance_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef unsigned char[:] instance_index_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef unsigned char[:] qu_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef unsigned char[:] first_qu_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef float[:] size_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef unsigned char[:] model_index_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef bool[:] tw_view = np.empty(shape=array_size, dtype=np.bool)
-    cdef unsigned char[:] trace_index_view = np.empty(shape=array_size, dtype=np.uint8)
-    cdef float[:] duration_view = np.empty(shape=array_size, dtype=np.float32)
-    cdef float[:] first_duration_view = np.empty(shape=array_size, dtype=np.float32)
 
-    cdef size_t i
-    for i in range(array_size):
-        # read file piece into buffer
-        assert fread(buffer, 1, LEN_LOG, fp) == LEN_LOG
-        id_view[i] = deref(id_p)
-        timeout_idx_view[i] = deref(timeout_idx_p)
-        first_view[i] = deref(first_p)
-        arrival_view[i] = deref(arrival_p)
-        delay_view[i] = deref(delay_p)
-        num_instance_view[i] = deref(num_instance_p)
-        instance_index_view[i] = deref(instance_index_p)
-        qu_view[i] = deref(qu_p)
-        first_qu_view[i] = deref(first_qu_p)
-        size_view[i] = deref(size_p)
-        model_index_view[i] = deref(model_index_p)
-        tw_view[i] = deref(tw_p)
-        trace_index_view[i] = deref(trace_index_p)
-        duration_view[i] = deref(duration_p)
-        first_duration_view[i] = deref(first_duration_p)
+def read_all_logs(filenames, valid=True):
+    """
+    :return: fields of the records of all files whose FIRST flag equals valid, copied into one array
+    :rtype: dict[str, np.ndarray]
+    """
+    records = [mapped[mapped['FIRST'] == valid] for mapped in map(map_log, filenames)]
+    return log_fields(np.concatenate(records) if records else np.empty(0, dtype=LOG_DTYPE))
 
-    # close the file once it's read into the char array
-    fclose(fp)
-    free(buffer)
 
-    return np.asarray(id_view), \
-           np.asarray(timeout_idx_view), \
-           np.asarray(first_view), \
-           np.asarray(arrival_view), \
-           np.asarray(delay_view), \
-           np.asarray(num_instance_view), \
-           np.asarray(instance_index_view), \
-           np.asarray(qu_view), \
-           np.asarray(first_qu_view), \
-           np.asarray(size_view), \
-           np.asarray(model_index_view), \
-           np.asarray(tw_view), \
-           np.asarray(trace_index_view), \
-           np.asarray(duration_view), \
-           np.asarray(first_duration_view)
+def read_log(filename):
+    """
+    :return: zero-copy views of every field of the memory mapped log
+    :rtype: dict[str, np.ndarray]
+    """
+    return log_fields(map_log(filename))
 
 
 def count_log(filename, valid=True):
-    return _count_log(filename, valid)
-
-cdef _count_log(str filename, bool valid):
-    py_byte_string = filename.encode('UTF-8')
-    cdef char* c_string = py_byte_string
-    cdef FILE *fp = fopen(py_byte_string, "r")
-    if fp == NULL:
-        raise FileNotFoundError(2, "No such file or directory: '%s'" % filename)
-    # get the length of the file
-    fseek(fp, 0, SEEK_END)
-    file_size = ftell(fp)
-    cdef unsigned int array_size = file_size / LEN_LOG
-    assert file_size % LEN_LOG == 0
-    fseek(fp, 0, SEEK_SET)
-    # allocate memory for reading in the file
-    cdef char* buffer = <char*>malloc(LEN_LOG*sizeof(char))
-    cdef bool* first_p = <bool*> (buffer+5)
-    cdef int count = 0
-
-    cdef size_t i
-    for i in range(array_size):
-        # read file piece into buffer
-        assert fread(buffer, 1, LEN_LOG, fp) == LEN_LOG
-        if valid == deref(first_p):
-            count += 1
-
-    # close the file once it's read into the char array
-    fclose(fp)
-    free(buffer)
-
-    return count
+    mapped = map_log(filename)
+    return int(np.count_nonzero(mapped['FIRST'] == valid))
+
+
+cdef _sort_logs(list filenames, str file_out, bool valid, size_t run_records, unsigned int num_threads):
+    cdef LogSorter* log_sorter = new LogSorter(file_out.encode('utf-8'), valid, run_records, num_threads)
+    try:
+        for file_in in filenames:
+            log_sorter.add_file(file_in.encode('utf-8'))
+        log_sorter.flush()
+    finally:
+        del log_sorter
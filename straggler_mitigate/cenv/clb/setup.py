@@ -18,7 +18,7 @@ extension = cythonize(
     [
         Extension('pyjobgensim',
                   ['pyjobgensim.pyx',
-                   'src/JobGenSim.cpp', 'src/dists/distribution.cpp', 'src/utils.cpp',
+                   'src/JobGen.cpp', 'src/JobGenSim.cpp', 'src/dists/distribution.cpp', 'src/utils.cpp',
                    'src/dists/normal_dist.cpp', 'src/dists/pareto_distribution.cpp',
                    'src/dists/exponential_distribution.cpp', 'src/dists/static_dist.cpp', ],
                   language="c++",
@@ -26,30 +26,34 @@ extension = cythonize(
                   ),
         Extension('pyjobgenfile',
                   ['pyjobgenfile.pyx',
-                   'src/JobGenFile.cpp', 'src/utils.cpp'],
+                   'src/JobGen.cpp', 'src/JobGenFile.cpp', 'src/utils.cpp'],
                   language="c++",
                   extra_compile_args=["-std=c++14"],
                   include_dirs=[numpy.get_include()]
                   ),
         Extension('pyenv',
                   ['pyenv.pyx',
-                   'src/ActionSpace.cpp', 'src/Job.cpp', 'src/LoadBalanceEnv.cpp', 'src/Logger.cpp',
-                   'src/ObservationSpace.cpp', 'src/Server.cpp', 'src/TimeLine.cpp', 'src/WallTime.cpp',
-                   'src/JobGenSim.cpp', 'src/dists/distribution.cpp', 'src/utils.cpp',
+                   'src/ActionSpace.cpp', 'src/Job.cpp', 'src/JobPool.cpp', 'src/LoadBalanceEnv.cpp', 'src/LoadBalanceEnvBatch.cpp',
+                   'src/Logger.cpp',
+                   'src/ObservationSpace.cpp', 'src/Server.cpp', 'src/ServerLoadTree.cpp', 'src/SlidingWindows.cpp', 'src/TimeLine.cpp', 'src/WallTime.cpp',
+                   'src/JobGen.cpp', 'src/JobGenSim.cpp', 'src/dists/distribution.cpp', 'src/utils.cpp',
                    'src/dists/normal_dist.cpp', 'src/dists/pareto_distribution.cpp',
                    'src/dists/exponential_distribution.cpp', 'src/dists/static_dist.cpp',
                    'src/pipes/AgentWindowStatsPipe.cpp', 'src/pipes/WindowStatsPipe.cpp',
-                   'src/pipes/FilePipe.cpp', 'src/pipes/pipe.cpp',
-                   'src/pipes/TimeBucketPipe.cpp', 'src/pipes/LoggerSortPipe.cpp', ],
+                   'src/pipes/FilePipe.cpp', 'src/pipes/ColumnFilePipe.cpp', 'src/pipes/pipe.cpp',
+                   'src/pipes/TimeBucketPipe.cpp', 'src/pipes/LoggerSortPipe.cpp', 'src/pipes/AsyncPipe.cpp',
+                   'src/ThreadPool.cpp', ],
                   language="c++",
-                  extra_compile_args=["-std=c++14"],
+                  extra_compile_args=["-std=c++14", "-pthread"],
+                  extra_link_args=["-pthread"],
                   include_dirs=[numpy.get_include()]
                   ),
         Extension('pylogreader',
                   ['pylogreader.pyx',
                    'src/LogSort.cpp'],
                   language="c++",
-                  extra_compile_args=["-std=c++14"],
+                  extra_compile_args=["-std=c++14", "-pthread"],
+                  extra_link_args=["-pthread"],
                   include_dirs=[numpy.get_include()]
                   )
     ],
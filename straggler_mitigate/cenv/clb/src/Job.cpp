@@ -7,7 +7,7 @@
 #include <limits>
 
 Job::Job(unsigned int id, double size, double arrival_time, double inter_arrival_time,
-         unsigned char trace_origin_index) {
+         unsigned char trace_origin_index, JobShared *shared) {
     this -> id = id;
     this -> size = size;
     this -> arrival_time = arrival_time;
@@ -16,16 +16,23 @@ Job::Job(unsigned int id, double size, double arrival_time, double inter_arrival
     this -> instance_index = 0;
     this -> duration_first = 0;
 
-    this -> completed = new bool(false);
+    this -> shared = shared;
+    shared -> completed = false;
+    shared -> num_instances = 1;
+    shared -> active_instances = 1;
+    shared -> best_finish_time = std::numeric_limits<double>::infinity();
+    shared -> num_duplicates = 0;
+    this -> completed = &(shared -> completed);
     this -> first_completed = false;
-    this -> num_instances = new unsigned char (1);
-    this -> active_instances = new unsigned char (1);
-    this -> best_finish_time = new double (std::numeric_limits<double>::infinity());
+    this -> num_instances = &(shared -> num_instances);
+    this -> active_instances = &(shared -> active_instances);
+    this -> best_finish_time = &(shared -> best_finish_time);
     this -> duplicate = false;
-    this -> duplicates = nullptr;
+    this -> duplicates = shared -> duplicates;
+    this -> num_duplicates = &(shared -> num_duplicates);
 }
 
-Job::Job(Job* base, Job *prev_instance, unsigned short num_servers) {
+Job::Job(Job* base, Job *prev_instance, JobShared *fresh_shared, unsigned short num_servers) {
     this -> id = base->id;
     this -> size = base->size;
     this -> enqueue_time = base->enqueue_time;
@@ -48,24 +55,28 @@ Job::Job(Job* base, Job *prev_instance, unsigned short num_servers) {
     this -> first_completed = base->first_completed;
 
     if (prev_instance == nullptr) {
-        this->completed = new bool(*(base->completed));
-        this->num_instances = new unsigned char(*(base->num_instances));
-        this->active_instances = new unsigned char(*(base->active_instances));
-        this->best_finish_time = new double(*(base->best_finish_time));
-
-        if (base->duplicates == nullptr)
-            this->duplicates = nullptr;
-        else {
-            this->duplicates = new bool[num_servers];
-            for (int i=0; i< num_servers; i++)
-                this -> duplicates[i] = base->duplicates[i];
-        }
+        this->shared = fresh_shared;
+        fresh_shared->completed = *(base->completed);
+        fresh_shared->num_instances = *(base->num_instances);
+        fresh_shared->active_instances = *(base->active_instances);
+        fresh_shared->best_finish_time = *(base->best_finish_time);
+        this->completed = &(fresh_shared->completed);
+        this->num_instances = &(fresh_shared->num_instances);
+        this->active_instances = &(fresh_shared->active_instances);
+        this->best_finish_time = &(fresh_shared->best_finish_time);
+        fresh_shared->num_duplicates = *(base->num_duplicates);
+        this->duplicates = fresh_shared->duplicates;
+        this->num_duplicates = &(fresh_shared->num_duplicates);
+        for (int i=0; i< *(base->num_duplicates); i++)
+            this -> duplicates[i] = base->duplicates[i];
     } else {
+        this->shared = prev_instance->shared;
         this->completed = prev_instance->completed;
         this->num_instances = prev_instance->num_instances;
         this->active_instances = prev_instance->active_instances;
         this->best_finish_time = prev_instance->best_finish_time;
         this->duplicates = prev_instance->duplicates;
+        this->num_duplicates = prev_instance->num_duplicates;
     }
 }
 
@@ -82,16 +93,13 @@ Job::Job(Job* base, unsigned short num_servers) {
     this -> num_instances = base->num_instances;
     this -> active_instances = base->active_instances;
     this -> best_finish_time = base->best_finish_time;
+    this -> shared = base->shared;
     *(this->num_instances) += 1;
     *(this->active_instances) += 1;
     this -> first_completed = false;
-    if (base ->duplicate)
-        this -> duplicates = base->duplicates;
-    else{
-        this -> duplicates = new bool[num_servers]{false};
-        base -> duplicates = this -> duplicates;
-    }
-    this -> duplicates[base->assigned_server_id] = true;
+    this -> duplicates = base->duplicates;
+    this -> num_duplicates = base->num_duplicates;
+    this -> duplicates[(*num_duplicates)++] = base->assigned_server_id;
     this -> duplicate = true;
 }
 
@@ -119,13 +127,8 @@ double Job::get_delay() const {
     return finish_time-arrival_time;
 }
 
-void Job::free() {
+bool Job::free() {
+    // Returns true when this was the last active instance, so the shared state can be reclaimed
     *(active_instances) -= 1;
-    if (*active_instances == 0){
-        delete completed;
-        delete num_instances;
-        delete active_instances;
-        delete best_finish_time;
-        delete duplicates;
-    }
+    return *active_instances == 0;
 }
@@ -7,6 +7,17 @@
 
 class Server;
 
+// State shared by all instances (original and duplicates) of the same job
+struct JobShared {
+    bool completed;
+    unsigned char num_instances;
+    unsigned char active_instances;
+    double best_finish_time;
+    // Servers the earlier instances of the job were scheduled on, a duplicate is never sent to these
+    unsigned short *duplicates;
+    unsigned short num_duplicates;
+};
+
 class Job {
 
 public:
@@ -35,21 +46,24 @@ public:
     double *best_finish_time;
     bool first_completed;
 
-    bool *duplicates;
+    unsigned short *duplicates;
+    unsigned short *num_duplicates;
     bool duplicate;
 
+    JobShared *shared;
+
     unsigned short assigned_server_id{};
 
     Job(unsigned int id, double size, double arrival_time, double inter_arrival_time,
-        unsigned char trace_origin_index);
-    Job(Job *base, Job *prev_instance, unsigned short num_servers);
+        unsigned char trace_origin_index, JobShared *shared);
+    Job(Job *base, Job *prev_instance, JobShared *fresh_shared, unsigned short num_servers);
     Job(Job *base, unsigned short num_servers);
     ~Job();
     double get_duration() const;
     double get_first_duration() const;
     unsigned char get_first_queue_obs() const;
     double get_delay() const;
-    void free();
+    bool free();
 };
 
 
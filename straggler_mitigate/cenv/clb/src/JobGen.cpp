@@ -0,0 +1,45 @@
+#include "JobGen.h"
+
+JobGen::JobGen() {
+    this->num_servers = 0;
+    this->job_buffer = new JobProcessSample[JOB_BUFFER_SIZE];
+    this->buffer_pos = 0;
+    this->buffer_len = 0;
+    this->replaying_buffer = false;
+}
+
+JobGen::~JobGen() {
+    delete[] job_buffer;
+}
+
+void JobGen::sync_buffer() {
+    // Replays the jobs handed out since the start of the block, so the generator is exactly where it would be had it
+    // generated them one by one
+    if (buffer_pos < buffer_len) {
+        rewind_block_start();
+        replaying_buffer = true;
+        fill_jobs(job_buffer, buffer_pos);
+        replaying_buffer = false;
+    }
+    buffer_pos = 0;
+    buffer_len = 0;
+}
+
+void JobGen::copy_buffer(const JobGen *job_gen) {
+    for (int i = 0; i < job_gen->buffer_len; i++)
+        job_buffer[i] = job_gen->job_buffer[i];
+    buffer_pos = job_gen->buffer_pos;
+    buffer_len = job_gen->buffer_len;
+}
+
+int JobGen::buffered_trace(int state) const {
+    // The trace of the next job to hand out is the current trace of a generator without a buffer
+    if (buffer_pos < buffer_len)
+        return job_buffer[buffer_pos].trace_origin_index;
+    return state;
+}
+
+void JobGen::gen_jobs(JobProcessSample *out, int n) {
+    sync_buffer();
+    fill_jobs(out, n);
+}
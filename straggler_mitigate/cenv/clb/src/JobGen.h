@@ -17,9 +17,25 @@ class JobGen {
 protected:
     int num_servers;
 
-public:
+    // gen_job hands out jobs from this buffer, which is refilled JOB_BUFFER_SIZE jobs at a time by fill_jobs. The
+    // generator itself runs ahead of the jobs handed out, sync_buffer rewinds it to the first job not handed out yet.
+    static const int JOB_BUFFER_SIZE = 256;
+    JobProcessSample* job_buffer;
+    int buffer_pos;
+    int buffer_len;
+    // Set while sync_buffer replays jobs that were already generated once
+    bool replaying_buffer;
+
+    virtual void fill_jobs(JobProcessSample* out, int n) = 0;
+    virtual void save_block_start() = 0;
+    virtual void rewind_block_start() = 0;
+    void sync_buffer();
+    void copy_buffer(const JobGen* job_gen);
+    int buffered_trace(int state) const;
 
-    virtual ~JobGen() = default;
+public:
+    JobGen();
+    virtual ~JobGen();
     virtual void seed(unsigned int start_seed) = 0;
     virtual void reset() = 0;
     virtual void report() = 0;
@@ -32,10 +48,21 @@ public:
     virtual int get_num_traces() = 0;
     virtual double get_chosen_rate() = 0;
     virtual void relocate() = 0;
-    virtual JobProcessSample gen_job() = 0;
+    inline JobProcessSample gen_job() {
+        if (buffer_pos == buffer_len) {
+            save_block_start();
+            fill_jobs(job_buffer, JOB_BUFFER_SIZE);
+            buffer_pos = 0;
+            buffer_len = JOB_BUFFER_SIZE;
+        }
+        return job_buffer[buffer_pos++];
+    }
+    void gen_jobs(JobProcessSample* out, int n);
     virtual void save_state() = 0;
     virtual void load_state() = 0;
     virtual JobGen* copy() = 0;
+    // Takes over the position of job_gen, a copy of this generator, e.g. to rewind it to a snapshot in place
+    virtual void copy_state(const JobGen* job_gen) = 0;
 };
 
 
@@ -6,6 +6,8 @@
 #include "JobGenFile.h"
 #include "utils.h"
 #include "cassert"
+#include <algorithm>
+#include <cmath>
 
 JobGenFile::JobGenFile(double **size_arrs_orig, double **arrival_arrs_orig, const int *len_arrs_orig, short num_traces,
                        int start_state, double hold_time, int num_servers,
@@ -26,33 +28,117 @@ JobGenFile::JobGenFile(double **size_arrs_orig, double **arrival_arrs_orig, cons
     this->relocate_time_dist = new std::uniform_real_distribution<double>(0, hold_time);
     this->relocate_step_dist = new std::uniform_int_distribution<int> *[num_traces];
 
-    this->size_arrays = new double *[num_traces];
-    this->arrival_arrays = new double *[num_traces];
-    this->time_arrays = new double *[num_traces];
+    this->size_arrays = new const double *[num_traces];
+    this->arrival_arrays = new const double *[num_traces];
+    this->time_arrays = new const double *[num_traces];
+    this->stride = 1;
     this->len_arrays = new int[num_traces];
     this->size_avg = new double[num_traces];
     this->iat_avg = new double[num_traces];
     this->step = new int[num_traces]();
     this->step_saved = new int[num_traces]();
+    this->start_step = new int[num_traces]();
+    this->step_block_start = new int[num_traces]();
     for (int i = 0; i < num_traces; i++) {
-        this->size_arrays[i] = new double[len_arrs_orig[i]];
-        this->arrival_arrays[i] = new double[len_arrs_orig[i]];
-        this->time_arrays[i] = new double[len_arrs_orig[i]];
+        auto *size_array = new double[len_arrs_orig[i]];
+        auto *arrival_array = new double[len_arrs_orig[i]];
+        auto *time_array = new double[len_arrs_orig[i]];
         this->len_arrays[i] = len_arrs_orig[i];
         this->relocate_step_dist[i] = new std::uniform_int_distribution<int>(0, len_arrs_orig[i] - 1);
         double prev_time = 0;
         for (int j = 0; j < len_arrs_orig[i]; j++) {
-            this->size_arrays[i][j] = size_arrs_orig[i][j];
-            this->arrival_arrays[i][j] = arrival_arrs_orig[i][j];
-            this->time_arrays[i][j] = prev_time + arrival_arrs_orig[i][j];
-            prev_time = this->time_arrays[i][j];
+            size_array[j] = size_arrs_orig[i][j];
+            arrival_array[j] = arrival_arrs_orig[i][j];
+            time_array[j] = prev_time + arrival_arrs_orig[i][j];
+            prev_time = time_array[j];
         }
+        this->size_arrays[i] = size_array;
+        this->arrival_arrays[i] = arrival_array;
+        this->time_arrays[i] = time_array;
         this->size_avg[i] = average(this->size_arrays[i], this->len_arrays[i]);
         this->iat_avg[i] = average(this->arrival_arrays[i], this->len_arrays[i]);
     }
 
+    this->state_block_start = start_state;
+    this->time_elapsed_block_start = 0;
+
+    this->have_indices = false;
+    this -> duplicate_object = false;
+    this -> borrowed_arrays = false;
+    this -> borrowed_times = false;
+}
+
+JobGenFile::JobGenFile(const double **size_arrs, const double **arrival_arrs, const double **time_arrs, int stride,
+                       const int *len_arrs, const int *start_steps, short num_traces, int start_state,
+                       double hold_time, int num_servers, unsigned int start_seed, double rate_chosen) {
+    // Works on the caller's arrays instead of copying them, so read-only memory maps of a trace can be shared by
+    // every env and process. time_arrs (contiguous cumulative arrival times) may be nullptr, they are computed then.
+    this->start_state = start_state;
+    this->state = start_state;
+    this->state_saved = start_state;
+    this->time_elapsed = 0;
+    this->time_elapsed_saved = 0;
+
+    this->num_servers = num_servers;
+    this->num_traces = num_traces;
+    this->rate_chosen = rate_chosen;
+    this->hold_time = hold_time;
+
+    this->rng = new std::mt19937(start_seed);
+    this->relocate_state_dist = new std::uniform_int_distribution<int>(0, num_traces - 1);
+    this->relocate_time_dist = new std::uniform_real_distribution<double>(0, hold_time);
+    this->relocate_step_dist = new std::uniform_int_distribution<int> *[num_traces];
+
+    this->size_arrays = new const double *[num_traces];
+    this->arrival_arrays = new const double *[num_traces];
+    this->time_arrays = new const double *[num_traces];
+    this->stride = stride;
+    this->len_arrays = new int[num_traces];
+    this->size_avg = new double[num_traces];
+    this->iat_avg = new double[num_traces];
+    this->step = new int[num_traces]();
+    this->step_saved = new int[num_traces]();
+    this->start_step = new int[num_traces]();
+    this->step_block_start = new int[num_traces]();
+    for (int i = 0; i < num_traces; i++) {
+        this->size_arrays[i] = size_arrs[i];
+        this->arrival_arrays[i] = arrival_arrs[i];
+        this->len_arrays[i] = len_arrs[i];
+        this->relocate_step_dist[i] = new std::uniform_int_distribution<int>(0, len_arrs[i] - 1);
+        if (start_steps != nullptr) {
+            assert(start_steps[i] >= 0 and start_steps[i] < len_arrs[i]);
+            this->start_step[i] = start_steps[i];
+            this->step[i] = start_steps[i];
+            this->step_saved[i] = start_steps[i];
+        }
+        double size_sum = 0;
+        double arrival_sum = 0;
+        for (int j = 0; j < len_arrs[i]; j++) {
+            size_sum += size_arrs[i][j * stride];
+            arrival_sum += arrival_arrs[i][j * stride];
+        }
+        this->size_avg[i] = size_sum / len_arrs[i];
+        this->iat_avg[i] = arrival_sum / len_arrs[i];
+        if (time_arrs != nullptr)
+            this->time_arrays[i] = time_arrs[i];
+        else {
+            auto *time_array = new double[len_arrs[i]];
+            double prev_time = 0;
+            for (int j = 0; j < len_arrs[i]; j++) {
+                time_array[j] = prev_time + arrival_arrs[i][j * stride];
+                prev_time = time_array[j];
+            }
+            this->time_arrays[i] = time_array;
+        }
+    }
+
+    this->state_block_start = start_state;
+    this->time_elapsed_block_start = 0;
+
     this->have_indices = false;
     this -> duplicate_object = false;
+    this -> borrowed_arrays = true;
+    this -> borrowed_times = time_arrs != nullptr;
 }
 
 JobGenFile::JobGenFile(JobGenFile *job_gen) {
@@ -77,6 +163,7 @@ JobGenFile::JobGenFile(JobGenFile *job_gen) {
     this->size_arrays = job_gen->size_arrays;
     this->arrival_arrays = job_gen->arrival_arrays;
     this->time_arrays = job_gen->time_arrays;
+    this->stride = job_gen->stride;
     this->len_arrays = job_gen->len_arrays;
     this->size_avg = job_gen->size_avg;
     this->iat_avg = job_gen->iat_avg;
@@ -84,23 +171,35 @@ JobGenFile::JobGenFile(JobGenFile *job_gen) {
     // Will this work?
     this->step = new int[num_traces];
     this->step_saved = new int[num_traces];
+    this->start_step = new int[num_traces];
+    this->step_block_start = new int[num_traces];
     for (int i = 0; i < num_traces; i++){
         this->step[i] = job_gen->step[i];
         this->step_saved[i] = job_gen->step_saved[i];
+        this->start_step[i] = job_gen->start_step[i];
+        this->step_block_start[i] = job_gen->step_block_start[i];
     }
+    this->state_block_start = job_gen->state_block_start;
+    this->time_elapsed_block_start = job_gen->time_elapsed_block_start;
+    copy_buffer(job_gen);
 
     this->have_indices = job_gen->have_indices;
     if (job_gen->have_indices)
         this->indices = job_gen->indices;
     this -> duplicate_object = true;
+    this -> borrowed_arrays = job_gen->borrowed_arrays;
+    this -> borrowed_times = job_gen->borrowed_times;
 }
 
 JobGenFile::~JobGenFile() {
     if (!duplicate_object){
         for (int i = 0; i < num_traces; i++) {
-            delete size_arrays[i];
-            delete arrival_arrays[i];
-            delete time_arrays[i];
+            if (!borrowed_arrays) {
+                delete size_arrays[i];
+                delete arrival_arrays[i];
+            }
+            if (!borrowed_times)
+                delete time_arrays[i];
             if (have_indices)
                 delete indices[i];
         }
@@ -118,6 +217,8 @@ JobGenFile::~JobGenFile() {
 
     delete step;
     delete step_saved;
+    delete[] start_step;
+    delete[] step_block_start;
     for (int i = 0; i < num_traces; i++) {
         delete relocate_step_dist[i];
     }
@@ -132,13 +233,14 @@ void JobGenFile::seed(unsigned int start_seed) {
 }
 
 void JobGenFile::reset() {
+    sync_buffer();
     state = start_state;
     time_elapsed = 0;
     state_saved = start_state;
     time_elapsed_saved = 0;
     for (int i = 0; i < num_traces; i++) {
-        step[i] = 0;
-        step_saved[i] = 0;
+        step[i] = start_step[i];
+        step_saved[i] = start_step[i];
     }
 }
 
@@ -154,7 +256,7 @@ double JobGenFile::get_arrival_avg() {
 }
 
 int JobGenFile::get_curr_trace() {
-    return state;
+    return buffered_trace(state);
 }
 
 int JobGenFile::get_num_traces() {
@@ -166,6 +268,7 @@ double JobGenFile::get_chosen_rate() {
 }
 
 void JobGenFile::save_state() {
+    sync_buffer();
     state_saved = state;
     time_elapsed_saved = time_elapsed;
     for (int i = 0; i < num_traces; i++)
@@ -173,6 +276,7 @@ void JobGenFile::save_state() {
 }
 
 void JobGenFile::load_state() {
+    sync_buffer();
     state = state_saved;
     time_elapsed = time_elapsed_saved;
     for (int i = 0; i < num_traces; i++)
@@ -180,36 +284,53 @@ void JobGenFile::load_state() {
 }
 
 void JobGenFile::relocate() {
+    sync_buffer();
     state = (*relocate_state_dist)(*rng);
     time_elapsed = (*relocate_time_dist)(*rng);
     step[state] = (*relocate_step_dist[state])(*rng);
 }
 
+double *JobGenFile::gather_trace(const double *trace, int length) const {
+    if (stride == 1)
+        return const_cast<double*>(trace);
+    auto *gathered = new double[length];
+    for (int j = 0; j < length; j++)
+        gathered[j] = trace[j * stride];
+    return gathered;
+}
+
 void JobGenFile::report() {
     for (int i = 0; i < num_traces; i++) {
         std::cout << "With state " << i << ": " << std::endl;
+        // The statistics below only read the traces, strided (borrowed) traces are gathered into temporary copies
+        double *sizes = gather_trace(size_arrays[i], len_arrays[i]);
+        double *arrivals = gather_trace(arrival_arrays[i], len_arrays[i]);
 
         std::cout << "Size has an average of = " << size_avg[i] << " ms and quantiles of:" << std::endl;
-        std::cout << "p50 = " << percentile(size_arrays[i], len_arrays[i], 0.5);
-        std::cout << ", above p50 average = " << avg_partition_multi_array(&size_arrays[i], &len_arrays[i], 1, 0.5) << std::endl;
-        std::cout << "p90 = " << percentile(size_arrays[i], len_arrays[i], 0.9);
-        std::cout << ", above p90 average = " << avg_partition_multi_array(&size_arrays[i], &len_arrays[i], 1, 0.1) << std::endl;
-        std::cout << "p99 = " << percentile(size_arrays[i], len_arrays[i], 0.99);
-        std::cout << ", above p99 average = " << avg_partition_multi_array(&size_arrays[i], &len_arrays[i], 1, 0.01) << std::endl;
-        std::cout << "p99.9 = " << percentile(size_arrays[i], len_arrays[i], 0.999);
-        std::cout << ", above p99.9 average = " << avg_partition_multi_array(&size_arrays[i], &len_arrays[i], 1, 0.001) << std::endl;
+        std::cout << "p50 = " << percentile(sizes, len_arrays[i], 0.5);
+        std::cout << ", above p50 average = " << avg_partition_multi_array(&sizes, &len_arrays[i], 1, 0.5) << std::endl;
+        std::cout << "p90 = " << percentile(sizes, len_arrays[i], 0.9);
+        std::cout << ", above p90 average = " << avg_partition_multi_array(&sizes, &len_arrays[i], 1, 0.1) << std::endl;
+        std::cout << "p99 = " << percentile(sizes, len_arrays[i], 0.99);
+        std::cout << ", above p99 average = " << avg_partition_multi_array(&sizes, &len_arrays[i], 1, 0.01) << std::endl;
+        std::cout << "p99.9 = " << percentile(sizes, len_arrays[i], 0.999);
+        std::cout << ", above p99.9 average = " << avg_partition_multi_array(&sizes, &len_arrays[i], 1, 0.001) << std::endl;
 
         std::cout << "Arrival has an average of = " << iat_avg[i] << " ms and quantiles of:" << std::endl;
-        std::cout << "p50 = " << percentile(arrival_arrays[i], len_arrays[i], 0.5);
-        std::cout << ", below p50 average = " << iat_avg[i] * 2 - avg_partition_multi_array(&arrival_arrays[i], &len_arrays[i], 1, 0.5) << std::endl;
-        std::cout << "p10 = " << percentile(arrival_arrays[i], len_arrays[i], 0.1);
-        std::cout << ", below p10 average = " << iat_avg[i] * 10 - 9 * avg_partition_multi_array(&arrival_arrays[i], &len_arrays[i], 1, 0.9) << std::endl;
-        std::cout << "p1 = " << percentile(arrival_arrays[i], len_arrays[i], 0.01);
-        std::cout << ", below p1 average = " << iat_avg[i] * 100 - 99 * avg_partition_multi_array(&arrival_arrays[i], &len_arrays[i], 1, 0.99) << std::endl;
-        std::cout << "p0.1 = " << percentile(arrival_arrays[i], len_arrays[i], 0.001);
-        std::cout << ", below p0.1 average = " << iat_avg[i] * 1000 - 999 * avg_partition_multi_array(&arrival_arrays[i], &len_arrays[i], 1, 0.999) << std::endl;
+        std::cout << "p50 = " << percentile(arrivals, len_arrays[i], 0.5);
+        std::cout << ", below p50 average = " << iat_avg[i] * 2 - avg_partition_multi_array(&arrivals, &len_arrays[i], 1, 0.5) << std::endl;
+        std::cout << "p10 = " << percentile(arrivals, len_arrays[i], 0.1);
+        std::cout << ", below p10 average = " << iat_avg[i] * 10 - 9 * avg_partition_multi_array(&arrivals, &len_arrays[i], 1, 0.9) << std::endl;
+        std::cout << "p1 = " << percentile(arrivals, len_arrays[i], 0.01);
+        std::cout << ", below p1 average = " << iat_avg[i] * 100 - 99 * avg_partition_multi_array(&arrivals, &len_arrays[i], 1, 0.99) << std::endl;
+        std::cout << "p0.1 = " << percentile(arrivals, len_arrays[i], 0.001);
+        std::cout << ", below p0.1 average = " << iat_avg[i] * 1000 - 999 * avg_partition_multi_array(&arrivals, &len_arrays[i], 1, 0.999) << std::endl;
 
         std::cout << "Average load = " << size_avg[i] / iat_avg[i] * 1.9 / num_servers / rate_chosen << std::endl;
+        if (stride != 1) {
+            delete[] sizes;
+            delete[] arrivals;
+        }
     }
 }
 
@@ -225,41 +346,102 @@ void JobGenFile::load_index_arr(short **indices_orig) {
 }
 
 int JobGenFile::get_curr_index() {
+    sync_buffer();
     assert(have_indices);
     return indices[state][step[state]];
 }
 
 void JobGenFile::set_curr_trace(int new_state){
+    sync_buffer();
     state = new_state;
     std::cout << "In trace mode, state changed to " << state << std::endl;
 }
 
-JobProcessSample JobGenFile::gen_job() {
-    JobProcessSample ret_sample{
-            .size=size_arrays[state][step[state]],
-            .inter_arrival_time=arrival_arrays[state][step[state]],
-            .trace_origin_index=(unsigned char)state
-    };
-
-    step[state] += 1;
-    time_elapsed += ret_sample.inter_arrival_time;
-
-    if (step[state] >= len_arrays[state])
-        step[state] = 0;
-
-    if (time_elapsed > hold_time and num_traces > 1) {
-        state = (state + 1) % num_traces;
-        time_elapsed -= hold_time;
-        std::cout << "In trace mode, state changed to " << state << std::endl;
+void JobGenFile::fill_jobs(JobProcessSample *out, int n) {
+    int i = 0;
+    while (i < n) {
+        // Walks the current trace with a local cursor, only a change of trace leaves the inner loop
+        const double *sizes = size_arrays[state];
+        const double *arrivals = arrival_arrays[state];
+        int len = len_arrays[state];
+        int curr_step = step[state];
+        bool trace_changed = false;
+        while (i < n and !trace_changed) {
+            out[i].size = sizes[curr_step * stride];
+            out[i].inter_arrival_time = arrivals[curr_step * stride];
+            out[i].trace_origin_index = (unsigned char) state;
+            curr_step += 1;
+            if (curr_step >= len)
+                curr_step = 0;
+            time_elapsed += out[i].inter_arrival_time;
+            i += 1;
+            trace_changed = time_elapsed > hold_time and num_traces > 1;
+        }
+        step[state] = curr_step;
+        if (trace_changed) {
+            state = (state + 1) % num_traces;
+            time_elapsed -= hold_time;
+            if (!replaying_buffer)
+                std::cout << "In trace mode, state changed to " << state << std::endl;
+        }
     }
+}
 
-    return ret_sample;
+void JobGenFile::save_block_start() {
+    state_block_start = state;
+    time_elapsed_block_start = time_elapsed;
+    for (int i = 0; i < num_traces; i++)
+        step_block_start[i] = step[i];
+}
+
+void JobGenFile::rewind_block_start() {
+    state = state_block_start;
+    time_elapsed = time_elapsed_block_start;
+    for (int i = 0; i < num_traces; i++)
+        step[i] = step_block_start[i];
 }
 
 void JobGenFile::seek(double time_point) {
+    sync_buffer();
     step[state] = binary_search_right_side(time_arrays[state], len_arrays[state], time_point);
 }
 
+int JobGenFile::seek(int trace, double time_ms) {
+    // Moves the trace to the first job arriving after time_ms (wrapped around the trace length) by a binary search
+    // over the cumulative arrival times. The trace also starts from there after a reset.
+    assert(trace >= 0 and trace < num_traces);
+    sync_buffer();
+    const double *times = time_arrays[trace];
+    double time_wrapped = std::fmod(time_ms, times[len_arrays[trace] - 1]);
+    int new_step = (int) (std::upper_bound(times, times + len_arrays[trace], time_wrapped) - times);
+    if (new_step >= len_arrays[trace])
+        new_step = 0;
+    step[trace] = new_step;
+    step_saved[trace] = new_step;
+    start_step[trace] = new_step;
+    return new_step;
+}
+
 JobGenFile *JobGenFile::copy() {
     return new JobGenFile(this);
 }
+
+void JobGenFile::copy_state(const JobGen *job_gen_base) {
+    // Trace arrays and settings are shared with copies, only the cursor and the rng are taken over
+    auto *job_gen = dynamic_cast<const JobGenFile *>(job_gen_base);
+    assert(job_gen != nullptr and job_gen->num_traces == num_traces);
+    *rng = *(job_gen->rng);
+    state = job_gen->state;
+    state_saved = job_gen->state_saved;
+    time_elapsed = job_gen->time_elapsed;
+    time_elapsed_saved = job_gen->time_elapsed_saved;
+    for (int i = 0; i < num_traces; i++){
+        step[i] = job_gen->step[i];
+        step_saved[i] = job_gen->step_saved[i];
+        start_step[i] = job_gen->start_step[i];
+        step_block_start[i] = job_gen->step_block_start[i];
+    }
+    state_block_start = job_gen->state_block_start;
+    time_elapsed_block_start = job_gen->time_elapsed_block_start;
+    copy_buffer(job_gen);
+}
@@ -11,9 +11,11 @@
 class JobGenFile : public JobGen{
 private:
     std::mt19937* rng;
-    double** size_arrays;
-    double** arrival_arrays;
-    double** time_arrays;
+    const double** size_arrays;
+    const double** arrival_arrays;
+    const double** time_arrays;
+    // Distance between consecutive jobs in size_arrays and arrival_arrays, 1 unless the arrays are borrowed views
+    int stride;
     short** indices;
     bool have_indices;
     short num_traces;
@@ -26,6 +28,8 @@ private:
     std::uniform_real_distribution<double>* relocate_time_dist;
 
     int start_state;
+    // Position every trace starts from on reset
+    int* start_step;
 
     int state;
     int state_saved;
@@ -33,16 +37,31 @@ private:
     int* step_saved;
     double time_elapsed;
     double time_elapsed_saved;
+    // Cursor at the start of the job buffer
+    int state_block_start;
+    int* step_block_start;
+    double time_elapsed_block_start;
 
     double hold_time;
     double rate_chosen;
 
     bool duplicate_object;
+    // Borrowed trace arrays belong to the caller, time arrays are only owned when they were computed here
+    bool borrowed_arrays;
+    bool borrowed_times;
+
+    double* gather_trace(const double* trace, int length) const;
+    void fill_jobs(JobProcessSample* out, int n) override;
+    void save_block_start() override;
+    void rewind_block_start() override;
 
 public:
     JobGenFile(double** size_arrs_orig, double** arrival_arrs_orig, const int* len_arrs_orig, short num_traces,
                int start_state, double hold_time, int num_servers, unsigned int start_seed,
                double rate_chosen);
+    JobGenFile(const double** size_arrs, const double** arrival_arrs, const double** time_arrs, int stride,
+               const int* len_arrs, const int* start_steps, short num_traces, int start_state, double hold_time,
+               int num_servers, unsigned int start_seed, double rate_chosen);
     explicit JobGenFile(JobGenFile* job_gen);
     ~JobGenFile() override;
     void seed(unsigned int start_seed) override;
@@ -57,11 +76,12 @@ public:
     int get_num_traces() override;
     double get_chosen_rate() override;
     void seek(double time_point);
+    int seek(int trace, double time_ms);
     void relocate() override;
-    JobProcessSample gen_job() override;
     void save_state() override;
     void load_state() override;
     JobGenFile* copy() override;
+    void copy_state(const JobGen* job_gen) override;
 };
 
 
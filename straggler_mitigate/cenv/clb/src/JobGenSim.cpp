@@ -67,6 +67,8 @@ JobGenSim::JobGenSim(int start_state, double hold_time, int num_states, dist_par
         }
         this->iat_avg[i] = dists_iat[i]->average(BOUND_LOW_IAT, BOUND_HIGH_IAT);
     }
+    this->state_block_start = start_state;
+    this->time_elapsed_block_start = 0;
     this -> duplicate_object = false;
 }
 
@@ -77,7 +79,7 @@ JobGenSim::JobGenSim(JobGenSim *job_gen) {
     this->hold_time = job_gen->hold_time;
     this->time_elapsed = job_gen->time_elapsed;
     this->time_elapsed_saved = job_gen->time_elapsed_saved;
-    this->num_servers = num_servers;
+    this->num_servers = job_gen->num_servers;
     this->num_states = job_gen->num_states;
     this->rng = new std::mt19937(*(job_gen->rng));
     this->relocate_state_dist = new std::uniform_int_distribution<int>(0, num_states - 1);
@@ -92,15 +94,21 @@ JobGenSim::JobGenSim(JobGenSim *job_gen) {
     }
     this->size_avg = job_gen->size_avg;
     this->iat_avg = job_gen->iat_avg;
+    this->rng_block_start = job_gen->rng_block_start;
+    this->state_block_start = job_gen->state_block_start;
+    this->time_elapsed_block_start = job_gen->time_elapsed_block_start;
+    copy_buffer(job_gen);
     this -> duplicate_object = true;
 }
 
 void JobGenSim::seed(unsigned int start_seed) {
+    sync_buffer();
     delete rng;
     this->rng = new std::mt19937(start_seed);
 }
 
 void JobGenSim::reset() {
+    sync_buffer();
     state = start_state;
     time_elapsed = 0;
     state_saved = start_state;
@@ -108,11 +116,13 @@ void JobGenSim::reset() {
 }
 
 void JobGenSim::save_state() {
+    sync_buffer();
     state_saved = state;
     time_elapsed_saved = time_elapsed;
 }
 
 void JobGenSim::load_state() {
+    sync_buffer();
     state = state_saved;
     time_elapsed = time_elapsed_saved;
 }
@@ -120,7 +130,7 @@ void JobGenSim::load_state() {
 void JobGenSim::load_index_arr(short** indices) {}
 
 int JobGenSim::get_curr_trace() {
-    return state;
+    return buffered_trace(state);
 }
 
 int JobGenSim::get_num_traces() {
@@ -139,30 +149,105 @@ double JobGenSim::get_arrival_avg() {
 }
 
 void JobGenSim::relocate() {
+    sync_buffer();
     state = (*relocate_state_dist)(*rng);
     time_elapsed = (*relocate_time_dist)(*rng);
 }
 
 void JobGenSim::set_curr_trace(int new_state){
+    sync_buffer();
     state = new_state;
     std::cout << "In simulation mode, state changed to " << state << std::endl;
 }
 
 
-JobProcessSample JobGenSim::gen_job() {
-    JobProcessSample ret_sample{
-            .size=dists_size[state]->generate_bounded(rng, BOUND_LOW_SIZE, BOUND_HIGH_SIZE),
-            .inter_arrival_time=dists_iat[state]->generate_bounded(rng, BOUND_LOW_IAT, BOUND_HIGH_IAT),
-            .trace_origin_index=(unsigned char)state
-    };
+template<class Dist>
+static inline double generate_bounded(Dist *dist, std::mt19937 *rng, double bound_low, double bound_high) {
+    // Same as distribution::generate_bounded, with the generate call resolved at compile time
+    double ret_val = dist->Dist::generate(rng);
+    if (ret_val > bound_high)
+        return bound_high;
+    else if (ret_val < bound_low)
+        return bound_low;
+    return ret_val;
+}
 
-    time_elapsed += ret_sample.inter_arrival_time;
-    if (time_elapsed > hold_time and num_states > 1) {
-        state = (state + 1) % num_states;
-        time_elapsed -= hold_time;
-        std::cout << "In simulation mode, state changed to " << state << std::endl;
+template<class SizeDist, class IatDist>
+int JobGenSim::fill_regime_dists(JobProcessSample *out, int n) {
+    auto *dist_size = static_cast<SizeDist *>(dists_size[state]);
+    auto *dist_iat = static_cast<IatDist *>(dists_iat[state]);
+    for (int i = 0; i < n; i++) {
+        out[i].size = generate_bounded(dist_size, rng, BOUND_LOW_SIZE, BOUND_HIGH_SIZE);
+        out[i].inter_arrival_time = generate_bounded(dist_iat, rng, BOUND_LOW_IAT, BOUND_HIGH_IAT);
+        out[i].trace_origin_index = (unsigned char) state;
+        time_elapsed += out[i].inter_arrival_time;
+        if (time_elapsed > hold_time and num_states > 1) {
+            state = (state + 1) % num_states;
+            time_elapsed -= hold_time;
+            if (!replaying_buffer)
+                std::cout << "In simulation mode, state changed to " << state << std::endl;
+            return i + 1;
+        }
+    }
+    return n;
+}
+
+template<class SizeDist>
+int JobGenSim::fill_regime_size(JobProcessSample *out, int n) {
+    switch (dist_param_iat[state].type) {
+        case pareto:
+            return fill_regime_dists<SizeDist, pareto_dist>(out, n);
+        case normal:
+            return fill_regime_dists<SizeDist, normal_dist>(out, n);
+        case exponential:
+            return fill_regime_dists<SizeDist, exponential_dist>(out, n);
+        case stat_ret:
+            return fill_regime_dists<SizeDist, static_dist>(out, n);
+    }
+    assert(false);
+    return 0;
+}
+
+int JobGenSim::fill_regime(JobProcessSample *out, int n) {
+    // Jobs of one regime are drawn in a loop specialized to its distributions, until the regime changes
+    switch (dist_param_size[state].type) {
+        case pareto:
+            return fill_regime_size<pareto_dist>(out, n);
+        case normal:
+            return fill_regime_size<normal_dist>(out, n);
+        case exponential:
+            return fill_regime_size<exponential_dist>(out, n);
+        case stat_ret:
+            return fill_regime_size<static_dist>(out, n);
+    }
+    assert(false);
+    return 0;
+}
+
+void JobGenSim::fill_jobs(JobProcessSample *out, int n) {
+    int i = 0;
+    while (i < n)
+        i += fill_regime(out + i, n - i);
+}
+
+void JobGenSim::save_block_start() {
+    rng_block_start = *rng;
+    state_block_start = state;
+    time_elapsed_block_start = time_elapsed;
+    for (int i = 0; i < num_states; i++) {
+        dists_size[i]->save_state();
+        dists_iat[i]->save_state();
+    }
+}
+
+void JobGenSim::rewind_block_start() {
+    *rng = rng_block_start;
+    state = state_block_start;
+    time_elapsed = time_elapsed_block_start;
+    for (int i = 0; i < num_states; i++) {
+        dists_size[i]->load_state();
+        dists_iat[i]->load_state();
     }
-    return ret_sample;
 }
 
 void JobGenSim::report() {
@@ -238,3 +323,23 @@ int JobGenSim::get_curr_index() {
 JobGenSim *JobGenSim::copy() {
     return new JobGenSim(this);
 }
+
+void JobGenSim::copy_state(const JobGen *job_gen_base) {
+    // Distribution parameters are shared with copies, only the regime, the rng and per-distribution state are taken
+    // over
+    auto *job_gen = dynamic_cast<const JobGenSim *>(job_gen_base);
+    assert(job_gen != nullptr and job_gen->num_states == num_states);
+    *rng = *(job_gen->rng);
+    state = job_gen->state;
+    state_saved = job_gen->state_saved;
+    time_elapsed = job_gen->time_elapsed;
+    time_elapsed_saved = job_gen->time_elapsed_saved;
+    for (int i = 0; i < num_states; i++) {
+        dists_size[i]->copy_state(job_gen->dists_size[i]);
+        dists_iat[i]->copy_state(job_gen->dists_iat[i]);
+    }
+    rng_block_start = job_gen->rng_block_start;
+    state_block_start = job_gen->state_block_start;
+    time_elapsed_block_start = job_gen->time_elapsed_block_start;
+    copy_buffer(job_gen);
+}
@@ -31,9 +31,20 @@ private:
     int state_saved;
     double time_elapsed_saved;
     int start_state;
+    // Generator state at the start of the job buffer
+    std::mt19937 rng_block_start;
+    int state_block_start;
+    double time_elapsed_block_start;
 
     bool duplicate_object;
 
+    void fill_jobs(JobProcessSample* out, int n) override;
+    void save_block_start() override;
+    void rewind_block_start() override;
+    int fill_regime(JobProcessSample* out, int n);
+    template<class SizeDist> int fill_regime_size(JobProcessSample* out, int n);
+    template<class SizeDist, class IatDist> int fill_regime_dists(JobProcessSample* out, int n);
+
 public:
     JobGenSim(int start_state, double hold_time, int num_states, dist_param* dist_psize, dist_param* dist_piat, int num_servers,
               unsigned int start_seed);
@@ -51,10 +62,10 @@ public:
     int get_curr_index() override;
     double get_chosen_rate() override;
     void relocate() override;
-    JobProcessSample gen_job() override;
     void save_state() override;
     void load_state() override;
     JobGenSim* copy() override;
+    void copy_state(const JobGen* job_gen) override;
 };
 
 
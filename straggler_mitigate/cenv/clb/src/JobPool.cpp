@@ -0,0 +1,111 @@
+#include <cstddef>
+#include <new>
+#include "JobPool.h"
+
+JobPool::JobPool(unsigned short num_servers, unsigned int slab_size) {
+    this->num_servers = num_servers;
+    this->slab_size = slab_size;
+}
+
+void JobPool::grow_jobs() {
+    // Raw storage, jobs are constructed in place when handed out
+    Job* slab = static_cast<Job*>(::operator new(sizeof(Job) * slab_size));
+    job_slabs.push_back(slab);
+    for (unsigned int i = 0; i < slab_size; i++)
+        free_jobs.push_back(slab + i);
+}
+
+void JobPool::grow_events() {
+    auto* slab = new JobEvent[slab_size];
+    event_slabs.push_back(slab);
+    for (unsigned int i = 0; i < slab_size; i++)
+        free_events.push_back(slab + i);
+}
+
+void JobPool::grow_shared() {
+    auto* slab = new JobShared[slab_size];
+    auto* duplicates = new unsigned short[(std::size_t) slab_size * num_servers];
+    shared_slabs.push_back(slab);
+    duplicates_slabs.push_back(duplicates);
+    for (unsigned int i = 0; i < slab_size; i++) {
+        slab[i].duplicates = duplicates + (std::size_t) i * num_servers;
+        free_shared.push_back(slab + i);
+    }
+}
+
+JobShared* JobPool::acquire_shared() {
+    if (free_shared.empty())
+        grow_shared();
+    JobShared* shared = free_shared.back();
+    free_shared.pop_back();
+    return shared;
+}
+
+Job* JobPool::acquire_job() {
+    if (free_jobs.empty())
+        grow_jobs();
+    Job* job = free_jobs.back();
+    free_jobs.pop_back();
+    return job;
+}
+
+Job* JobPool::new_job(unsigned int id, double size, double arrival_time, double inter_arrival_time,
+                      unsigned char trace_origin_index) {
+    JobShared* shared = acquire_shared();
+    return new (acquire_job()) Job(id, size, arrival_time, inter_arrival_time, trace_origin_index, shared);
+}
+
+Job* JobPool::new_duplicate(Job* base) {
+    return new (acquire_job()) Job(base, num_servers);
+}
+
+Job* JobPool::copy_job(Job* base, Job* prev_instance) {
+    JobShared* shared = prev_instance == nullptr ? acquire_shared() : nullptr;
+    return new (acquire_job()) Job(base, prev_instance, shared, num_servers);
+}
+
+JobEvent* JobPool::new_event(EventType eventType, double time_key, Job* job) {
+    if (free_events.empty())
+        grow_events();
+    JobEvent* jobEvent = free_events.back();
+    free_events.pop_back();
+    jobEvent->eventType = eventType;
+    jobEvent->time_key = time_key;
+    jobEvent->job = job;
+    return jobEvent;
+}
+
+void JobPool::release(JobEvent* jobEvent) {
+    Job* job = jobEvent->job;
+    if (job->free())
+        free_shared.push_back(job->shared);
+    job->~Job();
+    free_jobs.push_back(job);
+    free_events.push_back(jobEvent);
+}
+
+void JobPool::reset() {
+    free_jobs.clear();
+    free_events.clear();
+    free_shared.clear();
+    for (auto slab: job_slabs)
+        for (unsigned int i = 0; i < slab_size; i++)
+            free_jobs.push_back(slab + i);
+    for (auto slab: event_slabs)
+        for (unsigned int i = 0; i < slab_size; i++)
+            free_events.push_back(slab + i);
+    for (auto slab: shared_slabs)
+        for (unsigned int i = 0; i < slab_size; i++)
+            free_shared.push_back(slab + i);
+}
+
+JobPool::~JobPool() {
+    for (auto slab: job_slabs)
+        ::operator delete(slab);
+    for (auto slab: event_slabs)
+        delete[] slab;
+    for (auto slab: shared_slabs)
+        delete[] slab;
+    for (auto slab: duplicates_slabs)
+        delete[] slab;
+}
@@ -0,0 +1,48 @@
+#ifndef CLB_JOBPOOL_H
+#define CLB_JOBPOOL_H
+
+#include <vector>
+#include "Job.h"
+#include "TimeLine.h"
+
+// Slab allocator with free lists for jobs, timeline events and the state shared between duplicate instances of a job.
+// Objects are carved out of fixed-size slabs that are only released when the pool is destroyed, so the steady-state
+// simulation loop does not touch the heap. reset() hands every object back at once, which is only safe when nothing
+// else (i.e. the timeline) still refers to them.
+class JobPool {
+private:
+    unsigned short num_servers;
+    unsigned int slab_size;
+
+    std::vector<Job*> job_slabs;
+    std::vector<JobEvent*> event_slabs;
+    std::vector<JobShared*> shared_slabs;
+    std::vector<unsigned short*> duplicates_slabs;
+
+    std::vector<Job*> free_jobs;
+    std::vector<JobEvent*> free_events;
+    std::vector<JobShared*> free_shared;
+
+    void grow_jobs();
+    void grow_events();
+    void grow_shared();
+    JobShared* acquire_shared();
+    Job* acquire_job();
+
+public:
+    explicit JobPool(unsigned short num_servers, unsigned int slab_size = 1024);
+    ~JobPool();
+
+    Job* new_job(unsigned int id, double size, double arrival_time, double inter_arrival_time,
+                 unsigned char trace_origin_index);
+    Job* new_duplicate(Job* base);
+    Job* copy_job(Job* base, Job* prev_instance);
+    JobEvent* new_event(EventType eventType, double time_key, Job* job);
+
+    // Returns the event and its job instance, and the shared state once the last instance of the job is released
+    void release(JobEvent* jobEvent);
+    void reset();
+};
+
+
+#endif
@@ -8,18 +8,23 @@
 #include "utils.h"
 #include <cassert>
 #include <limits>
+#include <utility>
 #include "pipes/AgentWindowStatsPipe.h"
 #include "pipes/WindowStatsPipe.h"
-#include "pipes/FilePipe.h"
+#include "pipes/ColumnFilePipe.h"
 #include "pipes/NullPipe.h"
 #include "pipes/LoggerSortPipe.h"
 #include "pipes/TimeBucketPipe.h"
+#include "pipes/AsyncPipe.h"
+#include "ThreadPool.h"
 
 LoadBalanceEnv::LoadBalanceEnv(unsigned int seed_start, unsigned short num_servers, double time_window,
                                bool load_in_obs, bool ext_in_obs, const std::string &filename_log,
                                bool act_in_obs, bool trace_in_obs, short *timeouts, unsigned short num_timeouts, const double *service_rates,
                                unsigned short len_rates, int max_retries, JobGen *jobGen, bool use_tw,
-                               unsigned short unsafety_upper_bound, unsigned short safety_lower_bound, bool skip_log) {
+                               unsigned short unsafety_upper_bound, unsigned short safety_lower_bound, bool skip_log,
+                               EventQueueType event_queue, unsigned short num_windows,
+                               unsigned short num_work_measure_windows) {
     this->rng = new std::mt19937(seed_start);
     this->num_servers = num_servers;
     this->time_window_ms = time_window;
@@ -29,10 +34,14 @@ LoadBalanceEnv::LoadBalanceEnv(unsigned int seed_start, unsigned short num_serve
     this -> unsafety_upper_bound = unsafety_upper_bound;
     this -> unsafe = false;
     this->wallTime = new WallTime();
-    this->timeLine = new TimeLine();
+    this->jobPool = new JobPool(num_servers);
+    this->timeLine = new TimeLine(event_queue);
     this->jobGen = jobGen;
+    this->owns_job_gen = false;
     this->server_array = new Server *[num_servers];
     this->server_len = new unsigned short[num_servers]();
+    this->serverLoadTree = new ServerLoadTree(num_servers);
+    this->server_update_time = new double[num_servers]();
     this->average_server_len = new double[num_servers]();
     double rates[num_servers];
     if (len_rates == 1 || len_rates == 2 || len_rates == 2 * this->jobGen->get_num_traces()) {
@@ -55,23 +64,14 @@ LoadBalanceEnv::LoadBalanceEnv(unsigned int seed_start, unsigned short num_serve
     for (unsigned short i = 0; i < num_servers; i++)
         this->server_array[i] = new Server(i, this->wallTime, this->rng, rates[i]);
     this->last_action = 0;
-    this->work_measure_count = new int[MAX_WORK_MEASURE_WINDOWS]();
-    this->work_measure_time = new double[MAX_WORK_MEASURE_WINDOWS]();
-    this->work_measure_index = 0;
-//    this->proc_big_window = new double *[MAX_WINDOWS];
-//    this->iat_big_window = new double *[MAX_WINDOWS];
-    this->proc_sum_window = new double [MAX_WINDOWS]();
-    this->iat_sum_window = new double [MAX_WINDOWS]();
-    this->proc_avg_window = new double [MAX_WINDOWS]();
-    this->iat_avg_window = new double [MAX_WINDOWS]();
-    this->len_big_window = new int[MAX_WINDOWS]();
-//    for (unsigned short i = 0; i < MAX_WINDOWS; i++) {
-//        this->proc_big_window[i] = new double[MAX_WINDOW_SIZE];
-//        this->iat_big_window[i] = new double[MAX_WINDOW_SIZE];
-//    }
-    this->index_big_window = 0;
+    assert(num_windows > 0 and num_work_measure_windows > 0);
+    this->num_windows = num_windows;
+    this->num_work_measure_windows = num_work_measure_windows;
+    this->loadWindows = new SlidingWindows(num_windows);
+    this->workMeasureWindows = new SlidingWindows(num_work_measure_windows);
     this->size_scale = this->jobGen->get_size_avg() * 10 / this -> avg_rate;
     this->arrival_scale = this->jobGen->get_arrival_avg() * 10;
+    this->reward_percentile = 0.95;
     this->next_id = 0;
     this->next_job_gen_time = wallTime->curr_time;
     this->next_sim_time_ms = 0;
@@ -81,8 +81,9 @@ LoadBalanceEnv::LoadBalanceEnv(unsigned int seed_start, unsigned short num_serve
     if (skip_log){
         this->logger = new NullPipe();
     } else {
-        auto* agentFile = new FilePipe(filename_log+ "_agent", sizeof(AgentWindowStat));
-        auto* allFile = new FilePipe(filename_log+ "_all", sizeof(WindowStat));
+        // Every statistic is its own column file, readers memory map only the columns they need
+        auto* agentFile = new ColumnFilePipe(filename_log+ "_agent", agent_window_stat_columns(num_timeouts), 256);
+        auto* allFile = new ColumnFilePipe(filename_log+ "_all", window_stat_columns(), 256);
         auto* agentStats = new AgentWindowStatsPipe(num_timeouts);
         auto* allStats = new WindowStatsPipe();
         agentStats->appendPipe(agentFile);
@@ -91,11 +92,15 @@ LoadBalanceEnv::LoadBalanceEnv(unsigned int seed_start, unsigned short num_serve
         auto* allBucket = new TimeBucketPipe(300*1000, false);
         agentBucket->appendPipe(agentStats);
         allBucket->appendPipe(allStats);
-        this->logger = new LoggerSortPipe(20000, true);
-        this->logger->appendPipe(agentBucket);
-        this->logger->appendPipe(allBucket);
+        auto* sorter = new LoggerSortPipe(20000, true);
+        sorter->appendPipe(agentBucket);
+        sorter->appendPipe(allBucket);
+        // Sorting, bucketing, statistics and file writes all happen on the logger's own thread
+        this->logger = new AsyncPipe(1 << 16);
+        this->logger->appendPipe(sorter);
     }
 //    this->logger = new Logger(1024 * 1024 * 1024, filename_log, skip_log);
+    this->allocate_buffers();
     this->generate_job();
 }
 
@@ -110,8 +115,11 @@ LoadBalanceEnv::LoadBalanceEnv(LoadBalanceEnv *base_env) {
     this -> unsafe = base_env->unsafe;
     this->wallTime = new WallTime(base_env->wallTime);
     this->jobGen = base_env->jobGen->copy();
+    this->owns_job_gen = true;
 
     this->server_len = new unsigned short[num_servers]();
+    this->serverLoadTree = new ServerLoadTree(base_env->serverLoadTree);
+    this->server_update_time = new double[num_servers]();
     this->average_server_len = new double[num_servers]();
     for (int i=0; i< num_servers; i++){
         this->server_len[i] = base_env->server_len[i];
@@ -124,9 +132,9 @@ LoadBalanceEnv::LoadBalanceEnv(LoadBalanceEnv *base_env) {
         this->server_array[i] = new Server(base_env->server_array[i], this->rng, this->wallTime);
     }
     this->last_action = base_env->last_action;
-    this->index_big_window = base_env->index_big_window;
     this->size_scale = base_env->size_scale;
     this->arrival_scale = base_env->arrival_scale;
+    this->reward_percentile = base_env->reward_percentile;
     this->next_id = base_env->next_id;
     this->next_job_gen_time = base_env->next_job_gen_time;
     this->next_sim_time_ms = base_env->next_sim_time_ms;
@@ -134,27 +142,56 @@ LoadBalanceEnv::LoadBalanceEnv(LoadBalanceEnv *base_env) {
     this->observationSpace = new ObservationSpace(base_env->observationSpace);
     this->logger = new NullPipe();
 //    this->logger = new Logger(1024 * 1024 * 1024, "null", true);
-    this->work_measure_index = base_env->work_measure_index;
+    this->num_windows = base_env->num_windows;
+    this->num_work_measure_windows = base_env->num_work_measure_windows;
+    this->loadWindows = new SlidingWindows(base_env->loadWindows);
+    this->workMeasureWindows = new SlidingWindows(base_env->workMeasureWindows);
+    for (unsigned short i = 0; i < 6; i++)
+        this->workload_ewma[i] = base_env->workload_ewma[i];
+    for (unsigned short i = 0; i < 3; i++)
+        this->workload_ewma_scale[i] = base_env->workload_ewma_scale[i];
+    this->jobPool = new JobPool(this -> num_servers);
+    this->timeLine = new TimeLine(base_env->timeLine, this -> jobPool, false);
+    this->allocate_buffers();
+}
 
-    this->work_measure_count = new int[MAX_WORK_MEASURE_WINDOWS]();
-    this->work_measure_time = new double[MAX_WORK_MEASURE_WINDOWS]();
-    for (unsigned short i = 0; i < MAX_WORK_MEASURE_WINDOWS; i++) {
-        this->work_measure_count[i] = base_env->work_measure_count[i];
-        this->work_measure_time[i] = base_env->work_measure_time[i];
-    }
-    this->proc_sum_window = new double [MAX_WINDOWS]();
-    this->iat_sum_window = new double [MAX_WINDOWS]();
-    this->proc_avg_window = new double [MAX_WINDOWS]();
-    this->iat_avg_window = new double [MAX_WINDOWS]();
-    this->len_big_window = new int[MAX_WINDOWS]();
-    for (unsigned short i = 0; i < MAX_WINDOWS; i++) {
-        this->proc_sum_window[i] = base_env->proc_sum_window[i];
-        this->iat_sum_window[i] = base_env->iat_sum_window[i];
-        this->proc_avg_window[i] = base_env->proc_avg_window[i];
-        this->iat_avg_window[i] = base_env->iat_avg_window[i];
-        this->len_big_window[i] = base_env->len_big_window[i];
-    }
-    this->timeLine = new TimeLine(base_env->timeLine, this -> num_servers, false);
+void LoadBalanceEnv::restore(LoadBalanceEnv *snapshot) {
+    // Takes over the simulation state of a fresh copy of the snapshot, and hands the current state to the copy so it
+    // is freed with it. The logger and the buffers exposed to Python stay in place, and so does the job generator: it
+    // is rewound to the snapshot's position, so handles to it (get_env_job_gen) keep driving this env.
+    auto *state = new LoadBalanceEnv(snapshot);
+    std::swap(rng, state->rng);
+    std::swap(wallTime, state->wallTime);
+    std::swap(jobPool, state->jobPool);
+    std::swap(timeLine, state->timeLine);
+    std::swap(server_array, state->server_array);
+    jobGen->copy_state(state->jobGen);
+    std::swap(server_len, state->server_len);
+    std::swap(serverLoadTree, state->serverLoadTree);
+    std::swap(server_update_time, state->server_update_time);
+    std::swap(average_server_len, state->average_server_len);
+    std::swap(loadWindows, state->loadWindows);
+    std::swap(workMeasureWindows, state->workMeasureWindows);
+    std::swap(workload_ewma, state->workload_ewma);
+    std::swap(workload_ewma_scale, state->workload_ewma_scale);
+    last_action = state->last_action;
+    size_scale = state->size_scale;
+    arrival_scale = state->arrival_scale;
+    next_id = state->next_id;
+    next_job_gen_time = state->next_job_gen_time;
+    next_sim_time_ms = state->next_sim_time_ms;
+    unsafe = state->unsafe;
+    delete state;
+}
+
+void LoadBalanceEnv::allocate_buffers() {
+    this->observation_buffer = new double[observationSpace->length]();
+    this->server_time_buffer = new double[num_servers]();
+    this->finished_job_duration_buffer = new double[MAX_WINDOW_SIZE];
+    this->arrived_job_inter_time_buffer = new double[MAX_WINDOW_SIZE];
+    this->arrived_job_proc_time_buffer = new double[MAX_WINDOW_SIZE];
+    this->queue_buffer = new unsigned short[num_servers]();
+    this->percentile_buffer = new double[MAX_WINDOW_SIZE];
 }
 
 void LoadBalanceEnv::seed(unsigned int seed_start) {
@@ -164,24 +201,20 @@ void LoadBalanceEnv::seed(unsigned int seed_start) {
         server_array[i]->set_rng(rng);
 }
 
-unsigned short LoadBalanceEnv::best_server(Job *new_job) const {
-    unsigned short best, least;
-    best = -1;
-    least = std::numeric_limits<unsigned short>::max();
-    if (new_job->duplicate) {
-        for (unsigned short i = 0; i < num_servers; i++)
-            if (server_len[i] < least and !new_job->duplicates[i]) {
-                least = server_len[i];
-                best = i;
-            }
-    } else {
-        for (unsigned short i = 0; i < num_servers; i++)
-            if (server_len[i] < least) {
-                least = server_len[i];
-                best = i;
-            }
-    }
-    return best;
+unsigned short LoadBalanceEnv::best_server(Job *new_job) {
+    // Least loaded server, lowest index on ties. Duplicates skip the servers earlier instances were sent to.
+    if (new_job->duplicate)
+        return serverLoadTree->best_excluding(new_job->duplicates, *(new_job->num_duplicates));
+    return serverLoadTree->best();
+}
+
+void LoadBalanceEnv::accumulate_server_time(unsigned short server, double *server_time) {
+    // Queue lengths are piecewise constant, so a server only needs to be accumulated when its length changes
+    double dt = wallTime->curr_time - server_update_time[server];
+    if (server_len[server] > 0)
+        server_time[server] += dt;
+    average_server_len[server] += server_len[server] * dt;
+    server_update_time[server] = wallTime->curr_time;
 }
 
 void LoadBalanceEnv::set_arrival_scale(double arrival_scale_){
@@ -200,28 +233,32 @@ double LoadBalanceEnv::get_size_scale() const{
     return size_scale;
 }
 
+void LoadBalanceEnv::set_reward_percentile(double reward_percentile_){
+    assert(reward_percentile_ >= 0 and reward_percentile_ <= 1);
+    this -> reward_percentile = reward_percentile_;
+}
+
+double LoadBalanceEnv::get_reward_percentile() const{
+    return reward_percentile;
+}
+
 void LoadBalanceEnv::reset_no_obs() {
     for (int i = 0; i < num_servers; i++) {
         server_array[i]->reset();
         server_len[i] = 0;
         average_server_len[i] = 0;
     }
+    serverLoadTree->reset();
     wallTime->reset();
     timeLine->reset();
+    jobPool->reset();
     last_action = 0;
-    for (unsigned short i = 0; i < MAX_WINDOWS; i++) {
-        len_big_window[i] = 0;
-        iat_sum_window[i] = 0;
-        iat_avg_window[i] = 0;
-        proc_sum_window[i] = 0;
-        proc_avg_window[i] = 0;
-    }
+    loadWindows->reset();
     for (unsigned short i = 0; i < 3; i++) {
         workload_ewma[i] = 0;
         workload_ewma[i+3] = 0;
         workload_ewma_scale[i] = 0;
     }
-    index_big_window = 0;
     next_id = 0;
     next_job_gen_time = wallTime->curr_time;
     next_sim_time_ms = 0;
@@ -237,35 +274,66 @@ void LoadBalanceEnv::reset(double *observation) {
 
 double *LoadBalanceEnv::reset() {
     reset_no_obs();
-    return this->observe();
+    this->observe(observation_buffer);
+    return observation_buffer;
 }
 
 void LoadBalanceEnv::generate_job() {
     JobProcessSample sample = jobGen->gen_job();
-    Job *new_job = new Job(next_id, sample.size, next_job_gen_time, sample.inter_arrival_time,
-                           sample.trace_origin_index);
-    auto *jobEvent = new JobEvent{.eventType=EventType(schedule),
-                                  .time_key=new_job->arrival_time,
-                                  .job=new_job};
+    Job *new_job = jobPool->new_job(next_id, sample.size, next_job_gen_time, sample.inter_arrival_time,
+                                    sample.trace_origin_index);
+    JobEvent *jobEvent = jobPool->new_event(schedule, new_job->arrival_time, new_job);
     timeLine->push(jobEvent);
     next_id += 1;
     next_job_gen_time += sample.inter_arrival_time;
 }
 
-void LoadBalanceEnv::observe(double *observation) {
-    unsigned short max_queue = 0;
-    for (int i = 0; i < num_servers; i++) {
-        observation[i] = server_len[i];
-        if (server_len[i] > max_queue)
-            max_queue = server_len[i];
-        observation[i + num_servers] = average_server_len[i];
+void LoadBalanceEnv::load_features(double *arrival_rate, double *job_size) const {
+    // Average arrival rate and job size over the load windows, scaled as they are observed
+    int count_jobs = loadWindows->count();
+    if (count_jobs == 0) {
+        *arrival_rate = 0;
+        *job_size = 0;
+    } else {
+        *arrival_rate = count_jobs / (loadWindows->iat_sum() + 1e-8) / arrival_scale;
+        *job_size = loadWindows->proc_sum() / (count_jobs + 1e-8) / size_scale;
     }
+}
+
+void LoadBalanceEnv::update_obs_state() {
+    // State that advances once per observed window: the training wheels hysteresis and the workload EWMAs.
+    // observe() calls this, fast_forward calls it alone for windows that are skipped, so both end in the same state.
     if (use_tw){
+        unsigned short max_queue = 0;
+        for (int i = 0; i < num_servers; i++)
+            if (server_len[i] > max_queue)
+                max_queue = server_len[i];
         if (unsafe and max_queue <= safety_lower_bound)
             unsafe = false;
         else if (!unsafe and max_queue > unsafety_upper_bound)
             unsafe = true;
     }
+    if (observationSpace->load_in_obs and observationSpace->ext_in_obs) {
+        double arrival_rate, job_size;
+        load_features(&arrival_rate, &job_size);
+        workload_ewma_scale[0] = 0.9 * workload_ewma_scale[0] + 1;
+        workload_ewma_scale[1] = 0.99 * workload_ewma_scale[1] + 1;
+        workload_ewma_scale[2] = 0.999 * workload_ewma_scale[2] + 1;
+        workload_ewma[0] = 0.9 * workload_ewma[0] + arrival_rate;
+        workload_ewma[1] = 0.99 * workload_ewma[1] + arrival_rate;
+        workload_ewma[2] = 0.999 * workload_ewma[2] + arrival_rate;
+        workload_ewma[3] = 0.9 * workload_ewma[3] + job_size;
+        workload_ewma[4] = 0.99 * workload_ewma[4] + job_size;
+        workload_ewma[5] = 0.999 * workload_ewma[5] + job_size;
+    }
+}
+
+void LoadBalanceEnv::observe(double *observation) {
+    update_obs_state();
+    for (int i = 0; i < num_servers; i++) {
+        observation[i] = server_len[i];
+        observation[i + num_servers] = average_server_len[i];
+    }
     int count = 2 * num_servers;
     if (observationSpace->load_in_obs) {
 //        double job_iat_sum = 0;
@@ -276,9 +344,9 @@ void LoadBalanceEnv::observe(double *observation) {
 //            job_iat_sum += sum(iat_big_window[i], len_big_window[i]);
 //            job_size_sum += sum(proc_big_window[i], len_big_window[i]);
 //        }
-        double job_iat_sum = sum(iat_sum_window, MAX_WINDOWS);
-        double job_size_sum = sum(proc_sum_window, MAX_WINDOWS);
-        int count_jobs = sum(len_big_window, MAX_WINDOWS);
+        double job_iat_sum = loadWindows->iat_sum();
+        double job_size_sum = loadWindows->proc_sum();
+        int count_jobs = loadWindows->count();
         if (count_jobs == 0) {
             observation[count++] = 0;
             observation[count++] = 0;
@@ -286,8 +354,8 @@ void LoadBalanceEnv::observe(double *observation) {
             observation[count++] = 0;
             observation[count++] = 0;
         } else {
-            observation[count++] = count_jobs / (job_iat_sum + 1e-8) / arrival_scale;
-            observation[count++] = job_size_sum / (count_jobs + 1e-8) / size_scale;
+            load_features(&observation[count], &observation[count + 1]);
+            count += 2;
 //            // This takes the top 50% of inter arrival times and gives us the average. So we only need to deduct this from
 //            // the main average to compute the low 50% of inter arrival times.
 //            double avg_partition_50_iat = avg_partition_multi_array(iat_big_window, (int *) len_big_window, MAX_WINDOWS,
@@ -297,28 +365,13 @@ void LoadBalanceEnv::observe(double *observation) {
 //            double avg_partition_90_size = avg_partition_multi_array(proc_big_window, (int *) len_big_window,
 //                                                                     MAX_WINDOWS, 0.1);
 //            observation[count++] = avg_partition_90_size / size_scale;
-            double job_iat_avg_min = std::numeric_limits<double>::infinity();
-            double job_size_avg_max = -std::numeric_limits<double>::infinity();
-            for (int i = 0; i < MAX_WINDOWS; ++i) {
-                if (job_iat_avg_min > iat_avg_window[i] and len_big_window[i] > 0)
-                    job_iat_avg_min = iat_avg_window[i];
-                if (job_size_avg_max < proc_avg_window[i] and len_big_window[i] > 0)
-                    job_size_avg_max = proc_avg_window[i];
-            }
+            double job_iat_avg_min = loadWindows->min_iat_avg();
+            double job_size_avg_max = loadWindows->max_proc_avg();
             observation[count++] = 1 / job_iat_avg_min / arrival_scale;
             observation[count++] = job_size_avg_max / size_scale;
             observation[count++] = job_size_sum / (job_iat_sum + 1e-8) / num_servers;
         }
         if (observationSpace->ext_in_obs){
-            workload_ewma_scale[0] = 0.9 * workload_ewma_scale[0] + 1;
-            workload_ewma_scale[1] = 0.99 * workload_ewma_scale[1] + 1;
-            workload_ewma_scale[2] = 0.999 * workload_ewma_scale[2] + 1;
-            workload_ewma[0] = 0.9 * workload_ewma[0] + observation[count-5];
-            workload_ewma[1] = 0.99 * workload_ewma[1] + observation[count-5];
-            workload_ewma[2] = 0.999 * workload_ewma[2] + observation[count-5];
-            workload_ewma[3] = 0.9 * workload_ewma[3] + observation[count-4];
-            workload_ewma[4] = 0.99 * workload_ewma[4] + observation[count-4];
-            workload_ewma[5] = 0.999 * workload_ewma[5] + observation[count-4];
             observation[count++] = workload_ewma[0]/workload_ewma_scale[0];
             observation[count++] = workload_ewma[3]/workload_ewma_scale[0];
             observation[count++] = workload_ewma[1]/workload_ewma_scale[1];
@@ -351,9 +404,8 @@ void LoadBalanceEnv::observe(double *observation) {
 }
 
 double *LoadBalanceEnv::observe() {
-    auto observation = new double[observationSpace->length];
-    observe(observation);
-    return observation;
+    observe(observation_buffer);
+    return observation_buffer;
 }
 
 double LoadBalanceEnv::get_avg_rate() const {
@@ -364,31 +416,81 @@ step_return
 LoadBalanceEnv::step(unsigned short action, unsigned short model_index, double *server_time,
                      double *finished_job_duration, double *arrived_job_inter_time, double *arrived_job_proc_time,
                      double* observation) {
+    step_return ret = run_window(action, model_index, server_time, finished_job_duration, arrived_job_inter_time,
+                                 arrived_job_proc_time, true);
+
+    bool done = true;
+    for (int i = 0; i < num_servers; i++)
+        if (server_len[i] > 0)
+            done = false;
+    ret.done = done;
+
+    ret.reward = percentile(finished_job_duration, ret.num_finished_jobs, reward_percentile, percentile_buffer);
+
+    observe(observation);
+    ret.next_obs = observation;
+    ret.unsafe = unsafe;
+    return ret;
+}
+
+unsigned int LoadBalanceEnv::fast_forward(double until_time_ms, unsigned short action) {
+    // Plays whole windows with a fixed action until the next window would end after until_time_ms. No reward is
+    // computed and finished jobs are not logged. Skipped windows only advance the state observations depend on, the
+    // last one is observed into the observation buffer as by step(), so the env ends as a replay of step() calls
+    // would. If no window fits, nothing happens and the observation buffer is left as is.
+    unsigned int num_windows = 0;
+    while (next_sim_time_ms + time_window_ms <= until_time_ms) {
+        run_window(action, 0, server_time_buffer, finished_job_duration_buffer, arrived_job_inter_time_buffer,
+                   arrived_job_proc_time_buffer, false);
+        num_windows++;
+        if (next_sim_time_ms + time_window_ms <= until_time_ms)
+            update_obs_state();
+        else
+            observe(observation_buffer);
+    }
+    return num_windows;
+}
+
+void LoadBalanceEnv::rollout_actions(unsigned short horizon, double *rewards, unsigned int num_threads) {
+    // Every action is held for horizon windows on its own copy of the current state, and the reward of window h is
+    // written to rewards[action * horizon + h]. Copies start from the same rng state, so actions are compared on the
+    // same service time inflations. This env is only read, copies are made and stepped concurrently.
+    unsigned short num_actions = actionSpace->n;
+    ThreadPool pool(num_threads > num_actions ? num_actions : num_threads);
+    pool.parallel_for(num_actions, [&](unsigned int action) {
+        LoadBalanceEnv fork(this);
+        for (unsigned short h = 0; h < horizon; h++)
+            rewards[action * horizon + h] = fork.step(action, 0).reward;
+    });
+}
+
+step_return
+LoadBalanceEnv::run_window(unsigned short action, unsigned short model_index, double *server_time,
+                           double *finished_job_duration, double *arrived_job_inter_time,
+                           double *arrived_job_proc_time, bool log_jobs) {
+    // Simulates one time window, filling everything in step_return except done, reward and next_obs
     for (int i = 0; i < num_servers; i++){
         server_time[i] = 0;
         average_server_len[i] = 0;
+        server_update_time[i] = wallTime->curr_time;
     }
-    iat_sum_window[index_big_window] = 0;
-    proc_sum_window[index_big_window] = 0;
+    double window_iat_sum = 0;
+    double window_proc_sum = 0;
     unsigned short num_finished_jobs = 0;
     unsigned short num_arrived_jobs = 0;
     double time_start = wallTime->curr_time;
     double time_end = next_sim_time_ms + time_window_ms;
-    len_big_window[index_big_window] = 0;
     last_action = action;
     while (timeLine->seek()->time_key <= time_end or num_finished_jobs == 0) {
         JobEvent *jobEvent = timeLine->pop();
-        double dt = jobEvent->time_key - wallTime->curr_time;
-        for (int i = 0; i < num_servers; i++) {
-            if (server_len[i] > 0)
-                server_time[i] += dt;
-            average_server_len[i] += server_len[i] * dt;
-        }
         wallTime->update(jobEvent->time_key);
         if (jobEvent->eventType == finish) {
-            server_array[jobEvent->job->assigned_server_id]->len_queue -= 1;
+            unsigned short assigned_server = jobEvent->job->assigned_server_id;
+            accumulate_server_time(assigned_server, server_time);
+            server_array[assigned_server]->len_queue -= 1;
 //            jobEvent->job->assigned_server->len_queue -= 1;
-            server_len[jobEvent->job->assigned_server_id] -= 1;
+            server_len[assigned_server] -= 1;
+            serverLoadTree->update(assigned_server, server_len[assigned_server]);
 //            server_len[jobEvent->job->assigned_server->id] -= 1;
             if (!*(jobEvent->job->completed)) {
                 *(jobEvent->job->completed) = true;
@@ -397,16 +499,17 @@ LoadBalanceEnv::step(unsigned short action, unsigned short model_index, double *
                 assert(jobEvent->job->finish_time == wallTime->curr_time);
                 finished_job_duration[num_finished_jobs++] = jobEvent->job->get_delay();
             }
-            logger->enqueueJob(jobEvent->job);
+            if (log_jobs)
+                logger->enqueueJob(jobEvent->job);
 //            logger->log_job(jobEvent->job);
-            jobEvent->job->free();
-            delete jobEvent->job;
-            delete jobEvent;
+            jobPool->release(jobEvent);
         } else if (jobEvent->eventType == schedule) {
             assert(actionSpace->contains(action));
             unsigned short selected_server = best_server(jobEvent->job);
+            accumulate_server_time(selected_server, server_time);
             server_array[selected_server]->schedule(jobEvent->job);
             server_len[selected_server] += 1;
+            serverLoadTree->update(selected_server, server_len[selected_server]);
             jobEvent->job->tw_driven = unsafe;
             jobEvent->job->timeout_idx = action;
             jobEvent->job->timeout = actionSpace->timeouts[action];
@@ -421,22 +524,23 @@ LoadBalanceEnv::step(unsigned short action, unsigned short model_index, double *
                 arrived_job_proc_time[num_arrived_jobs++] = jobEvent->job->get_duration();
 //                iat_big_window[index_big_window][num_arrived_jobs] = jobEvent->job->inter_arrival_time;
 //                proc_big_window[index_big_window][num_arrived_jobs++] = jobEvent->job->get_duration();
-                iat_sum_window[index_big_window] += jobEvent->job->inter_arrival_time;
-                proc_sum_window[index_big_window] += jobEvent->job->get_duration();
+                window_iat_sum += jobEvent->job->inter_arrival_time;
+                window_proc_sum += jobEvent->job->get_duration();
                 generate_job();
             }
 
             if (jobEvent->job->timeout + wallTime->curr_time < *(jobEvent->job->best_finish_time) and
                 *(jobEvent->job->num_instances) <= max_retries and jobEvent->job->timeout > 0 and
                 *(jobEvent->job->num_instances) < num_servers) {
-                Job *dup_job = new Job(jobEvent->job, num_servers);
-                auto *dup_jobEvent = new JobEvent{.eventType=schedule,
-                        .time_key=jobEvent->job->timeout + wallTime->curr_time,
-                        .job=dup_job};
+                Job *dup_job = jobPool->new_duplicate(jobEvent->job);
+                JobEvent *dup_jobEvent = jobPool->new_event(schedule, jobEvent->job->timeout + wallTime->curr_time,
+                                                            dup_job);
                 timeLine->push(dup_jobEvent);
             }
         }
     }
+    for (unsigned short i = 0; i < num_servers; i++)
+        accumulate_server_time(i, server_time);
     double time_elapsed = wallTime->curr_time - time_start;
 
     if (time_elapsed > 0) {
@@ -448,39 +552,24 @@ LoadBalanceEnv::step(unsigned short action, unsigned short model_index, double *
             average_server_len[i] = server_len[i];
     }
 
-    work_measure_time[work_measure_index] = iat_sum_window[index_big_window];
-    work_measure_count[work_measure_index] = num_arrived_jobs;
-    work_measure_index = (work_measure_index + 1) % MAX_WORK_MEASURE_WINDOWS;
-
-    len_big_window[index_big_window] = num_arrived_jobs;
-    iat_avg_window[index_big_window] = iat_sum_window[index_big_window] / (num_arrived_jobs + 1e-8);
-    proc_avg_window[index_big_window] = proc_sum_window[index_big_window] / (num_arrived_jobs + 1e-8);
-    double step_proc_avg = proc_avg_window[index_big_window];
-    double step_iat_avg = iat_avg_window[index_big_window];
-    index_big_window = (index_big_window + 1) % MAX_WINDOWS;
+    workMeasureWindows->push(window_iat_sum, 0, num_arrived_jobs);
+    loadWindows->push(window_iat_sum, window_proc_sum, num_arrived_jobs);
+    double step_proc_avg = window_proc_sum / (num_arrived_jobs + 1e-8);
+    double step_iat_avg = window_iat_sum / (num_arrived_jobs + 1e-8);
 
     if (wallTime->curr_time <= time_end)
         next_sim_time_ms += time_window_ms;
     else
         next_sim_time_ms += time_elapsed;
 
-    bool done = true;
-    for (int i = 0; i < num_servers; i++)
-        if (server_len[i] > 0)
-            done = false;
-
-    double rew_p = percentile(finished_job_duration, num_finished_jobs, 0.95);
-
-    observe(observation);
-
     return step_return{
             .num_finished_jobs=num_finished_jobs,
-            .done=done,
-            .next_obs=observation,
+            .done=false,
+            .next_obs=nullptr,
             .server_time=server_time,
             .time_elapsed=time_elapsed,
             .finished_job_completion_times=finished_job_duration,
-            .reward=rew_p,
+            .reward=0,
             .arrived_job_inter_time=arrived_job_inter_time,
             .arrived_job_proc_time=arrived_job_proc_time,
             .avg_arrived_job_inter_time=step_iat_avg,
@@ -492,13 +581,8 @@ LoadBalanceEnv::step(unsigned short action, unsigned short model_index, double *
 }
 
 step_return LoadBalanceEnv::step(unsigned short action, unsigned short model_index) {
-    auto *server_time = new double[num_servers]();
-    auto *finished_job_duration = new double[MAX_WINDOW_SIZE];
-    auto *arrived_job_inter_time = new double[MAX_WINDOW_SIZE];
-    auto *arrived_job_proc_time = new double[MAX_WINDOW_SIZE];
-    auto observation = new double[observationSpace->length];
-    return step(action, model_index, server_time, finished_job_duration, arrived_job_inter_time,
-                arrived_job_proc_time, observation);
+    return step(action, model_index, server_time_buffer, finished_job_duration_buffer, arrived_job_inter_time_buffer,
+                arrived_job_proc_time_buffer, observation_buffer);
 }
 
 void LoadBalanceEnv::close() const {
@@ -509,37 +593,42 @@ LoadBalanceEnv::~LoadBalanceEnv() {
     delete rng;
     delete wallTime;
     delete timeLine;
+    delete jobPool;
     for (int i = 0; i < num_servers; i++)
         delete server_array[i];
     delete server_array;
     delete observationSpace;
     delete actionSpace;
     delete logger;
+    if (owns_job_gen)
+        delete jobGen;
     delete server_len;
+    delete serverLoadTree;
+    delete[] server_update_time;
     delete average_server_len;
-    delete work_measure_count;
-    delete work_measure_time;
-    delete len_big_window;
-//    for (int i = 0; i < MAX_WINDOWS; i++) {
-//        delete proc_big_window[i];
-//        delete iat_big_window[i];
-//    }
-//    delete proc_big_window;
-//    delete iat_big_window;
-    delete proc_avg_window;
-    delete iat_avg_window;
-    delete proc_sum_window;
-    delete iat_sum_window;
+    delete loadWindows;
+    delete workMeasureWindows;
+    delete[] observation_buffer;
+    delete[] server_time_buffer;
+    delete[] finished_job_duration_buffer;
+    delete[] arrived_job_inter_time_buffer;
+    delete[] arrived_job_proc_time_buffer;
+    delete[] queue_buffer;
+    delete[] percentile_buffer;
 }
 
 double LoadBalanceEnv::get_work_measure() const {
-    return sum(work_measure_count, MAX_WORK_MEASURE_WINDOWS) / sum(work_measure_time, MAX_WORK_MEASURE_WINDOWS) * 1000;
+    return workMeasureWindows->count() / workMeasureWindows->iat_sum() * 1000;
 }
 
 unsigned int LoadBalanceEnv::observation_len() const {
     return observationSpace->length;
 }
 
+unsigned short LoadBalanceEnv::action_len() const {
+    return actionSpace->n;
+}
+
 unsigned int LoadBalanceEnv::timeline_len() const {
     return timeLine->len();
 }
@@ -550,7 +639,6 @@ void LoadBalanceEnv::queue_sizes(unsigned short *queues) const {
 }
 
 unsigned short *LoadBalanceEnv::queue_sizes() const {
-    auto* queues = new unsigned short[num_servers];
-    queue_sizes(queues);
-    return queues;
+    queue_sizes(queue_buffer);
+    return queue_buffer;
 }
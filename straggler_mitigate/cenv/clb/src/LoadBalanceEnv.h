@@ -8,6 +8,9 @@
 #include<random>
 #include "WallTime.h"
 #include "TimeLine.h"
+#include "JobPool.h"
+#include "ServerLoadTree.h"
+#include "SlidingWindows.h"
 #include "Server.h"
 #include "ObservationSpace.h"
 #include "ActionSpace.h"
@@ -35,36 +38,36 @@ struct step_return {
 class LoadBalanceEnv {
 public:
     const int MAX_WINDOW_SIZE = 10000;
-    const int MAX_WINDOWS = 4;
-    const int MAX_WORK_MEASURE_WINDOWS = 20;
+    // Number of past time windows the workload statistics in the observation and the work measure are taken over
+    unsigned short num_windows;
+    unsigned short num_work_measure_windows;
     std::mt19937 *rng;
     WallTime *wallTime;
+    JobPool *jobPool;
     TimeLine *timeLine;
     Server **server_array;
     ObservationSpace *observationSpace;
     ActionSpace *actionSpace;
     Pipe* logger;
     JobGen* jobGen;
+    // Copies of an env drive their own copy of the job generator, the original one belongs to the caller
+    bool owns_job_gen;
     unsigned short *server_len;
+    ServerLoadTree *serverLoadTree;
+    // Time up to which server_time and average_server_len of each server have been accumulated during a step
+    double *server_update_time;
     double *average_server_len;
     unsigned short num_servers;
     unsigned short last_action;
 
-//    double **proc_big_window;
-//    double **iat_big_window;
-    double *proc_sum_window;
-    double *iat_sum_window;
-    double *proc_avg_window;
-    double *iat_avg_window;
-    int *len_big_window;
-    int index_big_window;
-    int *work_measure_count;
-    double *work_measure_time;
-    int work_measure_index;
+    SlidingWindows *loadWindows;
+    SlidingWindows *workMeasureWindows;
     double time_window_ms;
     int max_retries;
     double size_scale;
     double arrival_scale;
+    // Percentile of the finished job durations the reward is taken from, 0.5 for the median, 0.95 by default
+    double reward_percentile;
     unsigned int next_id;
     double next_job_gen_time;
     double next_sim_time_ms;
@@ -78,15 +81,31 @@ public:
     bool unsafe;
     double avg_rate;
 
+    // Scratch buffers owned by the env, reused by every step/observe/queue_sizes call that is not given buffers
+    double *observation_buffer;
+    double *server_time_buffer;
+    double *finished_job_duration_buffer;
+    double *arrived_job_inter_time_buffer;
+    double *arrived_job_proc_time_buffer;
+    unsigned short *queue_buffer;
+    double *percentile_buffer;
+
+private:
+    void allocate_buffers();
+
 public:
     LoadBalanceEnv(unsigned int seed_start, unsigned short num_servers, double time_window, bool load_in_obs,
                    bool ext_in_obs, const std::string& filename_log,  bool act_in_obs, bool trace_in_obs,
                    short *timeouts, unsigned short num_timeouts, const double *service_rates,
                    unsigned short len_rates, int max_retries, JobGen* jobGen, bool use_tw,
-                   unsigned short unsafety_upper_bound, unsigned short safety_lower_bound, bool skip_log);
+                   unsigned short unsafety_upper_bound, unsigned short safety_lower_bound, bool skip_log,
+                   EventQueueType event_queue = binary_heap, unsigned short num_windows = 4,
+                   unsigned short num_work_measure_windows = 20);
 
     explicit LoadBalanceEnv(LoadBalanceEnv* base_env);
 
+    void restore(LoadBalanceEnv* snapshot);
+
     ~LoadBalanceEnv();
 
     void seed(unsigned int seed_start);
@@ -99,6 +118,10 @@ public:
 
     double get_size_scale() const;
 
+    void set_reward_percentile(double reward_percentile);
+
+    double get_reward_percentile() const;
+
     double *reset();
 
     void reset(double* observation);
@@ -113,15 +136,22 @@ public:
 
     unsigned int observation_len() const;
 
+    unsigned short action_len() const;
+
     unsigned int timeline_len() const;
 
+    void load_features(double* arrival_rate, double* job_size) const;
+
+    void update_obs_state();
+
     double* observe();
 
     void observe(double* observation) ;
 
     void close() const;
 
-    unsigned short best_server(Job *new_job) const;
+    unsigned short best_server(Job *new_job);
+    void accumulate_server_time(unsigned short server, double *server_time);
 
     double get_work_measure() const;
 
@@ -131,6 +161,14 @@ public:
                      double* finished_job_duration, double* arrived_job_inter_time, double* arrived_job_proc_time,
                      double* observation);
 
+    step_return run_window(unsigned short action, unsigned short model_index, double* server_time,
+                           double* finished_job_duration, double* arrived_job_inter_time,
+                           double* arrived_job_proc_time, bool log_jobs);
+
+    unsigned int fast_forward(double until_time_ms, unsigned short action);
+
+    void rollout_actions(unsigned short horizon, double* rewards, unsigned int num_threads);
+
     void reset_no_obs();
 };
 
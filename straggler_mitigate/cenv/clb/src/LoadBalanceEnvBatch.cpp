@@ -0,0 +1,117 @@
+#include "LoadBalanceEnvBatch.h"
+
+LoadBalanceEnvBatch::LoadBalanceEnvBatch(unsigned short num_envs, unsigned int seed_start, unsigned short num_servers,
+                                         double time_window, bool load_in_obs, bool ext_in_obs,
+                                         const std::string &filename_log, bool act_in_obs, bool trace_in_obs,
+                                         short *timeouts, unsigned short num_timeouts, const double *service_rates,
+                                         unsigned short len_rates, int max_retries, JobGen **jobGens, bool use_tw,
+                                         unsigned short unsafety_upper_bound, unsigned short safety_lower_bound,
+                                         bool skip_log, unsigned int num_threads, EventQueueType event_queue,
+                                         unsigned short num_windows, unsigned short num_work_measure_windows) {
+    this->num_envs = num_envs;
+    this->num_servers = num_servers;
+    this->envs = new LoadBalanceEnv *[num_envs];
+    for (unsigned short i = 0; i < num_envs; i++) {
+        // Every environment gets its own log files, otherwise they would truncate each other
+        std::string filename_env = num_envs == 1 ? filename_log : filename_log + "_" + std::to_string(i);
+        this->envs[i] = new LoadBalanceEnv(seed_start, num_servers, time_window, load_in_obs, ext_in_obs,
+                                           filename_env, act_in_obs, trace_in_obs, timeouts, num_timeouts,
+                                           service_rates, len_rates, max_retries, jobGens[i], use_tw,
+                                           unsafety_upper_bound, safety_lower_bound, skip_log, event_queue,
+                                           num_windows, num_work_measure_windows);
+    }
+    this->obs_len = envs[0]->observation_len();
+    this->max_window_size = envs[0]->MAX_WINDOW_SIZE;
+    this->pool = new ThreadPool(num_threads > num_envs ? num_envs : num_threads);
+
+    this->observations = new double[num_envs * obs_len]();
+    this->rewards = new double[num_envs]();
+    this->dones = new bool[num_envs]();
+    this->server_times = new double[num_envs * num_servers]();
+    this->finished_job_durations = new double[num_envs * max_window_size]();
+    this->arrived_job_inter_times = new double[num_envs * max_window_size]();
+    this->arrived_job_proc_times = new double[num_envs * max_window_size]();
+    this->num_finished_jobs = new unsigned short[num_envs]();
+    this->num_arrived_jobs = new unsigned short[num_envs]();
+    this->avg_arrived_job_inter_times = new double[num_envs]();
+    this->avg_arrived_job_proc_times = new double[num_envs]();
+    this->times_elapsed = new double[num_envs]();
+    this->curr_times = new double[num_envs]();
+    this->unsafe = new bool[num_envs]();
+    this->queues = new unsigned short[num_envs * num_servers]();
+    this->work_measures = new double[num_envs]();
+}
+
+void LoadBalanceEnvBatch::seed(unsigned int seed_start) {
+    for (unsigned short i = 0; i < num_envs; i++)
+        envs[i]->seed(seed_start);
+}
+
+void LoadBalanceEnvBatch::reset() {
+    for (unsigned short i = 0; i < num_envs; i++)
+        envs[i]->reset(observations + i * obs_len);
+}
+
+void LoadBalanceEnvBatch::observe() {
+    for (unsigned short i = 0; i < num_envs; i++)
+        envs[i]->observe(observations + i * obs_len);
+}
+
+void LoadBalanceEnvBatch::step_env(unsigned short index, unsigned short action, unsigned short model_index) {
+    step_return ret = envs[index]->step(action, model_index, server_times + index * num_servers,
+                                        finished_job_durations + index * max_window_size,
+                                        arrived_job_inter_times + index * max_window_size,
+                                        arrived_job_proc_times + index * max_window_size,
+                                        observations + index * obs_len);
+    rewards[index] = ret.reward;
+    dones[index] = ret.done;
+    num_finished_jobs[index] = ret.num_finished_jobs;
+    num_arrived_jobs[index] = ret.num_arrived_jobs;
+    avg_arrived_job_inter_times[index] = ret.avg_arrived_job_inter_time;
+    avg_arrived_job_proc_times[index] = ret.avg_arrived_job_proc_time;
+    times_elapsed[index] = ret.time_elapsed;
+    curr_times[index] = ret.curr_time;
+    unsafe[index] = ret.unsafe;
+}
+
+void LoadBalanceEnvBatch::step(const unsigned short *actions, unsigned short model_index) {
+    pool->parallel_for(num_envs, [&](unsigned int i) { step_env(i, actions[i], model_index); });
+}
+
+void LoadBalanceEnvBatch::queue_sizes() {
+    for (unsigned short i = 0; i < num_envs; i++)
+        envs[i]->queue_sizes(queues + i * num_servers);
+}
+
+void LoadBalanceEnvBatch::get_work_measures() {
+    for (unsigned short i = 0; i < num_envs; i++)
+        work_measures[i] = envs[i]->get_work_measure();
+}
+
+void LoadBalanceEnvBatch::close() const {
+    for (unsigned short i = 0; i < num_envs; i++)
+        envs[i]->close();
+}
+
+LoadBalanceEnvBatch::~LoadBalanceEnvBatch() {
+    delete pool;
+    for (unsigned short i = 0; i < num_envs; i++)
+        delete envs[i];
+    delete[] envs;
+    delete[] observations;
+    delete[] rewards;
+    delete[] dones;
+    delete[] server_times;
+    delete[] finished_job_durations;
+    delete[] arrived_job_inter_times;
+    delete[] arrived_job_proc_times;
+    delete[] num_finished_jobs;
+    delete[] num_arrived_jobs;
+    delete[] avg_arrived_job_inter_times;
+    delete[] avg_arrived_job_proc_times;
+    delete[] times_elapsed;
+    delete[] curr_times;
+    delete[] unsafe;
+    delete[] queues;
+    delete[] work_measures;
+}
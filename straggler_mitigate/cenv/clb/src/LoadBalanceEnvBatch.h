@@ -0,0 +1,67 @@
+#ifndef CLB_LOADBALANCEENVBATCH_H
+#define CLB_LOADBALANCEENVBATCH_H
+
+#include <string>
+#include "LoadBalanceEnv.h"
+#include "JobGen.h"
+#include "ThreadPool.h"
+
+// Owns num_envs independent environments and steps them all in one call. All step outputs are written into
+// contiguous, env-major buffers that are allocated once and reused, so they can be exposed as NumPy views.
+// Environments share no mutable state (each has its own rng, timeline, servers, job generator and logger), so a step
+// runs them concurrently on a pool of num_threads threads.
+class LoadBalanceEnvBatch {
+public:
+    unsigned short num_envs;
+    unsigned short num_servers;
+    unsigned int obs_len;
+    int max_window_size;
+    LoadBalanceEnv **envs;
+    ThreadPool *pool;
+
+    double *observations;
+    double *rewards;
+    bool *dones;
+    double *server_times;
+    double *finished_job_durations;
+    double *arrived_job_inter_times;
+    double *arrived_job_proc_times;
+    unsigned short *num_finished_jobs;
+    unsigned short *num_arrived_jobs;
+    double *avg_arrived_job_inter_times;
+    double *avg_arrived_job_proc_times;
+    double *times_elapsed;
+    double *curr_times;
+    bool *unsafe;
+    unsigned short *queues;
+    double *work_measures;
+
+public:
+    LoadBalanceEnvBatch(unsigned short num_envs, unsigned int seed_start, unsigned short num_servers,
+                        double time_window, bool load_in_obs, bool ext_in_obs, const std::string &filename_log,
+                        bool act_in_obs, bool trace_in_obs, short *timeouts, unsigned short num_timeouts,
+                        const double *service_rates, unsigned short len_rates, int max_retries, JobGen **jobGens,
+                        bool use_tw, unsigned short unsafety_upper_bound, unsigned short safety_lower_bound,
+                        bool skip_log, unsigned int num_threads, EventQueueType event_queue = binary_heap,
+                        unsigned short num_windows = 4, unsigned short num_work_measure_windows = 20);
+
+    ~LoadBalanceEnvBatch();
+
+    void seed(unsigned int seed_start);
+
+    void reset();
+
+    void observe();
+
+    void step_env(unsigned short index, unsigned short action, unsigned short model_index);
+
+    void step(const unsigned short *actions, unsigned short model_index);
+
+    void queue_sizes();
+
+    void get_work_measures();
+
+    void close() const;
+};
+
+#endif
@@ -2,97 +2,188 @@
 // Created by Pouya Hamadanian on 5/19/21.
 //
 
+#include <algorithm>
+#include <cstdio>
+#include <functional>
+#include <memory>
 #include <queue>
+#include <utility>
 #include "LogSort.h"
 #include "stdexcept"
 
-LogSorter::LogSorter(const std::string& file_out, bool valid, unsigned int size_heap) {
-    this -> pq = new std::priority_queue<LogEntry*, std::vector<LogEntry*>, CompareLogEntry>;
+// Entries moved per read or write call
+static const size_t BLOCK_RECORDS = 1 << 16;
+
+RunReader::RunReader(const std::string& file_in, size_t block_records) {
+    this->in_handle = std::ifstream(file_in, std::ios::in | std::ios::binary);
+    if (!this->in_handle)
+        throw std::runtime_error("Could not read sorted run " + file_in);
+    this->block = std::vector<LogEntry>(block_records);
+    this->pos = 0;
+    this->block.resize(0);
+}
+
+bool RunReader::refill() {
+    block.resize(block.capacity());
+    in_handle.read(reinterpret_cast<char *>(block.data()), (long) (block.size() * sizeof(LogEntry)));
+    block.resize(in_handle.gcount() / sizeof(LogEntry));
+    pos = 0;
+    return !block.empty();
+}
+
+LogSorter::LogSorter(const std::string& file_out, bool valid, size_t run_records, unsigned int num_threads) {
+    this -> file_out = file_out;
     this -> valid = valid;
+    this -> run_records = run_records > 0 ? run_records : 1;
+    this -> num_threads = num_threads > 0 ? num_threads : 1;
     this -> active_handler = std::ofstream (file_out, std::ios::out | std::ios::binary);
-    this -> size_heap = size_heap;
+    if (!this -> active_handler)
+        throw std::runtime_error("Could not write sorted log " + file_out);
+    this -> out_buffer.reserve(BLOCK_RECORDS);
+    this -> last_id = -1;
+    this -> num_written = 0;
 }
 
 void LogSorter::add_file(const std::string& file_in){
     std::ifstream in_handle = std::ifstream (file_in, std::ios::in | std::ios::binary);
+    if (!in_handle)
+        throw std::runtime_error("No such file or directory: '" + file_in + "'");
 
-    std::streampos fsize = in_handle.tellg();
     in_handle.seekg(0, std::ios::end);
-    fsize = in_handle.tellg() - fsize;
-    if (fsize % 33 != 0)
-        throw std::length_error("File size not a multiple of 61");
-
+    std::streamoff fsize = in_handle.tellg();
+    if (fsize % sizeof(LogEntry) != 0)
+        throw std::length_error("File size not a multiple of 33");
     in_handle.seekg(0, std::ios_base::beg);
-    char* buffer = new char [size_entry];
-    while (in_handle.peek() != EOF){
-        in_handle.read(buffer, size_entry);
-        if (is_first(buffer) == valid){
-            LogEntry* newEntry = translateEntry(buffer);
-            pq -> push(newEntry);
-            while (pq -> size() >= size_heap)
-                pop_and_write();
+    // Grow the run only as far as this file can fill it, small logs shouldn't pay for a whole run up front
+    run.reserve(std::min(run_records, run.size() + (size_t) fsize / sizeof(LogEntry)));
+
+    std::vector<LogEntry> block(BLOCK_RECORDS);
+    while (in_handle) {
+        in_handle.read(reinterpret_cast<char *>(block.data()), (long) (block.size() * sizeof(LogEntry)));
+        size_t count = in_handle.gcount() / sizeof(LogEntry);
+        for (size_t i = 0; i < count; i++) {
+            if (block[i].first == valid) {
+                run.push_back(block[i]);
+                if (run.size() >= run_records)
+                    spill_run();
+            }
         }
     }
     in_handle.close();
-    delete[] buffer;
 }
 
-LogEntry* LogSorter::translateEntry(const char* buff){
-    return new LogEntry{
-            .id=*(unsigned int *)(buff),
-            .timeout_idx=*(unsigned char *)(buff+sizeof(unsigned int)),
-            .first=*(bool *)(buff+sizeof(unsigned int)+sizeof(unsigned char)),
-            .arrival=*(float *)(buff+sizeof(unsigned int)+sizeof(unsigned char)+sizeof(bool)),
-            .delay=*(float *)(buff+sizeof(unsigned int)+sizeof(unsigned char)+sizeof(bool)+sizeof(float)),
-            .num_instances=*(unsigned char *)(buff+sizeof(unsigned int)+sizeof(unsigned char)+sizeof(bool)+2*sizeof(float)),
-            .instance_index=*(unsigned char *)(buff+sizeof(unsigned int)+2*sizeof(unsigned char)+sizeof(bool)+2*sizeof(float)),
-            .queue_obs=*(unsigned char *)(buff+sizeof(unsigned int)+3*sizeof(unsigned char)+sizeof(bool)+2*sizeof(float)),
-            .queue_obs_first=*(unsigned char *)(buff+sizeof(unsigned int)+4*sizeof(unsigned char)+sizeof(bool)+2*sizeof(float)),
-            .size=*(float *)(buff+sizeof(unsigned int)+5*sizeof(unsigned char)+sizeof(bool)+2*sizeof(float)),
-            .model_index=*(unsigned char *)(buff+sizeof(unsigned int)+5*sizeof(unsigned char)+sizeof(bool)+3*sizeof(float)),
-            .tw=*(bool *)(buff+sizeof(unsigned int)+6*sizeof(unsigned char)+sizeof(bool)+3*sizeof(float)),
-            .trace_index=*(unsigned char *)(buff+sizeof(unsigned int)+6*sizeof(unsigned char)+2*sizeof(bool)+3*sizeof(float)),
-            .duration=*(float *)(buff+sizeof(unsigned int)+7*sizeof(unsigned char)+2*sizeof(bool)+3*sizeof(float)),
-            .first_duration=*(float *)(buff+sizeof(unsigned int)+7*sizeof(unsigned char)+2*sizeof(bool)+4*sizeof(float)),
-    };
+void LogSorter::sort_run(std::vector<LogEntry>& entries) {
+    std::sort(entries.begin(), entries.end(), [](const LogEntry& lhs, const LogEntry& rhs) {
+        return lhs.id < rhs.id;
+    });
+}
+
+void LogSorter::sort_and_write(std::vector<LogEntry> entries, const std::string& file_run, std::exception_ptr& error) {
+    // Runs on a sorter thread, where nothing may escape, so the failure is kept for the joining thread
+    try {
+        sort_run(entries);
+        std::ofstream run_handle(file_run, std::ios::out | std::ios::binary);
+        run_handle.write(reinterpret_cast<const char *>(entries.data()), (long) (entries.size() * sizeof(LogEntry)));
+        run_handle.close();
+        if (!run_handle)
+            throw std::runtime_error("Could not write sorted run " + file_run);
+    } catch (...) {
+        error = std::current_exception();
+    }
+}
+
+void LogSorter::spill_run() {
+    // Bounds memory to num_threads runs being sorted plus the one being filled
+    if (sorters.size() >= num_threads) {
+        sorters.front().join();
+        sorters.pop_front();
+        rethrow_run_error();
+    }
+    std::string file_run = file_out + ".run" + std::to_string(run_files.size());
+    run_files.push_back(file_run);
+    run_errors.emplace_back();
+    sorters.emplace_back(sort_and_write, std::move(run), file_run, std::ref(run_errors.back()));
+    run = std::vector<LogEntry>();
+}
+
+void LogSorter::join_sorters() {
+    while (!sorters.empty()) {
+        sorters.front().join();
+        sorters.pop_front();
+    }
 }
 
-bool LogSorter::is_first(const char* buff){
-    return *(bool *)(buff+sizeof(unsigned int)+sizeof(unsigned char));
+void LogSorter::rethrow_run_error() const {
+    for (const std::exception_ptr& error: run_errors)
+        if (error)
+            std::rethrow_exception(error);
 }
 
-void LogSorter::writeEntry(LogEntry* entry){
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> id)), sizeof(unsigned int));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> timeout_idx)), sizeof(unsigned char));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> first)), sizeof(bool));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> arrival)), sizeof(float));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> delay)), sizeof(float));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> num_instances)), sizeof(unsigned char));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> instance_index)), sizeof(unsigned char));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> queue_obs)), sizeof(unsigned char));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> queue_obs_first)), sizeof(unsigned char));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> size)), sizeof(float));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> model_index)), sizeof(unsigned char));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> tw)), sizeof(bool));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> trace_index)), sizeof(unsigned char));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> duration)), sizeof(float));
-    active_handler.write(reinterpret_cast<const char *>(&(entry -> first_duration)), sizeof(float));
+void LogSorter::write_entry(const LogEntry& entry) {
+    if ((long long) entry.id <= last_id)
+        throw std::runtime_error("ID diff at index " + std::to_string(num_written) + ": prev was " +
+                                 std::to_string(last_id) + ", new is " + std::to_string(entry.id));
+    last_id = entry.id;
+    num_written++;
+    out_buffer.push_back(entry);
+    if (out_buffer.size() >= BLOCK_RECORDS)
+        write_out();
 }
 
-void LogSorter::pop_and_write() {
-    LogEntry* ret_pop = pq -> top();
-    pq -> pop();
-    writeEntry(ret_pop);
-    delete ret_pop;
+void LogSorter::write_out() {
+    active_handler.write(reinterpret_cast<const char *>(out_buffer.data()),
+                         (long) (out_buffer.size() * sizeof(LogEntry)));
+    out_buffer.clear();
+}
+
+void LogSorter::merge_runs() {
+    std::vector<std::unique_ptr<RunReader>> readers;
+    // Smallest head ID first, ties go to the earlier run
+    std::priority_queue<std::pair<unsigned int, size_t>, std::vector<std::pair<unsigned int, size_t>>,
+                        std::greater<std::pair<unsigned int, size_t>>> heads;
+    size_t block_records = std::max<size_t>(BLOCK_RECORDS / run_files.size(), 1024);
+    for (size_t i = 0; i < run_files.size(); i++) {
+        readers.emplace_back(new RunReader(run_files[i], block_records));
+        if (readers[i]->refill())
+            heads.emplace(readers[i]->block[0].id, i);
+    }
+    while (!heads.empty()) {
+        size_t index = heads.top().second;
+        heads.pop();
+        RunReader* reader = readers[index].get();
+        write_entry(reader->block[reader->pos]);
+        reader->pos++;
+        if (reader->pos < reader->block.size() || reader->refill())
+            heads.emplace(reader->block[reader->pos].id, index);
+    }
 }
 
 void LogSorter::flush(){
-    while(!pq -> empty())
-        pop_and_write();
+    if (run_files.empty()) {
+        // Everything fit in one run, sorted in memory and written straight out
+        sort_run(run);
+        for (const LogEntry& entry: run)
+            write_entry(entry);
+    } else {
+        if (!run.empty())
+            spill_run();
+        join_sorters();
+        rethrow_run_error();
+        merge_runs();
+        for (const std::string& file_run: run_files)
+            std::remove(file_run.c_str());
+        run_files.clear();
+        run_errors.clear();
+    }
+    run.clear();
+    write_out();
+    active_handler.flush();
 }
 
 LogSorter::~LogSorter() {
-    delete pq;
+    join_sorters();
+    for (const std::string& file_run: run_files)
+        std::remove(file_run.c_str());
     active_handler.flush();
     active_handler.close();
 }
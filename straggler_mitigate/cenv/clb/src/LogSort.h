@@ -5,10 +5,15 @@
 #ifndef CLB_LOGSORT_H
 #define CLB_LOGSORT_H
 
+#include <deque>
+#include <exception>
 #include <fstream>
-#include "queue"
 #include <string>
+#include <thread>
+#include <vector>
 
+// One per-job log record, packed exactly as Logger writes it (33 bytes), so files are read and written in blocks
+#pragma pack(push, 1)
 struct LogEntry{
     unsigned int id;
     unsigned char timeout_idx;
@@ -26,30 +31,53 @@ struct LogEntry{
     float duration;
     float first_duration;
 };
+#pragma pack(pop)
 
-struct CompareLogEntry {
-    bool operator()(const LogEntry* lhs, const LogEntry* rhs) const{
-        return lhs -> id > rhs -> id;
-    }
+static_assert(sizeof(LogEntry) == 33, "Log entries are 33 bytes on disk");
+
+// Reads fixed-size blocks of a sorted run back from disk during the merge
+struct RunReader {
+    std::ifstream in_handle;
+    std::vector<LogEntry> block;
+    size_t pos;
+
+    RunReader(const std::string& file_in, size_t block_records);
+    bool refill();
 };
 
+// External merge sort of per-job logs by ID. Entries of the wanted kind (first instances if valid) are collected into
+// runs of run_records entries, every full run is sorted and written to a temporary file on its own thread (at most
+// num_threads at a time), and flush k-way merges the runs into file_out. IDs are checked to be strictly increasing
+// while they are written. Logs that fit in a single run never touch a temporary file. Failures of the sorter threads
+// are rethrown on the calling thread once they are joined, and the temporary files are removed by the destructor.
 class LogSorter {
 private:
-    std::priority_queue<LogEntry*, std::vector<LogEntry*>, CompareLogEntry>* pq;
-    std::ofstream active_handler;
-    unsigned int size_heap;
+    std::string file_out;
     bool valid;
-    const int size_entry = sizeof(unsigned int)+7*sizeof(unsigned char)+2*sizeof(bool)+5*sizeof(float);
+    size_t run_records;
+    unsigned int num_threads;
+    std::vector<LogEntry> run;
+    std::vector<std::string> run_files;
+    std::deque<std::thread> sorters;
+    // Set by the sorter thread of every run that failed, a deque so references stay valid while runs are added
+    std::deque<std::exception_ptr> run_errors;
 
+    std::ofstream active_handler;
+    std::vector<LogEntry> out_buffer;
+    long long last_id;
+    size_t num_written;
 
-    static LogEntry* translateEntry(const char* buff);
-    void writeEntry(LogEntry* entry);
-    void pop_and_write();
-    static bool is_first(const char *buff);
+    static void sort_run(std::vector<LogEntry>& entries);
+    static void sort_and_write(std::vector<LogEntry> entries, const std::string& file_run, std::exception_ptr& error);
+    void spill_run();
+    void join_sorters();
+    void rethrow_run_error() const;
+    void write_entry(const LogEntry& entry);
+    void write_out();
+    void merge_runs();
 
 public:
-
-    LogSorter(const std::string& file_out, bool valid, unsigned int size_heap);
+    LogSorter(const std::string& file_out, bool valid, size_t run_records, unsigned int num_threads);
     ~LogSorter();
     void add_file(const std::string& file_in);
     void flush();
@@ -0,0 +1,82 @@
+#include <limits>
+#include "ServerLoadTree.h"
+
+// Padding leaves and excluded servers lose against any real queue length
+static const unsigned int EXCLUDED_LEN = std::numeric_limits<unsigned int>::max();
+
+ServerLoadTree::ServerLoadTree(unsigned short num_servers) {
+    this->num_servers = num_servers;
+    this->num_leaves = 1;
+    while (num_leaves < num_servers)
+        num_leaves *= 2;
+    this->lens = new unsigned int[num_leaves];
+    this->winners = new unsigned int[2 * num_leaves];
+    reset();
+}
+
+ServerLoadTree::ServerLoadTree(ServerLoadTree *base_tree) {
+    this->num_servers = base_tree->num_servers;
+    this->num_leaves = base_tree->num_leaves;
+    this->lens = new unsigned int[num_leaves];
+    this->winners = new unsigned int[2 * num_leaves];
+    for (unsigned int i = 0; i < num_leaves; i++)
+        lens[i] = base_tree->lens[i];
+    for (unsigned int i = 0; i < 2 * num_leaves; i++)
+        winners[i] = base_tree->winners[i];
+}
+
+ServerLoadTree::~ServerLoadTree() {
+    delete[] lens;
+    delete[] winners;
+}
+
+bool ServerLoadTree::less(unsigned int lhs, unsigned int rhs) const {
+    return lens[lhs] < lens[rhs] or (lens[lhs] == lens[rhs] and lhs < rhs);
+}
+
+void ServerLoadTree::replay(unsigned int server) {
+    unsigned int node = (num_leaves + server) / 2;
+    while (node > 0) {
+        unsigned int left = winners[2 * node];
+        unsigned int right = winners[2 * node + 1];
+        winners[node] = less(left, right) ? left : right;
+        node /= 2;
+    }
+}
+
+void ServerLoadTree::update(unsigned short server, unsigned short len) {
+    lens[server] = len;
+    replay(server);
+}
+
+unsigned short ServerLoadTree::best() const {
+    return winners[1];
+}
+
+unsigned short ServerLoadTree::best_excluding(const unsigned short *excluded, unsigned short num_excluded) {
+    // Knock the excluded servers out temporarily, this costs O(k log n) for k excluded servers
+    unsigned int saved[num_excluded];
+    for (unsigned short i = 0; i < num_excluded; i++) {
+        saved[i] = lens[excluded[i]];
+        lens[excluded[i]] = EXCLUDED_LEN;
+        replay(excluded[i]);
+    }
+    unsigned short best_server = winners[1];
+    for (unsigned short i = num_excluded; i > 0; i--) {
+        lens[excluded[i - 1]] = saved[i - 1];
+        replay(excluded[i - 1]);
+    }
+    return best_server;
+}
+
+void ServerLoadTree::reset() {
+    for (unsigned int i = 0; i < num_leaves; i++) {
+        lens[i] = i < num_servers ? 0 : EXCLUDED_LEN;
+        winners[num_leaves + i] = i;
+    }
+    for (unsigned int node = num_leaves - 1; node > 0; node--) {
+        unsigned int left = winners[2 * node];
+        unsigned int right = winners[2 * node + 1];
+        winners[node] = less(left, right) ? left : right;
+    }
+}
@@ -0,0 +1,27 @@
+#ifndef CLB_SERVERLOADTREE_H
+#define CLB_SERVERLOADTREE_H
+
+// Tournament tree over server queue lengths. Every internal node keeps the winner (least loaded server, lowest index
+// on ties) of its subtree, so the least loaded server is found in O(1) and a queue length change costs O(log n).
+class ServerLoadTree {
+private:
+    unsigned short num_servers;
+    unsigned int num_leaves;
+    unsigned int *lens;
+    unsigned int *winners;
+
+    bool less(unsigned int lhs, unsigned int rhs) const;
+    void replay(unsigned int server);
+
+public:
+    explicit ServerLoadTree(unsigned short num_servers);
+    explicit ServerLoadTree(ServerLoadTree* base_tree);
+    ~ServerLoadTree();
+    void update(unsigned short server, unsigned short len);
+    unsigned short best() const;
+    unsigned short best_excluding(const unsigned short* excluded, unsigned short num_excluded);
+    void reset();
+};
+
+
+#endif
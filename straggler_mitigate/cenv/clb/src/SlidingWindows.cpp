@@ -0,0 +1,159 @@
+#include <limits>
+#include "SlidingWindows.h"
+
+MinQueue::MinQueue(unsigned short capacity) {
+    this->capacity = capacity;
+    this->window_nums = new unsigned long long[capacity];
+    this->values = new double[capacity];
+    reset();
+}
+
+MinQueue::MinQueue(MinQueue *base_queue) {
+    this->capacity = base_queue->capacity;
+    this->window_nums = new unsigned long long[capacity];
+    this->values = new double[capacity];
+    for (unsigned short i = 0; i < capacity; i++) {
+        window_nums[i] = base_queue->window_nums[i];
+        values[i] = base_queue->values[i];
+    }
+    this->head = base_queue->head;
+    this->len = base_queue->len;
+}
+
+MinQueue::~MinQueue() {
+    delete[] window_nums;
+    delete[] values;
+}
+
+void MinQueue::push(unsigned long long window_num, double value) {
+    // Values at the back that are not smaller than the new one can never be the minimum again
+    while (len > 0 and values[(head + len - 1) % capacity] >= value)
+        len--;
+    unsigned short tail = (head + len) % capacity;
+    window_nums[tail] = window_num;
+    values[tail] = value;
+    len++;
+}
+
+void MinQueue::expire(unsigned long long first_window_num) {
+    while (len > 0 and window_nums[head] < first_window_num) {
+        head = (head + 1) % capacity;
+        len--;
+    }
+}
+
+bool MinQueue::empty() const {
+    return len == 0;
+}
+
+double MinQueue::front() const {
+    return values[head];
+}
+
+void MinQueue::reset() {
+    head = 0;
+    len = 0;
+}
+
+SlidingWindows::SlidingWindows(unsigned short num_windows) {
+    this->num_windows = num_windows;
+    this->iat_sums = new double[num_windows];
+    this->proc_sums = new double[num_windows];
+    this->counts = new int[num_windows];
+    this->iat_avg_min = new MinQueue(num_windows);
+    this->proc_avg_max_negated = new MinQueue(num_windows);
+    reset();
+}
+
+SlidingWindows::SlidingWindows(SlidingWindows *base_windows) {
+    this->num_windows = base_windows->num_windows;
+    this->num_pushed = base_windows->num_pushed;
+    this->iat_sums = new double[num_windows];
+    this->proc_sums = new double[num_windows];
+    this->counts = new int[num_windows];
+    for (unsigned short i = 0; i < num_windows; i++) {
+        iat_sums[i] = base_windows->iat_sums[i];
+        proc_sums[i] = base_windows->proc_sums[i];
+        counts[i] = base_windows->counts[i];
+    }
+    this->iat_total = base_windows->iat_total;
+    this->proc_total = base_windows->proc_total;
+    this->count_total = base_windows->count_total;
+    this->iat_avg_min = new MinQueue(base_windows->iat_avg_min);
+    this->proc_avg_max_negated = new MinQueue(base_windows->proc_avg_max_negated);
+}
+
+SlidingWindows::~SlidingWindows() {
+    delete[] iat_sums;
+    delete[] proc_sums;
+    delete[] counts;
+    delete iat_avg_min;
+    delete proc_avg_max_negated;
+}
+
+void SlidingWindows::push(double iat_sum, double proc_sum, int count) {
+    unsigned short index = num_pushed % num_windows;
+    iat_total += iat_sum - iat_sums[index];
+    proc_total += proc_sum - proc_sums[index];
+    count_total += count - counts[index];
+    iat_sums[index] = iat_sum;
+    proc_sums[index] = proc_sum;
+    counts[index] = count;
+
+    if (num_pushed + 1 >= num_windows) {
+        iat_avg_min->expire(num_pushed + 1 - num_windows);
+        proc_avg_max_negated->expire(num_pushed + 1 - num_windows);
+    }
+    if (count > 0) {
+        iat_avg_min->push(num_pushed, iat_sum / (count + 1e-8));
+        proc_avg_max_negated->push(num_pushed, -(proc_sum / (count + 1e-8)));
+    }
+    num_pushed++;
+
+    if (num_pushed % num_windows == 0) {
+        iat_total = 0;
+        proc_total = 0;
+        for (unsigned short i = 0; i < num_windows; i++) {
+            iat_total += iat_sums[i];
+            proc_total += proc_sums[i];
+        }
+    }
+}
+
+double SlidingWindows::iat_sum() const {
+    return iat_total;
+}
+
+double SlidingWindows::proc_sum() const {
+    return proc_total;
+}
+
+int SlidingWindows::count() const {
+    return count_total;
+}
+
+double SlidingWindows::min_iat_avg() const {
+    if (iat_avg_min->empty())
+        return std::numeric_limits<double>::infinity();
+    return iat_avg_min->front();
+}
+
+double SlidingWindows::max_proc_avg() const {
+    if (proc_avg_max_negated->empty())
+        return -std::numeric_limits<double>::infinity();
+    return -proc_avg_max_negated->front();
+}
+
+void SlidingWindows::reset() {
+    num_pushed = 0;
+    for (unsigned short i = 0; i < num_windows; i++) {
+        iat_sums[i] = 0;
+        proc_sums[i] = 0;
+        counts[i] = 0;
+    }
+    iat_total = 0;
+    proc_total = 0;
+    count_total = 0;
+    iat_avg_min->reset();
+    proc_avg_max_negated->reset();
+}
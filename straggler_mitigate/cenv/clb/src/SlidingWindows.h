@@ -0,0 +1,56 @@
+#ifndef CLB_SLIDINGWINDOWS_H
+#define CLB_SLIDINGWINDOWS_H
+
+// Minimum of the values pushed for the last capacity window numbers. Only values that can still become the minimum are
+// kept, in increasing order, so push, expire and front are amortized O(1).
+class MinQueue {
+private:
+    unsigned short capacity;
+    unsigned long long *window_nums;
+    double *values;
+    unsigned short head;
+    unsigned short len;
+
+public:
+    explicit MinQueue(unsigned short capacity);
+    explicit MinQueue(MinQueue* base_queue);
+    ~MinQueue();
+    void push(unsigned long long window_num, double value);
+    void expire(unsigned long long first_window_num);
+    bool empty() const;
+    double front() const;
+    void reset();
+};
+
+// Job statistics of the last num_windows time windows. Totals are running sums and the extremes of the per window
+// averages come from monotonic queues, so adding a window and reading any statistic cost O(1) regardless of
+// num_windows. The running sums are recomputed from the windows once every num_windows windows to bound rounding drift.
+class SlidingWindows {
+private:
+    unsigned short num_windows;
+    unsigned long long num_pushed;
+    double *iat_sums;
+    double *proc_sums;
+    int *counts;
+    double iat_total;
+    double proc_total;
+    int count_total;
+    // Windows without jobs do not take part in the extremes
+    MinQueue *iat_avg_min;
+    MinQueue *proc_avg_max_negated;
+
+public:
+    explicit SlidingWindows(unsigned short num_windows);
+    explicit SlidingWindows(SlidingWindows* base_windows);
+    ~SlidingWindows();
+    void push(double iat_sum, double proc_sum, int count);
+    double iat_sum() const;
+    double proc_sum() const;
+    int count() const;
+    double min_iat_avg() const;
+    double max_proc_avg() const;
+    void reset();
+};
+
+
+#endif
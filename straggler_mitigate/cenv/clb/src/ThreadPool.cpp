@@ -0,0 +1,75 @@
+#include "ThreadPool.h"
+
+ThreadPool::ThreadPool(unsigned int num_threads) {
+    this->task = nullptr;
+    this->num_tasks = 0;
+    this->next_task = 0;
+    this->active_workers = 0;
+    this->generation = 0;
+    this->stop = false;
+    for (unsigned int i = 1; i < num_threads; i++)
+        workers.emplace_back(&ThreadPool::worker_loop, this);
+}
+
+unsigned int ThreadPool::size() const {
+    return workers.size() + 1;
+}
+
+void ThreadPool::run_tasks() {
+    unsigned int index;
+    while ((index = next_task.fetch_add(1)) < num_tasks)
+        (*task)(index);
+}
+
+void ThreadPool::worker_loop() {
+    unsigned long seen_generation = 0;
+    while (true) {
+        std::unique_lock<std::mutex> lock(mutex);
+        cv_task.wait(lock, [&] { return stop or generation != seen_generation; });
+        if (stop)
+            return;
+        seen_generation = generation;
+        active_workers += 1;
+        lock.unlock();
+
+        run_tasks();
+
+        lock.lock();
+        active_workers -= 1;
+        lock.unlock();
+        cv_done.notify_all();
+    }
+}
+
+void ThreadPool::parallel_for(unsigned int n, const std::function<void(unsigned int)>& fn) {
+    if (workers.empty() or n <= 1) {
+        for (unsigned int i = 0; i < n; i++)
+            fn(i);
+        return;
+    }
+    std::unique_lock<std::mutex> lock(mutex);
+    // Workers that woke up late for the previous loop must leave before its state is overwritten
+    cv_done.wait(lock, [this] { return active_workers == 0; });
+    task = &fn;
+    num_tasks = n;
+    next_task = 0;
+    generation += 1;
+    lock.unlock();
+    cv_task.notify_all();
+
+    run_tasks();
+
+    // Once every index is handed out, the loop is over as soon as no worker is still busy with one
+    lock.lock();
+    cv_done.wait(lock, [this] { return active_workers == 0; });
+}
+
+ThreadPool::~ThreadPool() {
+    {
+        std::lock_guard<std::mutex> lock(mutex);
+        stop = true;
+    }
+    cv_task.notify_all();
+    for (auto& worker: workers)
+        worker.join();
+}
@@ -0,0 +1,37 @@
+#ifndef CLB_THREADPOOL_H
+#define CLB_THREADPOOL_H
+
+#include <atomic>
+#include <condition_variable>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+// Fixed-size pool that runs an indexed loop body concurrently. The calling thread takes part in the work, so a pool
+// of num_threads spawns num_threads - 1 workers, and a pool of one thread runs everything serially.
+class ThreadPool {
+private:
+    std::vector<std::thread> workers;
+    std::mutex mutex;
+    std::condition_variable cv_task;
+    std::condition_variable cv_done;
+    const std::function<void(unsigned int)>* task;
+    unsigned int num_tasks;
+    std::atomic<unsigned int> next_task;
+    unsigned int active_workers;
+    unsigned long generation;
+    bool stop;
+
+    void worker_loop();
+    void run_tasks();
+
+public:
+    explicit ThreadPool(unsigned int num_threads);
+    ~ThreadPool();
+
+    unsigned int size() const;
+    void parallel_for(unsigned int n, const std::function<void(unsigned int)>& fn);
+};
+
+#endif
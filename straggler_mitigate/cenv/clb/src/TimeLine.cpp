@@ -4,40 +4,110 @@
 
 #include <queue>
 #include "TimeLine.h"
+#include "JobPool.h"
 #include "unordered_map"
 #include "iostream"
 #include <cassert>
 
-TimeLine::TimeLine() {
+std::vector<JobEvent*>& Container(std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent>* q) {
+    struct HackedQueue : private std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent> {
+        static std::vector<JobEvent*>& Container(std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent>* q) {
+            return q->*&HackedQueue::c;
+        }
+    };
+    return HackedQueue::Container(q);
+}
+
+TimeLine::TimeLine(EventQueueType queue_type) {
+    this -> queue_type = queue_type;
     this -> pq = new std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent>;
 }
 
+bool TimeLine::before(const EventEntry& lhs, const EventEntry& rhs) {
+    // Same order as CompareJobEvent: earliest time first, finish events before schedule events on ties
+    return lhs.time_key < rhs.time_key or (lhs.time_key == rhs.time_key and
+                                           lhs.jobEvent->eventType == finish and rhs.jobEvent->eventType == schedule);
+}
+
+void TimeLine::sift_up(unsigned int index, EventEntry entry) {
+    while (index > 0) {
+        unsigned int parent = (index - 1) / HEAP_ARITY;
+        if (!before(entry, heap[parent]))
+            break;
+        heap[index] = heap[parent];
+        index = parent;
+    }
+    heap[index] = entry;
+}
+
+void TimeLine::sift_down(unsigned int index, EventEntry entry) {
+    unsigned int size = heap.size();
+    while (true) {
+        unsigned int first_child = HEAP_ARITY * index + 1;
+        if (first_child >= size)
+            break;
+        unsigned int last_child = first_child + HEAP_ARITY < size ? first_child + HEAP_ARITY : size;
+        unsigned int best = first_child;
+        for (unsigned int child = first_child + 1; child < last_child; child++)
+            if (before(heap[child], heap[best]))
+                best = child;
+        if (!before(heap[best], entry))
+            break;
+        heap[index] = heap[best];
+        index = best;
+    }
+    heap[index] = entry;
+}
+
 void TimeLine::push(JobEvent* jobEvent) {
-    pq -> push(jobEvent);
+    if (queue_type == binary_heap) {
+        pq -> push(jobEvent);
+        return;
+    }
+    heap.emplace_back();
+    sift_up(heap.size() - 1, EventEntry{.time_key=jobEvent->time_key, .jobEvent=jobEvent});
 }
 
 JobEvent* TimeLine::pop() {
-    JobEvent* ret_pop = pq -> top();
-    pq -> pop();
+    if (queue_type == binary_heap) {
+        JobEvent* ret_pop = pq -> top();
+        pq -> pop();
+        return ret_pop;
+    }
+    JobEvent* ret_pop = heap[0].jobEvent;
+    EventEntry last = heap.back();
+    heap.pop_back();
+    if (!heap.empty())
+        sift_down(0, last);
     return ret_pop;
 }
 
 JobEvent* TimeLine::seek() {
-    return pq -> top();
+    if (queue_type == binary_heap)
+        return pq -> top();
+    return heap[0].jobEvent;
 }
 
 void TimeLine::reset() {
-    while(!pq -> empty()){
-        JobEvent* ret_pop = pq -> top();
-        pq -> pop();
-        ret_pop->job->free();
-        delete ret_pop -> job;
-        delete ret_pop;
-    }
+    // Events and jobs are owned by the environment's JobPool, which is reset alongside the timeline
+    Container(pq).clear();
+    heap.clear();
 }
 
 unsigned int TimeLine::len() {
-    return pq->size();
+    if (queue_type == binary_heap)
+        return pq->size();
+    return heap.size();
+}
+
+std::vector<JobEvent*> TimeLine::list_events() {
+    if (queue_type == binary_heap)
+        return Container(pq);
+    std::vector<JobEvent*> events;
+    events.reserve(heap.size());
+    for (auto& entry: heap)
+        events.push_back(entry.jobEvent);
+    return events;
 }
 
 TimeLine::~TimeLine() {
@@ -45,23 +115,15 @@ TimeLine::~TimeLine() {
     delete pq;
 }
 
-std::vector<JobEvent*>& Container(std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent>* q) {
-    struct HackedQueue : private std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent> {
-        static std::vector<JobEvent*>& Container(std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent>* q) {
-            return q->*&HackedQueue::c;
-        }
-    };
-    return HackedQueue::Container(q);
-}
-
 struct JobRep {
     int reps_left;
     Job* prev_inst;
 };
 
-TimeLine::TimeLine(TimeLine *line_base, unsigned short num_servers, bool filter_first_schedule) {
+TimeLine::TimeLine(TimeLine *line_base, JobPool *jobPool, bool filter_first_schedule) {
+    this -> queue_type = line_base->queue_type;
     this -> pq = new std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent>;
-    std::vector<JobEvent*> &jobs = Container(line_base->pq);
+    std::vector<JobEvent*> jobs = line_base->list_events();
     std::unordered_map<unsigned int, JobRep*> instance_rep_map;
     bool saw_first_schedule = false;
     for(auto job_iter: jobs){
@@ -72,10 +134,8 @@ TimeLine::TimeLine(TimeLine *line_base, unsigned short num_servers, bool filter_
             continue;
         }
         if (instance_rep_map.find(job_iter->job->id) == instance_rep_map.end()){    // Job was not previously added to timeline
-            new_job_event = new JobEvent{
-                .eventType=job_iter->eventType,
-                .time_key=job_iter->time_key,
-                .job=new Job(job_iter->job, nullptr, num_servers)};
+            new_job_event = jobPool->new_event(job_iter->eventType, job_iter->time_key,
+                                               jobPool->copy_job(job_iter->job, nullptr));
             if (*(job_iter->job->active_instances) > 1){
                 instance_rep_map[job_iter->job->id] = new JobRep{
                     .reps_left=*(job_iter->job->active_instances)-1,
@@ -83,17 +143,16 @@ TimeLine::TimeLine(TimeLine *line_base, unsigned short num_servers, bool filter_
                 };
             }
         } else {                                                                    // Job was previously added to timeline and is available at the hash map
-            new_job_event = new JobEvent{
-                    .eventType=job_iter->eventType,
-                    .time_key=job_iter->time_key,
-                    .job=new Job(job_iter->job, instance_rep_map[job_iter->job->id]->prev_inst, num_servers)};
+            new_job_event = jobPool->new_event(job_iter->eventType, job_iter->time_key,
+                                               jobPool->copy_job(job_iter->job,
+                                                                 instance_rep_map[job_iter->job->id]->prev_inst));
             instance_rep_map[job_iter->job->id]->reps_left -= 1;
             if (instance_rep_map[job_iter->job->id]->reps_left == 0) {
                 delete instance_rep_map[job_iter->job->id];
                 instance_rep_map.erase(job_iter->job->id);
             }
         }
-        this-> pq-> push(new_job_event);
+        this-> push(new_job_event);
     }
     if (!instance_rep_map.empty()){
         std::cout << "Fatal flaw while copying timeline: Repetition Hash Map did not empty" << std::endl;
@@ -102,7 +161,7 @@ TimeLine::TimeLine(TimeLine *line_base, unsigned short num_servers, bool filter_
 }
 
 double TimeLine::get_schedule_inter_time() {
-    std::vector<JobEvent*> &jobs = Container(pq);
+    std::vector<JobEvent*> jobs = list_events();
     bool saw_first_schedule = false;
     double inter_time_schedule = -1;
     for(auto job_iter: jobs){
@@ -24,14 +24,35 @@ struct CompareJobEvent {
     }
 };
 
+// Backend of the event queue, binary_heap is the original std::priority_queue over event pointers
+enum EventQueueType{
+    binary_heap, dary_heap
+};
+
+// Event queue entries of the d-ary heap keep the time key inline, so comparisons only dereference the event on ties
+struct EventEntry{
+    double time_key;
+    JobEvent* jobEvent;
+};
+
+class JobPool;
+
 class TimeLine {
 private:
+    static const unsigned int HEAP_ARITY = 4;
+    EventQueueType queue_type;
     std::priority_queue<JobEvent*, std::vector<JobEvent*>, CompareJobEvent>* pq;
+    std::vector<EventEntry> heap;
+
+    static bool before(const EventEntry& lhs, const EventEntry& rhs);
+    void sift_up(unsigned int index, EventEntry entry);
+    void sift_down(unsigned int index, EventEntry entry);
+    std::vector<JobEvent*> list_events();
 
 public:
 
-    TimeLine();
-    TimeLine(TimeLine* line_base, unsigned short num_servers, bool filter_first_schedule);
+    explicit TimeLine(EventQueueType queue_type = binary_heap);
+    TimeLine(TimeLine* line_base, JobPool* jobPool, bool filter_first_schedule);
     ~TimeLine();
     void push(JobEvent* jobEvent);
     JobEvent* pop();
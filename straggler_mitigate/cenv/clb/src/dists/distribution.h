@@ -38,6 +38,12 @@ public:
     // generating functions
     double generate_bounded(std::mt19937* _g, double bound_low, double bound_high);
     virtual distribution* copy() = 0;
+
+    // Saves and restores any state kept between samples
+    virtual void save_state() {};
+    virtual void load_state() {};
+    // Takes over the state kept between samples from a copy of this distribution
+    virtual void copy_state(const distribution* dist) {};
 };
 
 #endif
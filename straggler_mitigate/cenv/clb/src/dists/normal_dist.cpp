@@ -57,3 +57,22 @@ double normal_dist::average() {
 normal_dist *normal_dist::copy() {
     return new normal_dist(*this);
 }
+
+void normal_dist::save_state() {
+    prev_saved = prev;
+    prev_z_saved = prev_z;
+}
+
+void normal_dist::load_state() {
+    prev = prev_saved;
+    prev_z = prev_z_saved;
+}
+
+void normal_dist::copy_state(const distribution *dist) {
+    auto *normal = dynamic_cast<const normal_dist *>(dist);
+    assert(normal != nullptr);
+    prev = normal->prev;
+    prev_z = normal->prev_z;
+    prev_saved = normal->prev_saved;
+    prev_z_saved = normal->prev_z_saved;
+}
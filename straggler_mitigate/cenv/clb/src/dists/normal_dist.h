@@ -16,10 +16,13 @@ private:
     const double _sigma_;
     double prev_z{};
     bool prev;
+    double prev_z_saved{};
+    bool prev_saved;
 
 public:
     // constructors and reset functions
-    explicit normal_dist(const double mu, const double sigma) : _mu_(mu), _sigma_(sigma), prev(false) {}
+    explicit normal_dist(const double mu, const double sigma) : _mu_(mu), _sigma_(sigma), prev(false),
+                                                          prev_saved(false) {}
 
     // generating functions
     double generate(std::mt19937* _g) override;
@@ -28,6 +31,9 @@ public:
     double average() override;
     double average(double bound_low, double bound_high) override;
     normal_dist* copy() override;
+    void save_state() override;
+    void load_state() override;
+    void copy_state(const distribution* dist) override;
 };
 
 #endif
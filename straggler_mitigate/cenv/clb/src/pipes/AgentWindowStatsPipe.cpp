@@ -5,6 +5,7 @@
 #include "iostream"
 #include "AgentWindowStatsPipe.h"
 #include <numeric>
+#include <cstddef>
 #include <cmath>
 
 float entropy(std::vector<unsigned int> hist){
@@ -18,6 +19,19 @@ float entropy(std::vector<unsigned int> hist){
     return ent;
 }
 
+std::vector<Column> agent_window_stat_columns(unsigned int action_count){
+    std::vector<Column> columns;
+    append_stat_columns(columns, "time_act", offsetof(AgentWindowStat, arrival));
+    append_stat_columns(columns, "action", offsetof(AgentWindowStat, action));
+    columns.push_back(Column{"histogram", offsetof(AgentWindowStat, histogram), "<u4", sizeof(unsigned int),
+                             action_count});
+    columns.push_back(Column{"entropy", offsetof(AgentWindowStat, entropy), "<f4", sizeof(float), 1});
+    columns.push_back(Column{"time_act_len", offsetof(AgentWindowStat, interval_duration), "<f4", sizeof(float), 1});
+    columns.push_back(Column{"act_len", offsetof(AgentWindowStat, len), "<u8", sizeof(size_t), 1});
+    columns.push_back(Column{"act_trace", offsetof(AgentWindowStat, trace), "|u1", sizeof(unsigned char), 1});
+    return columns;
+}
+
 AgentWindowStatsPipe::AgentWindowStatsPipe(int action_count){
     if (action_count > 10){
         std::cout << "Action count is more than 10, exiting..." << std::endl;
@@ -29,4 +29,7 @@ public:
     void extend(std::vector<void*>& arr_entry) override;
 };
 
+// Column layout of AgentWindowStat records for action_count actions, names match utils.logger.get_extracted_names
+std::vector<Column> agent_window_stat_columns(unsigned int action_count);
+
 #endif //CLB_AGENTWINDOWSTATSPIPE_H
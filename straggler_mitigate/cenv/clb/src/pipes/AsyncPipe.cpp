@@ -0,0 +1,118 @@
+#include "AsyncPipe.h"
+
+AsyncPipe::AsyncPipe(size_t capacity) {
+    size_t rounded = 2;
+    while (rounded < capacity)
+        rounded <<= 1;
+    this->ring = std::vector<LogEntry>(rounded);
+    this->mask = rounded - 1;
+    this->tail = 0;
+    this->head = 0;
+    this->flush_requested = 0;
+    this->flush_done = 0;
+    this->stop = false;
+    this->writer_idle = false;
+    this->writer = std::thread(&AsyncPipe::writer_loop, this);
+}
+
+void AsyncPipe::push(const LogEntry& entry) {
+    size_t t = tail.load(std::memory_order_relaxed);
+    // Back-pressure, wait for the writer to free a slot instead of dropping entries or growing without bound
+    while (t - head.load(std::memory_order_acquire) > mask) {
+        cv_writer.notify_one();
+        std::this_thread::yield();
+    }
+    ring[t & mask] = entry;
+    // Sequentially consistent with the writer's idle flag: either the writer sees this entry before it sleeps, or the
+    // producer sees it idle and wakes it. Clearing the flag here makes that one wake-up per sleep, not one per entry.
+    tail.store(t + 1);
+    if (writer_idle.exchange(false)) {
+        std::lock_guard<std::mutex> lock(mutex);
+        cv_writer.notify_one();
+    }
+}
+
+size_t AsyncPipe::drain() {
+    size_t h = head.load(std::memory_order_relaxed);
+    size_t t = tail.load(std::memory_order_acquire);
+    size_t count = t - h;
+    for (; h != t; h++) {
+        auto* logEntry = new LogEntry(ring[h & mask]);
+        head.store(h + 1, std::memory_order_release);
+        // The drain holds a tap of its own while the chain sees the entry, so it is freed by whoever lets go last and
+        // entries no pipe kept (e.g. filtered out by the sorter) are freed here
+        logEntry->taps = 1;
+        for (Pipe* pipe: next_pipes)
+            pipe->enqueue((void*)logEntry);
+        if (logEntry->taps == 1)
+            delete logEntry;
+        else
+            logEntry->taps -= 1;
+    }
+    return count;
+}
+
+void AsyncPipe::writer_loop() {
+    while (true) {
+        // Read before draining, so every entry pushed before a flush or stop request is drained first
+        unsigned long requested = flush_requested.load(std::memory_order_acquire);
+        bool stopping = stop.load(std::memory_order_acquire);
+        size_t count = drain();
+        if (requested != flush_done.load(std::memory_order_relaxed)) {
+            for (Pipe* pipe: next_pipes)
+                pipe->flush();
+            {
+                std::lock_guard<std::mutex> lock(mutex);
+                flush_done.store(requested, std::memory_order_release);
+            }
+            cv_flushed.notify_all();
+        }
+        if (stopping)
+            break;
+        if (count == 0) {
+            // Entries come in bursts, so yield a few rounds before paying for a sleep and a wake-up
+            for (int i = 0; i < idle_spins && tail.load(std::memory_order_acquire) == head.load(std::memory_order_relaxed);
+                 i++)
+                std::this_thread::yield();
+            if (tail.load(std::memory_order_acquire) != head.load(std::memory_order_relaxed))
+                continue;
+            std::unique_lock<std::mutex> lock(mutex);
+            writer_idle.store(true);
+            cv_writer.wait(lock, [this] {
+                return stop.load() || flush_requested.load() != flush_done.load() || tail.load() != head.load();
+            });
+            writer_idle.store(false);
+        }
+    }
+}
+
+void AsyncPipe::enqueue(void* entry) {
+    push(*(LogEntry*) entry);
+}
+
+void AsyncPipe::enqueueJob(Job* job) {
+    push(makeEntry(job));
+}
+
+void AsyncPipe::flush() {
+    unsigned long ticket;
+    {
+        std::lock_guard<std::mutex> lock(mutex);
+        ticket = flush_requested.fetch_add(1, std::memory_order_release) + 1;
+    }
+    cv_writer.notify_one();
+    std::unique_lock<std::mutex> lock(mutex);
+    cv_flushed.wait(lock, [this, ticket] { return flush_done.load(std::memory_order_acquire) >= ticket; });
+}
+
+AsyncPipe::~AsyncPipe() {
+    {
+        std::lock_guard<std::mutex> lock(mutex);
+        stop = true;
+    }
+    cv_writer.notify_one();
+    writer.join();
+    // The writer is gone, the chain is deleted from here and flushes whatever it still buffers on the way out
+    for (Pipe* pipe: next_pipes)
+        delete pipe;
+}
@@ -0,0 +1,52 @@
+#ifndef CLB_ASYNCPIPE_H
+#define CLB_ASYNCPIPE_H
+
+#include "pipe.h"
+#include <atomic>
+#include <condition_variable>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+// Moves the logging chain behind it onto a dedicated writer thread. Log entries are copied into a bounded single
+// producer single consumer ring, the producer (the env stepping) only touches the ring and a few atomics, and blocks
+// only when the writer has fallen capacity entries behind. An idle writer sleeps until the producer wakes it. The pipes
+// appended to this one are owned by it and are only ever called from the writer thread.
+class AsyncPipe: public Pipe {
+private:
+    std::vector<LogEntry> ring;
+    size_t mask;
+    // Written by the producer only
+    std::atomic<size_t> tail;
+    // Written by the writer only
+    std::atomic<size_t> head;
+
+    std::atomic<unsigned long> flush_requested;
+    std::atomic<unsigned long> flush_done;
+    std::atomic<bool> stop;
+    // Set by the writer while it waits for entries, the producer only takes the lock to wake it when this is set
+    std::atomic<bool> writer_idle;
+    // Yields the writer makes on an empty ring before it goes to sleep
+    static constexpr int idle_spins = 64;
+    std::mutex mutex;
+    std::condition_variable cv_writer;
+    std::condition_variable cv_flushed;
+    std::thread writer;
+
+    void push(const LogEntry& entry);
+    size_t drain();
+    void writer_loop();
+
+public:
+    // capacity is rounded up to a power of two
+    explicit AsyncPipe(size_t capacity);
+    ~AsyncPipe() override;
+
+    // Blocks until everything enqueued before the call went through the chain and the chain was flushed
+    void flush() override;
+    // The entry is copied, the caller keeps ownership
+    void enqueue(void* entry) override;
+    void enqueueJob(Job* job) override;
+};
+
+#endif //CLB_ASYNCPIPE_H
@@ -0,0 +1,79 @@
+#include "ColumnFilePipe.h"
+#include <iostream>
+#include <sys/stat.h>
+
+// Fixed .npy header size, big enough for any row count so the header can be rewritten in place
+static const size_t NPY_HEADER_LEN = 128;
+
+ColumnFilePipe::ColumnFilePipe(const std::string& folder, const std::vector<Column>& columns,
+                               unsigned long chunk_rows) {
+    this->columns = columns;
+    this->rows = 0;
+    this->rows_buffered = 0;
+    this->chunk_rows = chunk_rows;
+    mkdir(folder.c_str(), 0755);
+    this->handlers = std::vector<std::ofstream>(columns.size());
+    this->buffers = std::vector<std::vector<char>>(columns.size());
+    for (unsigned int i = 0; i < columns.size(); i++) {
+        handlers[i].open(folder + "/" + columns[i].name + ".npy", std::ios::out | std::ios::binary);
+        if (!handlers[i]) {
+            std::cout << "Could not open column " << columns[i].name << " in " << folder << ", exiting..."
+                      << std::endl;
+            exit(1);
+        }
+        buffers[i].reserve(chunk_rows * columns[i].item_size * columns[i].count);
+        write_header(i);
+    }
+}
+
+void ColumnFilePipe::write_header(unsigned int index) {
+    const Column& column = columns[index];
+    std::string shape = column.count > 1 ? "(" + std::to_string(rows) + ", " + std::to_string(column.count) + ")" :
+                        "(" + std::to_string(rows) + ",)";
+    std::string dict = "{'descr': '" + column.descr + "', 'fortran_order': False, 'shape': " + shape + ", }";
+    // Magic, version 1.0, little endian header length, then the dict padded with spaces and ended by a newline
+    std::string header("\x93NUMPY\x01\x00", 8);
+    header.push_back((char) ((NPY_HEADER_LEN - 10) & 0xff));
+    header.push_back((char) ((NPY_HEADER_LEN - 10) >> 8));
+    header += dict;
+    header.append(NPY_HEADER_LEN - 1 - header.size(), ' ');
+    header.push_back('\n');
+    std::streampos end = handlers[index].tellp();
+    handlers[index].seekp(0);
+    handlers[index].write(header.data(), (long) header.size());
+    if (end > (std::streampos) NPY_HEADER_LEN)
+        handlers[index].seekp(end);
+}
+
+void ColumnFilePipe::write_chunk() {
+    for (unsigned int i = 0; i < columns.size(); i++) {
+        handlers[i].write(buffers[i].data(), (long) buffers[i].size());
+        buffers[i].clear();
+    }
+    rows += rows_buffered;
+    rows_buffered = 0;
+}
+
+void ColumnFilePipe::enqueue(void* entry) {
+    auto* record = (const char*) entry;
+    for (unsigned int i = 0; i < columns.size(); i++) {
+        const char* value = record + columns[i].offset;
+        buffers[i].insert(buffers[i].end(), value, value + columns[i].item_size * columns[i].count);
+    }
+    if (++rows_buffered >= chunk_rows)
+        write_chunk();
+}
+
+void ColumnFilePipe::flush() {
+    write_chunk();
+    for (unsigned int i = 0; i < columns.size(); i++) {
+        write_header(i);
+        handlers[i].flush();
+    }
+}
+
+ColumnFilePipe::~ColumnFilePipe() {
+    flush();
+    for (auto& handler: handlers)
+        handler.close();
+}
@@ -0,0 +1,43 @@
+#ifndef CLB_COLUMNFILEPIPE_H
+#define CLB_COLUMNFILEPIPE_H
+
+#include "pipe.h"
+#include <fstream>
+#include <string>
+#include <vector>
+
+// One field of a fixed-size record, written out as its own column
+struct Column {
+    std::string name;
+    size_t offset;
+    // NumPy type string of a single value, e.g. "<f4"
+    std::string descr;
+    size_t item_size;
+    // Values per record, more than one gives a (rows, count) column
+    unsigned int count;
+};
+
+// Writes fixed-size records column by column, every column to <folder>/<name>.npy. Values are buffered per column and
+// appended in chunks of chunk_rows records, the header holding the row count is rewritten on every flush. Each column
+// is a regular .npy file, so readers can np.load(..., mmap_mode='r') just the columns they need.
+class ColumnFilePipe: public Pipe {
+private:
+    std::vector<Column> columns;
+    std::vector<std::ofstream> handlers;
+    std::vector<std::vector<char>> buffers;
+    unsigned long rows;
+    unsigned long rows_buffered;
+    unsigned long chunk_rows;
+
+    void write_header(unsigned int index);
+    void write_chunk();
+
+public:
+    ColumnFilePipe(const std::string& folder, const std::vector<Column>& columns, unsigned long chunk_rows);
+    ~ColumnFilePipe() override;
+
+    void flush() override;
+    void enqueue(void* entry) override;
+};
+
+#endif //CLB_COLUMNFILEPIPE_H
@@ -6,9 +6,10 @@
 #include "WindowStatsPipe.h"
 #include "cmath"
 #include <numeric>
+#include <cstddef>
 #include <algorithm>
 
-float quick_percentile(std::vector<float> sorted_arr, float p){
+float quick_percentile(const std::vector<float>& sorted_arr, float p){
     // 0 <= p <= 1
     if (p == 1)
         return sorted_arr.back();
@@ -19,22 +20,76 @@ float quick_percentile(std::vector<float> sorted_arr, float p){
     }
 }
 
+float select_percentile(std::vector<float>& arr, float p, size_t& first_unselected){
+    // Same interpolation as quick_percentile on an array that is only partially ordered. Positions before
+    // first_unselected were placed by earlier calls with a smaller p, so the selection only runs on the remaining tail
+    float index_p = p*float(arr.size()-1);
+    auto index_f = (size_t) floor(index_p);
+    if (index_f >= first_unselected)
+        std::nth_element(arr.begin() + (long) first_unselected, arr.begin() + (long) index_f, arr.end());
+    first_unselected = index_f + 1;
+    if (index_f + 1 >= arr.size())
+        return arr[index_f];
+    // Everything past index_f is at least as large, the next order statistic is the minimum of the tail
+    float next = *std::min_element(arr.begin() + (long) index_f + 1, arr.end());
+    return arr[index_f] + (next - arr[index_f]) * (index_p - (float)index_f);
+}
+
 SingleStat<float> get_single_stat(std::vector<float> arr_data, bool sort){
-    if (sort)
-        std::sort(arr_data.begin(), arr_data.end());
-    else if (arr_data.front() > arr_data.back()){
-        std::cout << "Sorted argument is not really sorted, exiting..." << std::endl;
-        exit(1);
+    if (not sort) {
+        if (arr_data.front() > arr_data.back()) {
+            std::cout << "Sorted argument is not really sorted, exiting..." << std::endl;
+            exit(1);
+        }
+        return SingleStat<float>{
+            .average=(float)std::accumulate(arr_data.begin(), arr_data.end(), 0.0) / (float)arr_data.size(),
+            .minimum=arr_data.front(),
+            .maximum=arr_data.back(),
+            .median=quick_percentile(arr_data, 0.5),
+            .per95=quick_percentile(arr_data, 0.95),
+            .per97=quick_percentile(arr_data, 0.97),
+            .per99=quick_percentile(arr_data, 0.99),
+        };
     }
-    return SingleStat<float>{
+    // Only a handful of order statistics are needed, so they are selected in increasing order instead of sorting
+    auto min_max = std::minmax_element(arr_data.begin(), arr_data.end());
+    SingleStat<float> stat{
         .average=(float)std::accumulate(arr_data.begin(), arr_data.end(), 0.0) / (float)arr_data.size(),
-        .minimum=arr_data.front(),
-        .maximum=arr_data.back(),
-        .median=quick_percentile(arr_data, 0.5),
-        .per95=quick_percentile(arr_data, 0.95),
-        .per97=quick_percentile(arr_data, 0.97),
-        .per99=quick_percentile(arr_data, 0.99),
+        .minimum=*min_max.first,
+        .maximum=*min_max.second,
     };
+    size_t first_unselected = 0;
+    stat.median = select_percentile(arr_data, 0.5, first_unselected);
+    stat.per95 = select_percentile(arr_data, 0.95, first_unselected);
+    stat.per97 = select_percentile(arr_data, 0.97, first_unselected);
+    stat.per99 = select_percentile(arr_data, 0.99, first_unselected);
+    return stat;
+}
+
+void append_stat_columns(std::vector<Column>& columns, const std::string& name, size_t offset){
+    const char* stats[] = {"avg", "min", "max", "med", "95", "97", "99"};
+    for (unsigned int i = 0; i < 7; i++)
+        columns.push_back(Column{name + "_" + stats[i], offset + i * sizeof(float), "<f4", sizeof(float), 1});
+}
+
+std::vector<Column> window_stat_columns(){
+    std::vector<Column> columns;
+    append_stat_columns(columns, "time", offsetof(WindowStat, arrival));
+    append_stat_columns(columns, "delay", offsetof(WindowStat, delay));
+    append_stat_columns(columns, "first_duration", offsetof(WindowStat, proc_first));
+    append_stat_columns(columns, "duration", offsetof(WindowStat, proc));
+    append_stat_columns(columns, "size", offsetof(WindowStat, size));
+    append_stat_columns(columns, "slow_down_first", offsetof(WindowStat, delay_p1));
+    append_stat_columns(columns, "slow_down", offsetof(WindowStat, delay_proc));
+    append_stat_columns(columns, "slow_down_size", offsetof(WindowStat, delay_size));
+    append_stat_columns(columns, "qdelay", offsetof(WindowStat, qdelay));
+    columns.push_back(Column{"inflation_avg", offsetof(WindowStat, inflation_avg), "<f4", sizeof(float), 1});
+    columns.push_back(Column{"model_index_avg", offsetof(WindowStat, model_avg), "<f4", sizeof(float), 1});
+    columns.push_back(Column{"tw_avg", offsetof(WindowStat, tw_avg), "<f4", sizeof(float), 1});
+    columns.push_back(Column{"time_len", offsetof(WindowStat, interval_duration), "<f4", sizeof(float), 1});
+    columns.push_back(Column{"len", offsetof(WindowStat, len), "<u8", sizeof(size_t), 1});
+    columns.push_back(Column{"trace", offsetof(WindowStat, trace), "|u1", sizeof(unsigned char), 1});
+    return columns;
 }
 
 void WindowStatsPipe::flush(){
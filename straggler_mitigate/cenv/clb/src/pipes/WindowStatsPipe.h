@@ -6,6 +6,7 @@
 #define CLB_WINDOWSTATSPIPE_H
 
 #include "pipe.h"
+#include "ColumnFilePipe.h"
 #include <vector>
 
 template <class T> struct SingleStat{
@@ -46,8 +47,16 @@ public:
     void extend(std::vector<void*>& arr_entry) override;
 };
 
-float quick_percentile(std::vector<float> sorted_arr, float p);
+float quick_percentile(const std::vector<float>& sorted_arr, float p);
+
+float select_percentile(std::vector<float>& arr, float p, size_t& first_unselected);
 
 SingleStat<float> get_single_stat(std::vector<float> arr_data, bool sort);
 
+// Columns of a SingleStat<float> at offset, named <name>_avg, <name>_min, ..., <name>_99
+void append_stat_columns(std::vector<Column>& columns, const std::string& name, size_t offset);
+
+// Column layout of WindowStat records, names match utils.logger.get_extracted_names
+std::vector<Column> window_stat_columns();
+
 #endif //CLB_WINDOWSTATSPIPE_H
@@ -1,8 +1,8 @@
 
 #include "pipe.h"
 
-LogEntry* Pipe::translateEntry(Job* job){
-    return new LogEntry{
+LogEntry Pipe::makeEntry(Job* job){
+    return LogEntry{
             .arrival=(float) job->arrival_time,
             .delay=(float) job->get_delay(),
             .size=(float) job->original_duration,
@@ -22,6 +22,10 @@ LogEntry* Pipe::translateEntry(Job* job){
     };
 }
 
+LogEntry* Pipe::translateEntry(Job* job){
+    return new LogEntry(makeEntry(job));
+}
+
 void Pipe::enqueueJob(Job* job){
     enqueue((void*)translateEntry(job));
 }
@@ -37,6 +37,7 @@ public:
     virtual void enqueue(void* entry) = 0;
     virtual void flush() = 0;
 
+    static LogEntry makeEntry(Job* job);
     static LogEntry* translateEntry(Job* job);
     virtual void enqueueJob(Job* job);
     virtual void extend(std::vector<void*>& arr_entry);
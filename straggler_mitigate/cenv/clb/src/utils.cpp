@@ -6,6 +6,7 @@
 #include "utils.h"
 #include <limits>
 #include <cassert>
+#include <algorithm>
 
 double avg_partition_multi_array(double **data, const int *length_data, int num_rows,
                                  double partition_ratio) {
@@ -118,6 +119,16 @@ double min(const double *data, unsigned int length) {
 }
 
 double percentile(double *data, int length, double percentile) {
+    if (length <= 2)
+        return ::percentile(data, length, percentile, nullptr);
+    auto *target = new double[length];
+    double ret_val = ::percentile(data, length, percentile, target);
+    delete[] target;
+    return ret_val;
+}
+
+double percentile(const double *data, int length, double percentile, double *scratch) {
+    // scratch holds at least length values, it is used instead of reordering data
     if (length == 1)
         return data[0];
     if (length == 2){
@@ -126,69 +137,20 @@ double percentile(double *data, int length, double percentile) {
         else
             return data[1] * (1 - percentile) + data[0] * percentile;
     }
-    auto *target = new double[length];
-    int index_pre = 0;
-    int index_post = length-1;
-    double pivot = data[length / 2];
-    for (int j = 0; j < length; j++) {
-        if (data[j] < pivot)
-            target[index_pre++] = data[j];
-        else
-            target[index_post--] = data[j];
-    }
+    std::copy(data, data + length, scratch);
     double n_th = percentile * (length - 1);
-    // index_pre now points to the start of post array and index_post points to the end of pre array
-    // so index_pre = index_post + 1
-    double ret_val;
-    if (n_th < index_post)
-        ret_val = percentile_pivot(target, index_pre, n_th);
-    else if (n_th > index_pre)
-        ret_val = percentile_pivot(target + index_pre, length - index_pre, n_th - index_pre);
-    else
-        ret_val = max(target, index_pre) * (index_pre - n_th) +
-                  min(target + index_pre, length - index_pre) * (n_th - index_post);
-    delete[] target;
-    return ret_val;
-}
-
-double percentile_pivot(double *data, int length, double n_th) {
-    if (length == 2) {
-        if (data[0] <= data[1])
-            return data[0] * (1 - n_th) + data[1] * n_th;
-        else
-            return data[1] * (1 - n_th) + data[0] * n_th;
-    }
-
-    int index_pre = -1;
-    int index_post = length;
-    double pivot = data[length / 2];
-    while (true) {
-        do {
-            index_pre += 1;
-        } while (index_pre < length and data[index_pre] < pivot);
-        do {
-            index_post -= 1;
-        } while (index_post >= 0 and data[index_post] > pivot);
-        if (index_pre >= index_post)
-            break;
-        double temp = data[index_pre];
-        data[index_pre] = data[index_post];
-        data[index_post] = temp;
-    }
-    index_pre = index_post + 1;
-
-    // index_pre now points to the start of post array and index_post points to the end of pre array
-    // so index_pre = index_post + 1
-    if (n_th < index_post)
-        return percentile_pivot(data, index_pre, n_th);
-    else if (n_th > index_pre)
-        return percentile_pivot(data + index_pre, length - index_pre, n_th - index_pre);
-    else
-        return max(data, index_pre) * (index_pre - n_th) +
-               min(data + index_pre, length - index_pre) * (n_th - index_post);
+    int index_lo = (int) n_th;
+    if (index_lo >= length - 1)
+        return max(scratch, length);
+    // Selection instead of a full sort, after nth_element everything past index_lo is at least as large, so the next
+    // order statistic is just the minimum of the tail
+    std::nth_element(scratch, scratch + index_lo, scratch + length);
+    double lo = scratch[index_lo];
+    double hi = min(scratch + index_lo + 1, length - index_lo - 1);
+    return lo * (index_lo + 1 - n_th) + hi * (n_th - index_lo);
 }
 
-int binary_search_right_side(double* sorted_data, int length, double value){
+int binary_search_right_side(const double* sorted_data, int length, double value){
     if (length == 1)
         return 0;
     int mid_index = length / 2;
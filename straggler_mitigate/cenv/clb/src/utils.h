@@ -22,8 +22,8 @@ double min(const double *data, unsigned int length);
 
 double percentile(double* data, int length, double percentile);
 
-double percentile_pivot(double* data, int length, double percentile);
+double percentile(const double* data, int length, double percentile, double* scratch);
 
-int binary_search_right_side(double* sorted_data, int length, double value);
+int binary_search_right_side(const double* sorted_data, int length, double value);
 
 #endif
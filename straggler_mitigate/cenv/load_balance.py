@@ -1,50 +1,113 @@
-from typing import List
+from typing import List, Union
 import numpy as np
 
 from cenv.clb import pyenv
 from param import config
 from cenv.clb.pyjobgenfile import PyJobGenFile
+from cenv.clb.pyjobgensim import PyJobGenSim
+from cenv.sim_workload import sim_job_gen
 
 
-def load_balance_env(output_folder: str) -> pyenv.PyLoadBalanceEnv:
-    workload = np.load(f'{config.dataset_folder}/real_tr{config.trace_ind}.npy')
-    sizes = workload[:, 0]
-    arrs = workload[:, 1]
+def load_workload() -> np.ndarray:
+    # Memory mapped read-only, every env and process reading the trace shares the same page cache copy
+    workload = np.load(f'{config.dataset_folder}/real_tr{config.trace_ind}.npy', mmap_mode='r')
+    if workload.dtype != np.float64:
+        # Job generators read float64 traces in place, others are converted once here and shared by all of them
+        workload = np.ascontiguousarray(workload, dtype=np.float64)
+    return workload
 
-    job_gen = PyJobGenFile([sizes], [arrs], 0, 1.0e8 * 3600 * 1000, config.num_servers, config.seed, 1)
 
-    return pyenv.PyLoadBalanceEnv(config.num_servers, config.time_window * 1000, True, False, False, True,
-                                  output_folder + 'data.log',
-                                  config.lb_timeout_levels, [0.75, 0.85], config.max_num_retries, True,
-                                  config.tw_safe_queue_size, config.tw_exit_queue_size, job_gen, job_gen.get_ptr(),
-                                  config.seed, config.skip_log)
+def load_balance_env(output_folder: str, skip_log: bool = None) -> pyenv.PyLoadBalanceEnv:
+    if skip_log is None:
+        skip_log = config.skip_log
+    if config.workload.startswith('sim:'):
+        job_gen = sim_job_gen(config.workload, config.num_servers, config.seed)
+    else:
+        workload = load_workload()
+        sizes = workload[:, 0]
+        arrs = workload[:, 1]
+        job_gen = PyJobGenFile([sizes], [arrs], 0, 1.0e8 * 3600 * 1000, config.num_servers, config.seed, 1,
+                               borrow=True)
 
+    env = pyenv.PyLoadBalanceEnv(config.num_servers, config.time_window * 1000, True, False, False, True,
+                                 output_folder + 'data.log',
+                                 config.lb_timeout_levels, [0.75, 0.85], config.max_num_retries, True,
+                                 config.tw_safe_queue_size, config.tw_exit_queue_size, job_gen, job_gen.get_ptr(),
+                                 config.seed, skip_log, config.event_queue, config.obs_windows,
+                                 config.work_measure_windows)
+    env.set_reward_percentile(config.reward_percentile / 100)
+    return env
 
-def load_balance_env_multi(output_folder: str, skip_log: bool, num_models: int) -> List[pyenv.PyLoadBalanceEnv]:
-    workload = np.load(f'{config.dataset_folder}/real_tr{config.trace_ind}.npy')
+
+def rotated_job_gens(num_models: int) -> List[Union[PyJobGenFile, PyJobGenSim]]:
+    if config.workload.startswith('sim:'):
+        # Synthetic workloads have nothing to rotate, every generator draws its own jobs
+        return [sim_job_gen(config.workload, config.num_servers, config.seed + i) for i in range(num_models)]
+
+    workload = load_workload()
     sizes = workload[:, 0]
     arrs = workload[:, 1]
 
-    time_length_workload = arrs.sum()/1000/3600
+    # Arrival times are shared by all generators, the traces themselves are never copied or rotated
+    time_arr = np.cumsum(arrs)
+    time_length_workload = time_arr[-1]/1000/3600
     rng_ts = np.random.default_rng(seed=config.seed)
     st_s = rng_ts.random(num_models) * time_length_workload
 
-    env_s = []
+    job_gens = []
+    start_index = 0
 
     for start_time in st_s:
 
-        time_arr = np.cumsum(arrs) / 1000 / 3600
         assert start_time >= 0
-        assert start_time < time_arr[-1]
-        i_br = np.searchsorted(time_arr, start_time, side='right')
-        arrs = np.r_[arrs[i_br:], arrs[:i_br]]
-        sizes = np.r_[sizes[i_br:], sizes[:i_br]]
-
-        job_gen = PyJobGenFile([sizes], [arrs], 0, 1.0e8 * 3600 * 1000, config.num_servers, config.seed, 1)
-
-        env_s.append(pyenv.PyLoadBalanceEnv(config.num_servers, config.time_window * 1000, True, False, False, True,
-                                            output_folder + 'data.log',
-                                            config.lb_timeout_levels, [0.75, 0.85], config.max_num_retries,
-                                            True, config.tw_safe_queue_size, config.tw_exit_queue_size, job_gen,
-                                            job_gen.get_ptr(), config.seed, skip_log))
+        assert start_time < time_length_workload
+        job_gen = PyJobGenFile([sizes], [arrs], 0, 1.0e8 * 3600 * 1000, config.num_servers, config.seed, 1,
+                               borrow=True, time_arrs=[time_arr])
+        # Every generator starts start_time after the previous one, seek wraps around at the end of the trace
+        start_time_ms = time_arr[start_index - 1] if start_index > 0 else 0
+        start_index = job_gen.seek(0, start_time_ms + start_time * 3600 * 1000)
+
+        job_gens.append(job_gen)
+    return job_gens
+
+
+def load_balance_env_multi(output_folder: str, skip_log: bool, num_models: int) -> List[pyenv.PyLoadBalanceEnv]:
+    env_s = []
+
+    for job_gen in rotated_job_gens(num_models):
+        env = pyenv.PyLoadBalanceEnv(config.num_servers, config.time_window * 1000, True, False, False, True,
+                                     output_folder + 'data.log',
+                                     config.lb_timeout_levels, [0.75, 0.85], config.max_num_retries,
+                                     True, config.tw_safe_queue_size, config.tw_exit_queue_size, job_gen,
+                                     job_gen.get_ptr(), config.seed, skip_log, config.event_queue,
+                                     config.obs_windows, config.work_measure_windows)
+        env.set_reward_percentile(config.reward_percentile / 100)
+        env_s.append(env)
     return env_s
+
+
+def load_balance_env_actor(output_folder: str, actor_index: int, num_actors: int) -> pyenv.PyLoadBalanceEnv:
+    # The first actor runs the same logged env as synchronous training, the others start at rotated points of the
+    # workload and skip logging
+    if actor_index == 0:
+        return load_balance_env(output_folder)
+    job_gen = rotated_job_gens(num_actors)[actor_index]
+    env = pyenv.PyLoadBalanceEnv(config.num_servers, config.time_window * 1000, True, False, False, True,
+                                 output_folder + 'data.log',
+                                 config.lb_timeout_levels, [0.75, 0.85], config.max_num_retries, True,
+                                 config.tw_safe_queue_size, config.tw_exit_queue_size, job_gen, job_gen.get_ptr(),
+                                 config.seed, True, config.event_queue, config.obs_windows,
+                                 config.work_measure_windows)
+    env.set_reward_percentile(config.reward_percentile / 100)
+    return env
+
+
+def load_balance_env_batch(output_folder: str, skip_log: bool, num_models: int) -> pyenv.PyLoadBalanceEnvBatch:
+    env = pyenv.PyLoadBalanceEnvBatch(config.num_servers, config.time_window * 1000, True, False, False, True,
+                                      output_folder + 'data.log',
+                                      config.lb_timeout_levels, [0.75, 0.85], config.max_num_retries,
+                                      True, config.tw_safe_queue_size, config.tw_exit_queue_size,
+                                      rotated_job_gens(num_models), config.seed, skip_log, config.num_env_threads,
+                                      config.event_queue, config.obs_windows, config.work_measure_windows)
+    env.set_reward_percentile(config.reward_percentile / 100)
+    return env
@@ -0,0 +1,48 @@
+from typing import List, Tuple
+
+from cenv.clb.pyjobgensim import PyJobGenSim
+
+# Parameters of every distribution, in the order they are given in the spec
+DIST_PARAMS = {
+    'pareto': ['pareto_shape', 'pareto_scale'],
+    'normal': ['normal_mu', 'normal_sigma'],
+    'exponential': ['exponential_rev_lambda'],
+    'static': ['stat_ret_val'],
+}
+
+
+def parse_dist(spec: str) -> dict:
+    name, *values = spec.split(':')
+    if name not in DIST_PARAMS or len(values) != len(DIST_PARAMS[name]):
+        raise ValueError(f'Bad distribution "{spec}", expected pareto:<shape>:<scale>, normal:<mu>:<sigma>, '
+                         f'exponential:<mean> or static:<value>')
+    return {'type': name, 'params': {param: float(value) for param, value in zip(DIST_PARAMS[name], values)}}
+
+
+def parse_sim_workload(workload: str) -> Tuple[List[dict], float]:
+    """
+    Parses a synthetic workload of the form sim:<size>,<iat>[/<size>,<iat>...][@<hold time in hours>], e.g.
+    sim:pareto:1.5:20,exponential:16/pareto:1.5:20,exponential:12@2 switches between two arrival rates every two
+    hours. Distributions are pareto:<shape>:<scale>, normal:<mu>:<sigma>, exponential:<mean> or static:<value>, all
+    in milliseconds.
+
+    :param workload:
+    :type workload: str
+    :return: distribution parameters of every regime, and the hold time of a regime in milliseconds
+    :rtype: (list[dict], float)
+    """
+    assert workload.startswith('sim:'), f'Not a synthetic workload: {workload}'
+    spec, _, hold_time = workload[len('sim:'):].partition('@')
+    list_dist_params = []
+    for regime in spec.split('/'):
+        dists = regime.split(',')
+        if len(dists) != 2:
+            raise ValueError(f'Bad regime "{regime}", expected <size>,<iat>')
+        list_dist_params.append({'size': parse_dist(dists[0]), 'iat': parse_dist(dists[1])})
+    hold_time = float(hold_time) if hold_time else 1
+    return list_dist_params, hold_time * 3600 * 1000
+
+
+def sim_job_gen(workload: str, num_servers: int, seed: int) -> PyJobGenSim:
+    list_dist_params, hold_time = parse_sim_workload(workload)
+    return PyJobGenSim(0, hold_time, list_dist_params, num_servers, seed)
@@ -0,0 +1,36 @@
+import argparse
+import os
+
+import numpy as np
+
+from cenv.sim_workload import sim_job_gen
+
+parser = argparse.ArgumentParser(description='Write a synthetic workload to disk as a trace, chunk by chunk')
+parser.add_argument('--workload', type=str, required=True,
+                    help='synthetic workload sim:<size>,<iat>[/<size>,<iat>...][@<hold hours>] (required)')
+parser.add_argument('--num_jobs', type=int, required=True, help='number of jobs in the trace (required)')
+parser.add_argument('--chunk_size', type=int, default=1000000, help='jobs generated per chunk (default: 1000000)')
+parser.add_argument('--dataset_folder', type=str, default='./traces/', help='The trace dataset folder')
+parser.add_argument('--trace_ind', type=int, default=0, help='Trace index to write')
+parser.add_argument('--num_servers', type=int, default=10, help='number of servers (default: 10)')
+parser.add_argument('--seed', type=int, default=42, help='random seed (default: 42)')
+config = parser.parse_args()
+
+
+def main():
+    job_gen = sim_job_gen(config.workload, config.num_servers, config.seed)
+    os.makedirs(config.dataset_folder, exist_ok=True)
+    path = f'{config.dataset_folder}/real_tr{config.trace_ind}.npy'
+
+    # Written through a memory map, only one chunk of jobs is ever held in memory
+    trace = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(config.num_jobs, 2))
+    for start in range(0, config.num_jobs, config.chunk_size):
+        end = min(start + config.chunk_size, config.num_jobs)
+        trace[start:end] = job_gen.gen_jobs(end - start)
+        trace.flush()
+        print(f'{end}/{config.num_jobs} jobs written to {path}')
+    del trace
+
+
+if __name__ == '__main__':
+    main()
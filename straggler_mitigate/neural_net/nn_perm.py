@@ -1,4 +1,4 @@
-from typing import Tuple
+from typing import List, Tuple
 import torch
 import torch.nn as nn
 import torch.nn.functional as tfunctional
@@ -15,7 +15,8 @@ def mlp_seq(sizes, activation, output_activation=nn.Identity):
 
 
 class PermInvNet(nn.Module):
-    def __init__(self, observation_len: int, out_space: int, num_slots: int, aux_state_size: int = 0):
+    def __init__(self, observation_len: int, out_space: int, num_slots: int, aux_state_size: int = 0,
+                 mapper: nn.Module = None):
         super(PermInvNet, self).__init__()
         # We assume data permutation invariant data happens in batches of num_slots
         # So by indexing the slot, it would be like 0 1 2 0 1 2 ...
@@ -25,31 +26,37 @@ class PermInvNet(nn.Module):
         self.slot_size = num_slots
         assert (observation_len - aux_state_size) % num_slots == 0
         self.map_in_size = (observation_len - aux_state_size) // num_slots
-        self.elem_idx = [i // self.map_in_size + (i % self.map_in_size) * self.slot_size for i in
-                         range(observation_len - aux_state_size)]
+        self.perm_size = observation_len - aux_state_size
 
         map_hid = config.nn_map
         red_hid = config.nn_red
 
-        self.mapper = mlp_seq([self.map_in_size] + map_hid + [1],
-                              activation=nn.ReLU,
-                              output_activation=nn.Identity)
+        # A mapper passed in is shared, e.g. between policy and value nets, and trained through both
+        if mapper is None:
+            mapper = mlp_seq([self.map_in_size] + map_hid + [1],
+                             activation=nn.ReLU,
+                             output_activation=nn.Identity)
+        self.mapper = mapper
         self.reducer = mlp_seq([1 + self.aux_size] + red_hid + [self.out_space],
                                activation=nn.ReLU,
                                output_activation=nn.Identity)
 
-    def forward(self, observation: torch.Tensor) -> torch.Tensor:
+    @torch.jit.export
+    def embed(self, observation: torch.Tensor) -> torch.Tensor:
+        # Slots are interleaved feature by feature, so [.., map_in, slots] is a view and its transpose gives every
+        # slot's features without gathering
         if len(observation.shape) == 1:
-            obs_inv = observation[self.elem_idx].view(self.slot_size, self.map_in_size)
-        elif len(observation.shape) == 2:
-            obs_inv = observation[:, self.elem_idx].view(-1, self.slot_size, self.map_in_size)
+            obs_inv = observation[:self.perm_size].view(self.map_in_size, self.slot_size)
         else:
-            obs_inv = observation[:, :, self.elem_idx].view(-1, self.slot_size, self.map_in_size)
-        mapped_inter_values = self.mapper(obs_inv).squeeze(dim=-1)
+            obs_inv = observation[..., :self.perm_size].view(-1, self.map_in_size, self.slot_size)
+        mapped_inter_values = self.mapper(obs_inv.transpose(-1, -2)).squeeze(dim=-1)
         sum_inter = mapped_inter_values.mean(dim=-1, keepdim=True)
         if self.aux_size != 0:
             sum_inter = torch.cat((sum_inter, observation[..., -self.aux_size:]), dim=-1)
-        return self.reducer(sum_inter).squeeze(dim=-1)
+        return sum_inter
+
+    def forward(self, observation: torch.Tensor) -> torch.Tensor:
+        return self.reducer(self.embed(observation)).squeeze(dim=-1)
 
     @torch.jit.export
     def sample_policy(self, observation: torch.Tensor) -> torch.Tensor:
@@ -63,3 +70,91 @@ class PermInvNet(nn.Module):
         values = self.forward(observation)
         q_best, choice_best = torch.max(values, -1)
         return q_best.detach(), choice_best.detach()
+
+
+class MultiHeadPermInvNet(nn.Module):
+    def __init__(self, observation_len: int, out_space: int, num_slots: int, aux_state_size: int = 0,
+                 num_heads: int = 2):
+        super(MultiHeadPermInvNet, self).__init__()
+        # num_heads independent PermInvNets (e.g. twin critics) evaluated together. The slot inputs are built once
+        # and every layer of all heads is a single batched matmul over weights stacked along the head dimension.
+        self.obs_space = observation_len
+        self.out_space = out_space
+        self.aux_size = aux_state_size
+        self.slot_size = num_slots
+        self.num_heads = num_heads
+        assert (observation_len - aux_state_size) % num_slots == 0
+        self.map_in_size = (observation_len - aux_state_size) // num_slots
+        self.perm_size = observation_len - aux_state_size
+
+        map_sizes = [self.map_in_size] + config.nn_map + [1]
+        red_sizes = [1 + self.aux_size] + config.nn_red + [self.out_space]
+        self.num_map_layers = len(map_sizes) - 1
+        self.in_sizes = map_sizes[:-1] + red_sizes[:-1]
+        self.out_sizes = map_sizes[1:] + red_sizes[1:]
+
+        # All weights and biases of a head live in one row of flat_params, so optimizers, gradient clipping and
+        # target soft copies each touch a single tensor
+        self.weight_offsets = []
+        self.bias_offsets = []
+        offset = 0
+        for in_size, out_size in zip(self.in_sizes, self.out_sizes):
+            self.weight_offsets.append(offset)
+            offset += in_size * out_size
+            self.bias_offsets.append(offset)
+            offset += out_size
+        self.flat_params = nn.Parameter(torch.empty(num_heads, offset))
+
+        # Same distribution as the default nn.Linear initialization
+        with torch.no_grad():
+            for in_size, out_size, weight_offset, bias_offset in zip(self.in_sizes, self.out_sizes,
+                                                                     self.weight_offsets, self.bias_offsets):
+                bound = 1 / in_size ** 0.5
+                self.flat_params[:, weight_offset:bias_offset + out_size].uniform_(-bound, bound)
+
+    def layers(self, x: torch.Tensor, first: int, last: int) -> torch.Tensor:
+        # x is [heads, rows, in], layer j of every head is x @ W_j + b_j in one baddbmm
+        for j in range(first, last):
+            in_size = self.in_sizes[j]
+            out_size = self.out_sizes[j]
+            weight = self.flat_params[:, self.weight_offsets[j]:self.weight_offsets[j] + in_size * out_size]
+            bias = self.flat_params[:, self.bias_offsets[j]:self.bias_offsets[j] + out_size]
+            x = torch.baddbmm(bias.unsqueeze(1), x, weight.view(self.num_heads, in_size, out_size))
+            if j < last - 1:
+                x = torch.relu(x)
+        return x
+
+    def forward(self, observation: torch.Tensor) -> torch.Tensor:
+        # Returns [heads, batch, out], or [heads, out] for a single observation
+        single = len(observation.shape) == 1
+        observation = observation.reshape(-1, self.obs_space)
+        obs_inv = observation[:, :self.perm_size].view(-1, self.map_in_size, self.slot_size).transpose(1, 2)
+        obs_inv = obs_inv.reshape(1, -1, self.map_in_size).expand(self.num_heads, -1, -1)
+        mapped_inter_values = self.layers(obs_inv, 0, self.num_map_layers).view(self.num_heads, -1, self.slot_size)
+        sum_inter = mapped_inter_values.mean(dim=-1, keepdim=True)
+        if self.aux_size != 0:
+            aux = observation[:, -self.aux_size:].unsqueeze(0).expand(self.num_heads, -1, -1)
+            sum_inter = torch.cat((sum_inter, aux), dim=-1)
+        out = self.layers(sum_inter, self.num_map_layers, len(self.in_sizes))
+        if single:
+            out = out.squeeze(dim=1)
+        return out.squeeze(dim=-1)
+
+
+def heads_state_dict(net: MultiHeadPermInvNet or torch.nn.Module, head_state_dicts: List[dict]) -> dict:
+    # State dict of net from one PermInvNet state dict per head, e.g. from checkpoints of separate twin critics.
+    # Every head's Linear layers, mapper then reducer, are packed into its row of flat_params with weights transposed.
+    assert len(head_state_dicts) == net.num_heads
+    flat_params = torch.empty_like(net.flat_params)
+    for h, head_state_dict in enumerate(head_state_dicts):
+        linears = [(prefix, int(key.split('.')[1])) for prefix in ['mapper', 'reducer'] for key in head_state_dict
+                   if key.startswith(prefix + '.') and key.endswith('.weight')]
+        linears.sort(key=lambda layer: (layer[0] != 'mapper', layer[1]))
+        assert len(linears) == len(net.in_sizes)
+        for j, (prefix, index) in enumerate(linears):
+            weight = head_state_dict['{}.{}.weight'.format(prefix, index)]
+            bias = head_state_dict['{}.{}.bias'.format(prefix, index)]
+            assert weight.shape == (net.out_sizes[j], net.in_sizes[j])
+            flat_params[h, net.weight_offsets[j]:net.bias_offsets[j]] = weight.t().reshape(-1)
+            flat_params[h, net.bias_offsets[j]:net.bias_offsets[j] + net.out_sizes[j]] = bias
+    return {'flat_params': flat_params}
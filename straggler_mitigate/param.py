@@ -12,6 +12,10 @@ parser.add_argument('--lb_timeout_levels', type=float, default=[3, 10, 30, 60, 1
                     help='timeout levels for resending requests (default: [3, 10, 30, 60, 100, 300, 600, 1000, -1])')
 parser.add_argument('--dataset_folder', type=str, default='./traces/', help='The trace dataset folder')
 parser.add_argument('--trace_ind', type=int, default=0, help='Trace index to choose')
+parser.add_argument('--workload', type=str, default='trace',
+                    help='trace to use --dataset_folder and --trace_ind, or a synthetic workload '
+                         'sim:<size>,<iat>[/<size>,<iat>...][@<hold hours>] with distributions pareto:<shape>:<scale>, '
+                         'normal:<mu>:<sigma>, exponential:<mean> or static:<value> (default: trace)')
 parser.add_argument('--start_time', type=float, default=0, help='Starting time in trace (default: 0)')
 parser.add_argument('--time_window', type=float, default=0.5, help='Time window of actions (default: 0.5)')
 parser.add_argument('--max_num_retries', type=int, default=1, help='maximum number of retries (default: 1)')
@@ -23,6 +27,17 @@ parser.add_argument('--tw_exit_queue_size', type=int, default=3, help='training
 parser.add_argument('--compact', type=str, default='yes', choices=['yes', 'no', 'only'], help='Agent type (required)')
 parser.add_argument('--skip_log', action='store_true', help='Skip logging')
 parser.add_argument('--skip_tb', action='store_true', help='Skip tensorboard')
+parser.add_argument('--num_env_threads', type=int, default=1,
+                    help='native threads for stepping batched environments (default: 1)')
+parser.add_argument('--event_queue', type=str, default='binary_heap', choices=['binary_heap', 'dary_heap'],
+                    help='event queue backend of the simulator (default: binary_heap)')
+parser.add_argument('--obs_windows', type=int, default=4,
+                    help='past time windows the workload statistics in the observation cover (default: 4)')
+parser.add_argument('--work_measure_windows', type=int, default=20,
+                    help='past time windows the work measure covers (default: 20)')
+parser.add_argument('--reward_percentile', type=float, default=95,
+                    help='percentile of the job durations in a time window the reward is taken from, e.g. 50, 95 or 99 '
+                         '(default: 95)')
 
 # -- General RL --
 parser.add_argument('--agent_type', type=str, required=True, help='Agent type (required)',
@@ -39,6 +54,8 @@ parser.add_argument('--nn_map', type=int, default=[32, 16], nargs='+',
                     help='Perm Invar - Mapper hidden layers (default: [32, 16])')
 parser.add_argument('--nn_red', type=int, default=[32, 16], nargs='+',
                     help='Perm Invar - Reducer hidden layers (default: [32, 16])')
+parser.add_argument('--shared_mapper', action='store_true',
+                    help='Perm Invar - A2C policy and value nets share one mapper')
 
 # -- A2C --
 parser.add_argument('--entropy_max', type=float, default=0.1,
@@ -54,6 +71,17 @@ parser.add_argument('--master_batch', type=int, default=128,
 parser.add_argument('--reward_scale', type=float, required=True,
                     help='reward normalization scale (default: 1000)')
 
+# -- Actor/learner --
+parser.add_argument('--num_actors', type=int, default=0,
+                    help='actor processes simulating for an asynchronous A2C learner, 0 alternates simulation and '
+                         'training in one process (default: 0)')
+parser.add_argument('--publish_interval', type=int, default=1,
+                    help='learner updates between publishing policy weights to the actors (default: 1)')
+parser.add_argument('--ring_slots', type=int, default=4,
+                    help='batches the shared-memory trajectory ring holds between actors and learner (default: 4)')
+parser.add_argument('--is_clip', type=float, default=1,
+                    help='truncation of the importance weights of batches from stale policies (default: 1)')
+
 # -- DDQN/SAC --
 parser.add_argument('--off_policy_buffer_size', type=int, default=int(1e6),
                     help='Buffer size for off policy method (default: 1e5)')
@@ -21,14 +21,39 @@ plt.rcParams.update({
 })
 
 
-def load_exp_list(list_files, agent_alias, print_items=True):
+def log_columns_folder(path, name):
+    # Columnar logs of the simulator, or the columns compacted next to the raw logs of older runs
+    folder = os.path.join(path, name)
+    return folder + '_cols' if os.path.isdir(folder + '_cols') else folder
+
+
+def load_log_columns(path, columns=None):
+    log = {}
+    for folder in ['data.log_all', 'data.log_agent']:
+        folder = log_columns_folder(path, folder)
+        if columns is None:
+            names = [file[:-len('.npy')] for file in os.listdir(folder) if file.endswith('.npy')]
+        else:
+            names = [name for name in columns if os.path.exists(os.path.join(folder, f'{name}.npy'))]
+        for name in names:
+            log[name] = np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r')
+    return log
+
+
+def load_exp_list(list_files, agent_alias, print_items=True, columns=None):
     e_list = []
     for i in trange(len(list_files)):
         t1 = time.time()
-        with open(list_files[i] + '/data.log_pkl', 'rb') as handle:
-            pkl_rick = pickle.load(handle)
-        for key in pkl_rick:
-            pkl_rick[key] = np.array(pkl_rick[key])
+        if os.path.isdir(log_columns_folder(list_files[i], 'data.log_all')):
+            # Columnar logs, only the columns asked for are memory mapped
+            pkl_rick = load_log_columns(list_files[i], columns)
+        else:
+            with open(list_files[i] + '/data.log_pkl', 'rb') as handle:
+                pkl_rick = pickle.load(handle)
+            if columns is not None:
+                pkl_rick = {key: pkl_rick[key] for key in columns}
+            for key in pkl_rick:
+                pkl_rick[key] = np.array(pkl_rick[key])
         e_list.append(pkl_rick)
         if print_items:
             print(f'{agent_alias[i]} loaded at index {i}!!')
@@ -153,7 +178,8 @@ for tag in tags:
         list_files.extend([f'./tests/{tag}_trace_ind{tind}_seed{sd}/' for tind in trl for sd in range(10)])
     list_labels.extend([f'{tag}_t{tind}_para' for tind in trl])
 
-e_list = load_exp_list(list_files, [f'{i}' for i in range(len(list_files))], print_items=False)
+e_list = load_exp_list(list_files, [f'{i}' for i in range(len(list_files))], print_items=False,
+                       columns=['delay_95', 'time_max'])
 
 labels = [
     'Oracle A2C',
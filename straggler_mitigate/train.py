@@ -48,9 +48,15 @@ def start_experiment(agent_type, output_folder):
 
         os.makedirs(output_folder + '/models/', exist_ok=True)
 
+        if config.num_actors > 0 and agent_type != 'A2C':
+            raise ValueError('Actor/learner training is only implemented for A2C')
+        if config.shared_mapper and agent_type != 'A2C':
+            raise ValueError('A shared mapper is only implemented for A2C')
+
         # set up environments for workers
         print('Setting up environment..')
-        env = load_balance_env(output_folder)
+        # with actors the learner's env only describes observations and scales, the actors simulate and log
+        env = load_balance_env(output_folder, skip_log=config.skip_log or config.num_actors > 0)
 
         # training monitor
         print('Setting up monitoring..')
@@ -1,15 +1,29 @@
 import os
 import pickle
+import shutil
 import time
-from typing import List, Tuple, Dict
+from typing import List, Dict
 import numpy as np
 from termcolor import colored
-import struct
-from functools import partial
 
 from param import config
 
 
+def window_stat_dtype() -> np.dtype:
+    # WindowStat: 9 SingleStat<float> and 4 floats, size_t len, unsigned char trace, padded to 8 bytes ('67fLB7x')
+    names = get_extracted_names()[:69]
+    return np.dtype({'names': names, 'formats': ['<f4'] * 67 + ['<u8', 'u1'],
+                     'offsets': [4 * i for i in range(67)] + [272, 280], 'itemsize': 288})
+
+
+def agent_window_stat_dtype() -> np.dtype:
+    # AgentWindowStat: 2 SingleStat<float>, unsigned int histogram[10], 2 floats, size_t len, unsigned char trace,
+    # padded to 8 bytes ('14f10I2fLB7x')
+    names = get_extracted_names()[69:]
+    return np.dtype({'names': names, 'formats': ['<f4'] * 14 + [('<u4', (10,)), '<f4', '<f4', '<u8', 'u1'],
+                     'offsets': [4 * i for i in range(14)] + [56, 96, 100, 104, 112], 'itemsize': 120})
+
+
 def compact(path: str):
     t_start = time.time()
     assert os.path.exists(os.path.join(path, 'models', f'model_{config.num_epochs}')) or config.saved_model, \
@@ -18,6 +32,13 @@ def compact(path: str):
     agent_path = os.path.join(path, 'data.log_agent')
     pickle_path = os.path.join(path, 'data.log_pkl')
     assert os.path.exists(all_path) and os.path.exists(agent_path)
+    if os.path.isdir(all_path) and os.path.isdir(agent_path):
+        # Written column by column by the simulator, every column is already a .npy file
+        print('Logs are columnar, nothing to compact')
+        return
+    if os.path.isdir(all_path + '_cols') and os.path.isdir(agent_path + '_cols'):
+        print('Already there')
+        return
     if os.path.exists(pickle_path):
         with open(pickle_path, 'rb') as handle:
             pkl = pickle.load(handle)
@@ -25,45 +46,39 @@ def compact(path: str):
                 print('Already there')
                 return
 
-    # All stats
-    struct_fmt = '67fLB7x'
-    struct_len = struct.calcsize(struct_fmt)
-    struct_unpack = struct.Struct(struct_fmt).unpack_from
-    with open(all_path, "rb") as f:
-        data_all_raw = [struct_unpack(chunk) for chunk in iter(partial(f.read, struct_len), b'')]
-
-    # Agent stats
-    struct_fmt = '14f10I2fLB7x'
-    struct_len = struct.calcsize(struct_fmt)
-    struct_unpack = struct.Struct(struct_fmt).unpack_from
-    with open(agent_path, "rb") as f:
-        data_agent_raw = [struct_unpack(chunk) for chunk in iter(partial(f.read, struct_len), b'')]
-
-    # Data Dict
+    # Raw records of the older simulator, mapped instead of unpacked record by record
+    data_all_raw = np.memmap(all_path, dtype=window_stat_dtype(), mode='r')
+    data_agent_raw = np.memmap(agent_path, dtype=agent_window_stat_dtype(), mode='r')
     dict_save = extract_from_raw_data(data_all_raw, data_agent_raw)
-    with open(pickle_path, 'wb') as handle:
-        pickle.dump(dict_save, handle, protocol=pickle.HIGHEST_PROTOCOL)
-    print('Transforming to pickle took %.1f seconds' % (time.time()-t_start))
+
+    # Same layout the simulator writes now, a folder of .npy columns next to every raw file, which is kept as it is
+    for raw_path, names in [(all_path, data_all_raw.dtype.names), (agent_path, data_agent_raw.dtype.names)]:
+        cols_path = raw_path + '_cols'
+        if os.path.isdir(cols_path):
+            continue
+        # Written aside and renamed when complete, so an interrupted compact leaves no partial columns behind
+        tmp_path = cols_path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in names:
+            np.save(os.path.join(tmp_path, f'{name}.npy'), dict_save[name])
+        os.rename(tmp_path, cols_path)
+    del data_all_raw, data_agent_raw, dict_save
+    print('Transforming to columns took %.1f seconds' % (time.time()-t_start))
 
 
-def extract_from_raw_data(all_raw: List[Tuple], agent_raw: List[Tuple]) -> Dict[str, np.ndarray]:
-    all_np = np.array(all_raw)
-    assert all_np.ndim == 2
-    assert all_np.shape[1] == 69
-    assert np.all(all_np[1:, 1] >= all_np[:-1, 2])
-    return_arrs = [all_np[:, i] for i in range(all_np.shape[1])]
-    agent_np = np.array(agent_raw)
-    assert agent_np.ndim == 2
-    assert agent_np.shape[1] == 28
-    assert np.all(agent_np[1:, 1] >= agent_np[:-1, 2])
-    return_arrs.extend([agent_np[:, i] for i in range(14)])
-    return_arrs.append(agent_np[:, 14:14+len(config.lb_timeout_levels)])
-    return_arrs.extend([agent_np[:, i] for i in range(24, 28)])
+def extract_from_raw_data(all_raw: np.ndarray, agent_raw: np.ndarray) -> Dict[str, np.ndarray]:
+    assert all_raw.dtype == window_stat_dtype()
+    assert np.all(all_raw['time_min'][1:] >= all_raw['time_max'][:-1])
+    assert agent_raw.dtype == agent_window_stat_dtype()
+    assert np.all(agent_raw['time_act_min'][1:] >= agent_raw['time_act_max'][:-1])
+    dict_save = {name: all_raw[name] for name in all_raw.dtype.names}
+    dict_save.update({name: agent_raw[name] for name in agent_raw.dtype.names})
+    dict_save['histogram'] = dict_save['histogram'][:, :len(config.lb_timeout_levels)]
 
-    if len(return_arrs) != len(get_extracted_names()):
-        print(colored(f'WARNING: Number of extractions ({len(return_arrs)}) do not match '
+    if len(dict_save) != len(get_extracted_names()):
+        print(colored(f'WARNING: Number of extractions ({len(dict_save)}) do not match '
                       f'labels ({len(get_extracted_names())})', 'red'))
-    dict_save = {key: data for key, data in zip(get_extracted_names(), return_arrs)}
     return dict_save
 
 
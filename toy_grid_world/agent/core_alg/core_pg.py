@@ -4,38 +4,24 @@ import numpy as np
 import torch
 from torch.utils.tensorboard import SummaryWriter
 
-from agent.core_alg.core_utils import get_flat_params_from
+from agent.core_alg.core_utils import get_flat_params_from, discounted_scan
 from neural_net.nn import FullyConnectNN, FCNPolicy
 
 
-def cumulative_rewards(rewards_np: np.ndarray, term_np: np.ndarray, trunc_np: np.ndarray,
-                       next_value_np: np.ndarray, gamma: float) -> np.ndarray:
-    returns = np.zeros(len(rewards_np), dtype=np.float32)
-    last_val = next_value_np[-1]
-    # if done is true (and 1), next val should be zero in return
+def returns_and_advantages(rewards_np: np.ndarray, term_np: np.ndarray, trunc_np: np.ndarray, values_np: np.ndarray,
+                           next_values_np: np.ndarray, gamma: float, lamb: float) -> Tuple[np.ndarray, np.ndarray]:
+    # Discounted returns and TD lambda style advantages (GAE: https://arxiv.org/pdf/1506.02438.pdf) in one reverse scan.
+    # Returns bootstrap from the next value at truncations and at the end of the batch, advantages restart there.
+    # if term is true, next val should be zero in both
+    gamma_arr = gamma * (~term_np).astype(float)
+    cuts = np.array(trunc_np, dtype=bool)
+    cuts[-1] = True
 
-    for i in reversed(range(len(rewards_np))):
-        if trunc_np[i] is True:
-            last_val = next_value_np[i]
-        returns[i] = last_val = rewards_np[i] + gamma * last_val * (~term_np[i]).astype(float)
+    next_vals = gamma_arr * next_values_np
+    returns, adv = discounted_scan(np.stack([rewards_np + next_vals * cuts, rewards_np + next_vals - values_np]),
+                                   np.stack([gamma_arr, gamma_arr * lamb]) * ~cuts)
 
-    return returns
-
-
-def gae_advantage(rewards_np: np.ndarray, term_np: np.ndarray, trunc_np: np.ndarray, values_np: np.ndarray,
-                  next_values_np: np.ndarray, gamma: float, lamb: float) -> np.ndarray:
-    # TD lambda style advantage computation
-    # more details in GAE: https://arxiv.org/pdf/1506.02438.pdf
-    adv = np.zeros(len(rewards_np), dtype=np.float32)
-    td0 = rewards_np + gamma * next_values_np * (~term_np).astype(float) - values_np
-    last_gae = 0
-
-    for i in reversed(range(len(rewards_np))):
-        if trunc_np[i] is True:
-            last_gae = 0
-        last_gae = adv[i] = td0[i] + gamma * lamb * last_gae * (~term_np[i]).astype(float)
-
-    return adv
+    return returns.astype(np.float32), adv.astype(np.float32)
 
 
 def policy_gradient(policy_net: FCNPolicy, net_opt_p: torch.optim.Optimizer,
@@ -96,12 +82,9 @@ def train_actor_critic(value_net: FullyConnectNN, policy_net: FCNPolicy, net_opt
     next_values_torch = value_net.forward(torch.as_tensor(next_obs_np, dtype=torch.float, device=device)).squeeze()
     next_values_np = next_values_torch.cpu().detach().numpy()
 
-    # cumulative reward
-    returns_np = cumulative_rewards(rewards_np, terms_np, truncs_np, next_values_np, gamma)
+    # cumulative reward and advantage
+    returns_np, adv_np = returns_and_advantages(rewards_np, terms_np, truncs_np, values_np, next_values_np, gamma, lam)
     returns_torch = torch.as_tensor(returns_np, dtype=torch.float, device=device)
-
-    # compute advantage
-    adv_np = gae_advantage(rewards_np, terms_np, truncs_np, values_np, next_values_np, gamma, lam)
     adv_torch = torch.as_tensor(adv_np, dtype=torch.float, device=device)
     # returns_np = adv_np + values_np
     # returns_torch = torch.as_tensor(ret_gae_np, dtype=torch.float, device=device)
@@ -4,7 +4,7 @@ from torch.autograd import Variable
 from typing import Tuple, Callable
 from torch.utils.tensorboard import SummaryWriter
 
-from agent.core_alg.core_pg import value_train, cumulative_rewards, gae_advantage
+from agent.core_alg.core_pg import value_train, returns_and_advantages
 from agent.core_alg.core_utils import get_flat_params_from, set_flat_params_to
 from neural_net.nn import FullyConnectNN, FCNPolicy
 
@@ -142,12 +142,9 @@ def train_trpo(value_net: FullyConnectNN, policy_net: FCNPolicy, net_opt_v: torc
     next_values_torch = value_net.forward(torch.as_tensor(next_obs_np, dtype=torch.float, device=device)).squeeze()
     next_values_np = next_values_torch.cpu().detach().numpy()
 
-    # cumulative reward
-    returns_np = cumulative_rewards(rewards_np, terms_np, truncs_np, next_values_np, gamma)
+    # cumulative reward and advantage
+    returns_np, adv_np = returns_and_advantages(rewards_np, terms_np, truncs_np, values_np, next_values_np, gamma, lam)
     returns_torch = torch.as_tensor(returns_np, dtype=torch.float, device=device)
-
-    # compute advantage
-    adv_np = gae_advantage(rewards_np, terms_np, truncs_np, values_np, next_values_np, gamma, lam)
     adv_torch = torch.as_tensor(adv_np, dtype=torch.float, device=device)
 
     # trust region policy optimization
@@ -37,3 +37,17 @@ def get_flat_grad_from(net: FullyConnectNN, grad_grad=False) -> torch.Tensor:
 
     flat_grad = torch.cat(grads)
     return flat_grad
+
+
+def discounted_scan(x_np: np.ndarray, discount_np: np.ndarray) -> np.ndarray:
+    # Solves y[i] = x[i] + discount[i] * y[i+1] backwards along the last axis (y is zero past the end), leading axes are
+    # independent sequences. Recursive doubling: after the round with stride s, y[i] sums the next 2s steps and
+    # discount[i] is the product of their discounts, so log2(n) vectorized rounds replace the per-step Python loop.
+    y = np.array(x_np, dtype=np.float64)
+    discount = np.array(np.broadcast_to(discount_np, y.shape), dtype=np.float64)
+    stride = 1
+    while stride < y.shape[-1]:
+        y[..., :-stride] += discount[..., :-stride] * y[..., stride:]
+        discount[..., :-stride] *= discount[..., stride:]
+        stride *= 2
+    return y